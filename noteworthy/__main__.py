@@ -120,9 +120,8 @@ def main():
         try:
             curses.wrapper(lambda scr: run_app(scr, args))
         except KeyboardInterrupt:
+            # Finished targets stay in BUILD_DIR for the build wizard's Resume option
             print('\nBuild cancelled.')
-            if BUILD_DIR.exists():
-                shutil.rmtree(BUILD_DIR)
             sys.exit(1)
         except Exception as e:
             print(f'\nBuild failed: {e}')
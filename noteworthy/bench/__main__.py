@@ -0,0 +1,57 @@
+"""
+Noteworthy build benchmark
+
+Generates a synthetic book and times full builds across thread counts:
+    python -m noteworthy.bench --chapters 8 --sections 6 --threads 1 2 4 -o bench.json
+"""
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+from pathlib import Path
+
+from .generator import generate_project
+from .runner import run_benchmark
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Noteworthy build benchmark')
+    parser.add_argument('--chapters', type=int, default=8, help='Number of chapters (default: 8)')
+    parser.add_argument('--sections', type=int, default=6, help='Sections per chapter (default: 6)')
+    parser.add_argument('--paragraphs', type=int, default=6, help='Paragraphs of text per section (default: 6)')
+    parser.add_argument('--math', type=float, default=0.3, help='Share of sentences and paragraphs with math, 0-1 (default: 0.3)')
+    parser.add_argument('--plots', type=int, default=1, help='table-plot tables per section (default: 1)')
+    parser.add_argument('--graphs', type=int, default=1, help='Function graphs per section (default: 1)')
+    parser.add_argument('--images', type=int, default=0, help='Distinct raster images shared across sections (default: 0)')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed for the generated text')
+    parser.add_argument('-t', '--threads', type=int, nargs='+', default=[1, 2, 4], help='Thread counts to measure')
+    parser.add_argument('-r', '--repeat', type=int, default=1, help='Timed builds per thread count (median is reported)')
+    parser.add_argument('--warm', action='store_true', help='Measure rebuilds with a primed build cache instead of cold builds')
+    parser.add_argument('--opts', default='{}', help='Extra build options as JSON, e.g. \'{"granularity": "chapter"}\'')
+    parser.add_argument('--project', type=Path, help='Generate the project here and keep it (default: temporary directory)')
+    parser.add_argument('-o', '--output', type=Path, help='Write the JSON report here instead of stdout')
+    args = parser.parse_args()
+
+    params = {k: getattr(args, k) for k in ('chapters', 'sections', 'paragraphs', 'math', 'plots', 'graphs', 'images', 'seed')}
+    project = args.project or Path(tempfile.mkdtemp(prefix='noteworthy-bench-'))
+    try:
+        print(f"Generating {args.chapters}x{args.sections} sections in {project}...", file=sys.stderr)
+        generate_project(project, **params)
+        log = lambda msg, ok: print(('  ' if ok else '! ') + msg, file=sys.stderr)
+        report = run_benchmark(project, args.threads, args.repeat, args.warm, json.loads(args.opts), log)
+        report['generator'] = params
+    finally:
+        if not args.project:
+            shutil.rmtree(project, ignore_errors=True)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        args.output.write_text(text)
+        print(f"Report written to {args.output}", file=sys.stderr)
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+# Bench Generator - Synthetic books for reproducible build benchmarks
+
+import json
+import zlib
+import random
+import shutil
+import struct
+from pathlib import Path
+
+from ..config import BASE_DIR, SYSTEM_CONFIG_DIR, BUILD_DIR
+
+WORDS = (
+    'limit function derivative continuous interval value tangent slope curve '
+    'approach point domain range sequence bound converge integral area rate '
+    'change theorem proof assume therefore consider small large every exists '
+    'neighbourhood estimate error approximation the a of to and is that we'
+).split()
+
+# Trees copied into every synthetic project; content/ and the hierarchy are generated
+COPIED = ('noteworthy', 'templates', 'config')
+LOGO = Path('content/images/cover-logo.png')
+
+
+def _ignore(src, names):
+    d = Path(src).resolve()
+    skip = {'__pycache__', 'hierarchy.json'}
+    if d == SYSTEM_CONFIG_DIR:
+        skip |= {'cache', 'build_state.db', 'build_state.db-wal', 'build_state.db-shm'}
+    return [n for n in names if n in skip or d / n == BUILD_DIR]
+
+
+def _sentence(rng, math):
+    words = rng.sample(WORDS, rng.randint(8, 16))
+    if rng.random() < math:
+        words.insert(rng.randrange(len(words)), f'$f(x) = x^{rng.randint(2, 9)} + {rng.randint(1, 99)}$')
+    return ' '.join(words).capitalize() + '.'
+
+
+def _paragraph(rng, math):
+    text = ' '.join(_sentence(rng, math) for _ in range(rng.randint(3, 6)))
+    if rng.random() < math:
+        n = rng.randint(2, 5)
+        text += f'\n$ lim_(x -> {n}) (x^{n} - {n ** n}) / (x - {n}) = sum_(k=1)^{n} k^2 $'
+    return text
+
+
+def _table_plot(rng):
+    rows = ',\n'.join(f'    ({x / 10}, {round(rng.uniform(-5, 5), 4)})' for x in range(1, rng.randint(5, 9)))
+    return f'#table-plot(\n  headers: ($x$, $f(x)$),\n  data: (\n{rows},\n  ),\n)'
+
+
+def _graph(rng):
+    a, b = rng.randint(1, 4), rng.randint(1, 3)
+    return (
+        '#cartesian-canvas(\n  size: (8, 5),\n  x-domain: (-5, 5),\n  y-domain: (-5, 5),\n  show-grid: true,\n'
+        f'  graph(x => calc.sin({a} * x) * {b}, domain: (-5, 5), label: $f(x)$),\n)'
+    )
+
+
+def write_png(path, width, height, seed=0):
+    """Write a noisy RGB PNG without needing an imaging library."""
+    rng = random.Random(seed)
+    rows = []
+    for y in range(height):
+        row = bytearray([0])
+        for x in range(width):
+            row += bytes(((x * 255 // width) ^ rng.randrange(32), (y * 255 // height) ^ rng.randrange(32), rng.randrange(256)))
+        rows.append(bytes(row))
+
+    def chunk(tag, data):
+        return struct.pack('>I', len(data)) + tag + data + struct.pack('>I', zlib.crc32(tag + data) & 0xffffffff)
+
+    ihdr = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    Path(path).write_bytes(b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', ihdr)
+                           + chunk(b'IDAT', zlib.compress(b''.join(rows), 6)) + chunk(b'IEND', b''))
+
+
+def section_source(rng, title, paragraphs=6, math=0.3, plots=1, graphs=1, images=()):
+    """Typst source of one synthetic section."""
+    blocks = [_paragraph(rng, math) for _ in range(paragraphs)]
+    extras = [_table_plot(rng) for _ in range(plots)] + [_graph(rng) for _ in range(graphs)]
+    extras += [f'#image("../images/{name}", width: 60%)' for name in images]
+    for block in extras:
+        blocks.insert(rng.randint(1, len(blocks)), block)
+    return '#import "../../templates/templater.typ": *\n\n' + f'= {title}\n\n' + '\n\n'.join(blocks) + '\n'
+
+
+def generate_project(dest, chapters=8, sections=6, paragraphs=6, math=0.3, plots=1, graphs=1,
+                     images=0, image_size=1600, seed=0):
+    """Create a runnable project at dest with chapters x sections synthetic sections.
+
+    The noteworthy package, templates and config are copied from this
+    checkout so the project builds with exactly the code under test.
+    Returns dest as a Path.
+    """
+    dest = Path(dest)
+    if dest.exists():
+        shutil.rmtree(dest)
+    dest.mkdir(parents=True)
+    for name in COPIED:
+        shutil.copytree(BASE_DIR / name, dest / name, ignore=_ignore, symlinks=True)
+
+    rng = random.Random(seed)
+    image_dir = dest / 'content' / 'images'
+    image_dir.mkdir(parents=True)
+    if (BASE_DIR / LOGO).exists():
+        shutil.copyfile(BASE_DIR / LOGO, dest / LOGO)
+    else:
+        write_png(dest / LOGO, 64, 64)
+    pictures = []
+    for i in range(images):
+        name = f'bench-{i}.png'
+        write_png(image_dir / name, image_size, image_size * 2 // 3, seed=seed + i)
+        pictures.append(name)
+
+    hierarchy = []
+    for ci in range(chapters):
+        pages = []
+        (dest / 'content' / str(ci)).mkdir()
+        for si in range(sections):
+            title = f'Section {ci + 1}.{si + 1}'
+            shown = [pictures[(ci * sections + si) % len(pictures)]] if pictures else []
+            source = section_source(rng, title, paragraphs, math, plots, graphs, shown)
+            (dest / 'content' / str(ci) / f'{si}.typ').write_text(source)
+            pages.append({'title': title})
+        hierarchy.append({'title': f'Chapter {ci + 1}', 'summary': _sentence(rng, 0), 'pages': pages})
+    (dest / 'config' / 'hierarchy.json').write_text(json.dumps(hierarchy, indent=4))
+    return dest
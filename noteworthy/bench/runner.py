@@ -0,0 +1,161 @@
+# Bench Runner - Times full builds of a synthetic project across thread counts
+
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import resource
+import statistics
+import subprocess
+from pathlib import Path
+
+RESULT_MARKER = 'noteworthy-bench:'
+
+
+def _maxrss(who):
+    """Peak RSS in bytes of this process or its largest child."""
+    rss = resource.getrusage(who).ru_maxrss
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+def measure(threads, opts=None):
+    """Build the project in the current directory once and return its measurements.
+
+    Runs inside the project (BASE_DIR resolves to it), so it is normally
+    invoked through run_benchmark in a fresh interpreter.
+    """
+    from ..config import BUILD_DIR, OUTPUT_FILE, HIERARCHY_FILE
+    from ..utils import load_config_safe, scan_content
+    from ..core.build import BuildManager, get_pdf_page_count
+
+    config = load_config_safe()
+    hierarchy = json.loads(HIERARCHY_FILE.read_text())
+    ch_folders, pg_folders = scan_content()
+    opts = dict({'frontmatter': True, 'typst_flags': [], 'cache': True, 'granularity': 'auto'}, **(opts or {}))
+    opts.update({'threads': threads, 'ch_folders': ch_folders, 'pg_folders': pg_folders,
+                 'selected_pages': [(ci, ai) for ci, ch in enumerate(hierarchy) for ai in range(len(ch['pages']))]})
+    chapters = list(enumerate(hierarchy))
+
+    if BUILD_DIR.exists():
+        shutil.rmtree(BUILD_DIR)
+    BUILD_DIR.mkdir()
+    logs = []
+    callbacks = {'on_log': lambda m, ok=True: logs.append((m, ok)), 'on_progress': lambda: True}
+
+    start = time.perf_counter()
+    bm = BuildManager(BUILD_DIR)
+    pdfs = bm.build_parallel(chapters, config, opts, callbacks)
+    compiled = time.perf_counter()
+    method = bm.finalize(pdfs, OUTPUT_FILE, chapters, 'Benchmark', 'Benchmark')
+    end = time.perf_counter()
+
+    pages = get_pdf_page_count(OUTPUT_FILE) if method and OUTPUT_FILE.exists() else 0
+    wall = end - start
+    return {
+        'threads': threads,
+        'targets': len(pdfs),
+        'pages': pages,
+        'passes': bm.passes,
+        'cache_hits': bm.cache.hits,
+        'wall_seconds': round(wall, 3),
+        'compile_seconds': round(compiled - start - bm.toc_seconds, 3),
+        'toc_seconds': round(bm.toc_seconds, 3),
+        'merge_seconds': round(end - compiled, 3),
+        'merge_method': method,
+        'pages_per_second': round(pages / wall, 2) if wall else None,
+        'targets_per_second': round(len(pdfs) / wall, 2) if wall else None,
+        'peak_rss_typst': _maxrss(resource.RUSAGE_CHILDREN),
+        'peak_rss_python': _maxrss(resource.RUSAGE_SELF),
+        'output_bytes': OUTPUT_FILE.stat().st_size if OUTPUT_FILE.exists() else 0,
+        'warnings': [m for m, ok in logs if not ok],
+    }
+
+
+def clear_state(project):
+    """Forget cached targets, page counts and durations so the next build is cold."""
+    system = Path(project) / 'templates' / 'systemconfig'
+    shutil.rmtree(system / 'cache', ignore_errors=True)
+    for p in system.glob('build_state.db*'):
+        p.unlink()
+
+
+def _typst_version():
+    from ..core.build import TYPST_PATH
+    try:
+        return subprocess.run([TYPST_PATH, '--version'], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return None
+
+
+def run_once(project, threads, opts=None, timeout=None):
+    """Build project in a fresh interpreter and return its measurements."""
+    cmd = [sys.executable, '-m', 'noteworthy.bench.runner', '--threads', str(threads), '--opts', json.dumps(opts or {})]
+    env = dict(os.environ, PYTHONPATH=str(project), PYTHONDONTWRITEBYTECODE='1')
+    proc = subprocess.run(cmd, cwd=project, env=env, capture_output=True, text=True, timeout=timeout)
+    for line in reversed(proc.stdout.splitlines()):
+        if line.startswith(RESULT_MARKER):
+            return json.loads(line[len(RESULT_MARKER):])
+    raise RuntimeError(f'Benchmark build failed (exit {proc.returncode}): {proc.stderr.strip()[-2000:]}')
+
+
+def _median(runs, field):
+    values = [r[field] for r in runs if r.get(field) is not None]
+    return statistics.median(values) if values else None
+
+
+def run_benchmark(project, threads=(1, 2, 4), repeat=1, warm=False, opts=None, log=None):
+    """Build project repeat times per thread count and return a JSON-ready report.
+
+    Each run starts cold (no cached targets or recorded page counts) unless
+    warm is set, in which case one untimed build primes the cache first.
+    """
+    log = log or (lambda m, ok: None)
+    runs = []
+    for n in threads:
+        if warm:
+            clear_state(project)
+            run_once(project, n, opts)
+        for i in range(repeat):
+            if not warm:
+                clear_state(project)
+            result = run_once(project, n, opts)
+            result['repeat'] = i
+            runs.append(result)
+            log(f"{n} threads, run {i + 1}: {result['wall_seconds']:.2f}s, {result['passes']} passes, "
+                f"{result['pages']} pages", not result['warnings'])
+
+    summary = {}
+    for n in threads:
+        mine = [r for r in runs if r['threads'] == n]
+        summary[str(n)] = {f: _median(mine, f) for f in (
+            'wall_seconds', 'compile_seconds', 'merge_seconds', 'pages_per_second', 'passes', 'peak_rss_typst'
+        )}
+    base = summary[str(threads[0])]['wall_seconds']
+    for n in threads:
+        wall = summary[str(n)]['wall_seconds']
+        summary[str(n)]['speedup'] = round(base / wall, 2) if base and wall else None
+
+    return {
+        'project': str(project),
+        'warm': warm,
+        'opts': opts or {},
+        'machine': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'typst': _typst_version(),
+        },
+        'summary': summary,
+        'runs': runs,
+    }
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Measure one build of the project in the current directory')
+    parser.add_argument('--threads', type=int, required=True)
+    parser.add_argument('--opts', default='{}')
+    args = parser.parse_args()
+    print(RESULT_MARKER + json.dumps(measure(args.threads, json.loads(args.opts))))
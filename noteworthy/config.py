@@ -3,6 +3,7 @@ BASE_DIR = Path(__file__).parent.parent.resolve()
 BUILD_DIR = BASE_DIR / 'templates/build'
 OUTPUT_FILE = BASE_DIR / 'output.pdf'
 RENDERER_FILE = BASE_DIR / 'templates/core/parser.typ'
+FOLIO_FILE = BASE_DIR / 'templates/core/folio.typ'
 SYSTEM_CONFIG_DIR = BASE_DIR / 'templates/systemconfig'
 SETTINGS_FILE = SYSTEM_CONFIG_DIR / 'build_settings.json'
 INDEXIGNORE_FILE = SYSTEM_CONFIG_DIR / '.indexignore'
@@ -13,4 +14,7 @@ PREFACE_FILE = BASE_DIR / 'config/preface.typ'
 SNIPPETS_FILE = BASE_DIR / 'config/snippets.typ'
 SCHEMES_DIR = BASE_DIR / 'config/schemes'
 MODULES_CONFIG_FILE = BASE_DIR / 'config/modules.json'
-SETUP_FILE = BASE_DIR / 'templates/core/setup.typ'
\ No newline at end of file
+SETUP_FILE = BASE_DIR / 'templates/core/setup.typ'
+CACHE_DIR = SYSTEM_CONFIG_DIR / 'cache'
+COVER_MODULE_DIR = BASE_DIR / 'templates/module/core/cover'
+BUILD_STATE_FILE = SYSTEM_CONFIG_DIR / 'build_state.db'
@@ -1,12 +1,18 @@
 import shutil
 import subprocess
 import os
-import fcntl
-import time
+import sys
 import json
+import codecs
+import contextlib
+import signal
+import selectors
+import tempfile
+import threading
 import logging
 from pathlib import Path
-from ..config import BASE_DIR, BUILD_DIR, RENDERER_FILE, PREFACE_FILE
+from ..config import BASE_DIR, BUILD_DIR, RENDERER_FILE, FOLIO_FILE
+from .pdf_pages import count_pages
 
 # Find typst binary - check common locations if not in PATH
 def _find_typst():
@@ -24,29 +30,49 @@ def _find_typst():
 TYPST_PATH = _find_typst()
 
 def get_pdf_page_count(pdf_path):
-    try:
-        result = subprocess.run(['pdfinfo', str(pdf_path)], capture_output=True, text=True, check=True)
-        for line in result.stdout.split('\n'):
-            if line.startswith('Pages:'):
-                return int(line.split(':')[1].strip())
-    except:
-        pass
-    return 0
+    return count_pages(pdf_path)
 
 class TypstBuildError(Exception):
     def __init__(self, message, stderr):
         super().__init__(f"{message}\n\n[Typst Output]:\n{stderr}")
         self.stderr = stderr
 
-def compile_target(target, output, page_offset=None, page_map=None, extra_flags=None, callback=None, log_callback=None):
-    cmd = [TYPST_PATH, 'compile', str(RENDERER_FILE), str(output), '--root', str(BASE_DIR), '--input', f'target={target}']
+class BuildFailed(Exception):
+    """One or more targets failed; failures is a list of (target, exception) in the order seen."""
+    def __init__(self, failures, cancelled=0, terminated=0):
+        key, first = failures[0]
+        lines = [f"Target {key} failed: {first}"]
+        if len(failures) > 1:
+            lines.append(f"Also failed ({len(failures) - 1}): {', '.join(k for k, _ in failures[1:])}")
+        if cancelled or terminated:
+            lines.append(f"Stopped {cancelled} queued and {terminated} running compiles")
+        super().__init__('\n'.join(lines))
+        self.failures = failures
+        self.cancelled = cancelled
+        self.terminated = terminated
+
+def compile_target(target, output, page_offset=None, page_map=None, extra_flags=None, callback=None, log_callback=None, stats=None, root=None):
+    # root: a mirror of BASE_DIR (see images.shadow_root) to compile against instead
+    root = Path(root) if root else BASE_DIR
+    cmd = [TYPST_PATH, 'compile', str(root / RENDERER_FILE.relative_to(BASE_DIR)), str(output), '--root', str(root)]
+    if isinstance(target, (list, tuple)):
+        # Bundle: several targets in one process, split later with split_bundle
+        cmd.extend(['--input', f'targets={json.dumps(list(target))}'])
+        target = f'{target[0]}..{target[-1]}'
+    else:
+        cmd.extend(['--input', f'target={target}'])
     if page_offset:
         cmd.extend(['--input', f'page-offset={page_offset}'])
+    pm_file = None
     if page_map:
-        pm_file = BUILD_DIR / 'page_map.json'
+        # A file of its own per compile, so concurrent builds never read each other's map
         try:
-            pm_file.write_text(json.dumps(page_map))
-            logging.info(f'Wrote page_map to {pm_file} ({len(json.dumps(page_map))} bytes)')
+            BUILD_DIR.mkdir(parents=True, exist_ok=True)
+            fd, name = tempfile.mkstemp(prefix='page_map-', suffix='.json', dir=BUILD_DIR)
+            pm_file = Path(name)
+            with os.fdopen(fd, 'w') as f:
+                json.dump(page_map, f)
+            logging.info(f'Wrote page_map to {pm_file} ({pm_file.stat().st_size} bytes)')
             rel_path = pm_file.relative_to(BASE_DIR)
             cmd.extend(['--input', f'page-map-file=/{rel_path}'])
         except Exception as e:
@@ -58,53 +84,117 @@ def compile_target(target, output, page_offset=None, page_map=None, extra_flags=
     if log_callback:
         log_callback(f'[compile] {target} -> {output.name}\n')
     try:
-        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        all_output = _run_streaming(cmd, target, callback=callback, log_callback=log_callback, stats=stats)
+    finally:
+        if pm_file:
+            pm_file.unlink(missing_ok=True)
+    if log_callback:
+        log_callback(f'[done] {target}\n')
+    return all_output
+
+# Seconds between cancellation checks while a compile produces no output
+CANCEL_POLL_INTERVAL = 0.1
+
+_running = set()
+_running_lock = threading.Lock()
+
+def _kill_group(proc, grace=2.0):
+    """Terminate a child and everything it spawned, escalating to SIGKILL."""
+    for sig in (signal.SIGTERM, signal.SIGKILL):
+        try:
+            os.killpg(proc.pid, sig)
+        except (ProcessLookupError, PermissionError):
+            return
+        try:
+            proc.wait(timeout=grace)
+            return
+        except subprocess.TimeoutExpired:
+            continue
+
+def terminate_running():
+    """Kill the process group of every typst compile currently in flight."""
+    with _running_lock:
+        procs = list(_running)
+    for proc in procs:
+        _kill_group(proc)
+    return len(procs)
+
+def terminate_pids(pids):
+    """Kill the process group of each running typst compile whose pid is in pids. Returns the pids killed."""
+    with _running_lock:
+        procs = [p for p in _running if p.pid in pids]
+    for proc in procs:
+        _kill_group(proc)
+    return [p.pid for p in procs]
+
+def _reap(proc, stats=None):
+    """Wait for proc, recording its CPU time and peak RSS into stats."""
+    try:
+        _, status, usage = os.wait4(proc.pid, 0)
+    except ChildProcessError:
+        proc.wait()  # Already reaped by a concurrent cancel
+        return
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    if stats is not None:
+        # ru_maxrss is KiB on Linux, bytes on macOS
+        rss = usage.ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+        stats.update(cpu=usage.ru_utime + usage.ru_stime, peak_rss=rss)
+
+def _run_streaming(cmd, target, callback=None, log_callback=None, stats=None):
+    """Run a typst command, streaming stdout/stderr as they arrive.
+
+    Pipes are multiplexed with selectors, so output is forwarded without
+    polling delay and the exit is noticed as soon as both pipes close.
+    The child runs in its own session so cancellation kills the whole group.
+    If stats is a dict it receives the child's CPU seconds and peak RSS.
+    """
+    try:
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, start_new_session=True)
     except OSError as e:
         logging.error(f'Popen failed for {target}: {e}')
         raise e
+    with _running_lock:
+        _running.add(proc)
+    if stats is not None:
+        stats['pid'] = proc.pid
     all_output = []
-    fd = proc.stderr.fileno()
-    fl = fcntl.fcntl(fd, fcntl.F_GETFL)
-    fcntl.fcntl(fd, fcntl.F_SETFL, fl | os.O_NONBLOCK)
-    fd_out = proc.stdout.fileno()
-    fl_out = fcntl.fcntl(fd_out, fcntl.F_GETFL)
-    fcntl.fcntl(fd_out, fcntl.F_SETFL, fl_out | os.O_NONBLOCK)
-    while proc.poll() is None:
-        if callback and callback() is False:
-            proc.terminate()
-            raise Exception('Build cancelled')
-        try:
-            chunk = proc.stderr.read(4096)
-            if chunk:
-                all_output.append(chunk)
-                if log_callback:
-                    log_callback(chunk)
-        except:
-            pass
-        try:
-            chunk = proc.stdout.read(4096)
-            if chunk:
-                all_output.append(chunk)
-                if log_callback:
-                    log_callback(chunk)
-        except:
-            pass
-        time.sleep(0.05)
-    stdout, stderr = proc.communicate()
-    if stderr:
-        all_output.append(stderr)
-        if log_callback:
-            log_callback(stderr)
-    if stdout:
-        all_output.append(stdout)
-        if log_callback:
-            log_callback(stdout)
+    sel = selectors.DefaultSelector()
+    decoders = {}
+    for pipe in (proc.stderr, proc.stdout):
+        sel.register(pipe, selectors.EVENT_READ)
+        decoders[pipe] = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    try:
+        while sel.get_map():
+            if callback and callback() is False:
+                _kill_group(proc)
+                raise Exception('Build cancelled')
+            for key, _ in sel.select(timeout=CANCEL_POLL_INTERVAL if callback else None):
+                data = os.read(key.fd, 65536)
+                if not data:
+                    sel.unregister(key.fileobj)
+                    chunk = decoders[key.fileobj].decode(b'', final=True)
+                else:
+                    chunk = decoders[key.fileobj].decode(data)
+                if chunk:
+                    all_output.append(chunk)
+                    if log_callback:
+                        log_callback(chunk)
+        _reap(proc, stats)
+    finally:
+        sel.close()
+        proc.stdout.close()
+        proc.stderr.close()
+        if proc.returncode is None:
+            _kill_group(proc)
+        with _running_lock:
+            _running.discard(proc)
+    if proc.returncode in (-signal.SIGTERM, -signal.SIGKILL):
+        logging.info(f'Typst compile for {target} was terminated')
+        raise TypstBuildError(f"Typst compilation for {target} was terminated", ''.join(all_output))
     if proc.returncode != 0:
         logging.error(f'Typst compilation failed for {target}. Return code: {proc.returncode}')
         logging.error(f"Output: {''.join(all_output)}")
         raise TypstBuildError(f"Typst compilation failed for {target} (Exit: {proc.returncode})", ''.join(all_output))
-    if log_callback:
-        log_callback(f'[done] {target}\n')
     return ''.join(all_output)
 
 def merge_pdfs(pdf_files, output):
@@ -150,50 +240,154 @@ def merge_pdfs(pdf_files, output):
     
     return None
 
+def render_folios(folios, extra_flags=None, build_dir=BUILD_DIR):
+    """Render deferred page numbers with one typst run of folio.typ.
+
+    Sections compiled with page-numbering=deferred carry no absolute page
+    numbers, so a pagination shift never forces a recompile. The returned
+    sheet has one page per entry of folios, overlaid at merge time. It is
+    a file of its own in build_dir, so concurrent builds never stamp from
+    each other's sheet; the caller deletes it.
+    """
+    try:
+        Path(build_dir).mkdir(parents=True, exist_ok=True)
+        fd, name = tempfile.mkstemp(prefix='folios-', suffix='.pdf', dir=build_dir)
+        os.close(fd)
+    except OSError as e:
+        logging.error(f'Folio sheet compilation failed: {e}')
+        return None
+    sheet = Path(name)
+    cmd = [TYPST_PATH, 'compile', str(FOLIO_FILE), str(sheet), '--root', str(BASE_DIR),
+           '--input', f'folios={json.dumps(list(folios))}']
+    if extra_flags:
+        cmd.extend(extra_flags)
+    try:
+        subprocess.run(cmd, check=True, capture_output=True, text=True)
+        return sheet
+    except subprocess.CalledProcessError as e:
+        logging.error(f'Folio sheet compilation failed: {e.stderr}')
+    except OSError as e:
+        logging.error(f'Folio sheet compilation failed: {e}')
+    sheet.unlink(missing_ok=True)
+    return None
+
 # Re-export BuildManager for backwards compatibility
 from .build_manager import BuildManager
 
 
-def create_pdf_metadata(chapters, page_map, output_file):
-    bookmarks = []
-    
+def extract_headings(pdf_path):
+    """Read a target PDF's outline as a list of {'title', 'depth', 'page'}.
+
+    depth is 0 for top-level entries and page is the 0-based index within
+    the target, so the result stays valid when the target's offset moves.
+    """
     try:
         import pypdf
     except ImportError:
-        logging.warning("pypdf not found, skipping deep bookmark extraction")
-        pypdf = None
+        return []
+    if not Path(pdf_path).exists():
+        return []
+    try:
+        reader = pypdf.PdfReader(pdf_path)
+        
+        def process_outline(outline_items, depth):
+            res = []
+            for item in outline_items:
+                if isinstance(item, list):
+                    res.extend(process_outline(item, depth + 1))
+                elif hasattr(item, 'title'):
+                    try:
+                        res.append({'title': item.title, 'depth': depth, 'page': reader.get_page_number(item.page)})
+                    except:
+                        pass
+            return res
+        
+        return process_outline(reader.outline, 0)
+    except Exception as e:
+        logging.error(f"Failed to extract bookmarks from {pdf_path}: {e}")
+        return []
+
 
-    def extract_bookmarks(pdf_path, base_level, start_page):
-        if not pypdf or not pdf_path.exists():
-            return []
+# Title prefix of the hidden bookmarks parser.typ places at each bundled target's start
+BUNDLE_MARKER = 'noteworthy-target:'
+
+def split_bundle(bundle_path, outputs):
+    """Split a bundle PDF into per-target PDFs at its marker bookmarks.
+
+    outputs maps target names to output paths. Returns the outline headings
+    of each target in extract_headings() form, or None if pypdf is missing
+    or any target's marker cannot be found.
+    """
+    try:
+        import pypdf
+    except ImportError:
+        return None
+    try:
+        reader = pypdf.PdfReader(bundle_path)
+        starts = {}
+        entries = []
         
-        extracted = []
-        try:
-            reader = pypdf.PdfReader(pdf_path)
-            
-            def process_outline(outline_items, current_level):
-                res = []
-                for item in outline_items:
-                    if isinstance(item, list):
-                        res.extend(process_outline(item, current_level + 1))
-                    elif hasattr(item, 'title'):
-                        try:
-                            pg = reader.get_page_number(item.page)
-                            res.append({
-                                'title': item.title,
-                                'level': current_level,
-                                'page': start_page + pg
-                            })
-                        except:
-                            pass
-                return res
-                
-            extracted = process_outline(reader.outline, base_level + 1)
-            
-        except Exception as e:
-            logging.error(f"Failed to extract bookmarks from {pdf_path}: {e}")
-            
-        return extracted
+        def walk(items, depth):
+            marker = False
+            for item in items:
+                if isinstance(item, list):
+                    # Children of a marker belong to the level the marker stands in for
+                    walk(item, depth if marker else depth + 1)
+                    continue
+                marker = False
+                if not hasattr(item, 'title'):
+                    continue
+                try:
+                    page = reader.get_page_number(item.page)
+                except:
+                    continue
+                if item.title.startswith(BUNDLE_MARKER):
+                    starts.setdefault(item.title[len(BUNDLE_MARKER):], page)
+                    marker = True
+                else:
+                    entries.append({'title': item.title, 'depth': depth, 'page': page})
+        
+        walk(reader.outline, 0)
+        if any(t not in starts for t in outputs):
+            return None
+        ordered = sorted(outputs, key=lambda t: starts[t])
+        bounds = [starts[t] for t in ordered] + [len(reader.pages)]
+        headings = {}
+        for t, start, end in zip(ordered, bounds, bounds[1:]):
+            if end <= start:
+                return None
+            writer = pypdf.PdfWriter()
+            for i in range(start, end):
+                writer.add_page(reader.pages[i])
+            out = Path(outputs[t])
+            tmp = out.with_name(f'.{out.name}.tmp')
+            with open(tmp, 'wb') as f:
+                writer.write(f)
+            os.replace(tmp, out)
+            headings[t] = [dict(h, page=h['page'] - start) for h in entries if start <= h['page'] < end]
+        return headings
+    except Exception as e:
+        logging.error(f"Failed to split bundle {bundle_path}: {e}")
+        return None
+
+
+def create_pdf_metadata(chapters, page_map, output_file, headings=None, build_dir=BUILD_DIR):
+    """Build pdftk-style bookmark lines for the merged book.
+
+    headings maps target keys to cached extract_headings() results; targets
+    missing from it are read from their PDF in build_dir.
+    """
+    bookmarks = []
+    headings = headings or {}
+
+    def extract_bookmarks(key, pdf_path, base_level, start_page):
+        found = headings.get(key)
+        if found is None:
+            found = extract_headings(pdf_path)
+        return [
+            {'title': h['title'], 'level': base_level + 1 + h['depth'], 'page': start_page + h['page']}
+            for h in found
+        ]
 
     for key, title in [('cover', 'Cover'), ('preface', 'Preface'), ('outline', 'Table of Contents')]:
         if key in page_map:
@@ -207,9 +401,9 @@ def create_pdf_metadata(chapters, page_map, output_file):
             start_pg = page_map[ch_key]
             bookmarks.extend([f'BookmarkBegin', f"BookmarkTitle: {ch['title']}", f'BookmarkLevel: 1', f"BookmarkPageNumber: {start_pg}"])
             
-            pdf_path = BUILD_DIR / f'10_chapter_{ch_id}_cover.pdf'
+            pdf_path = Path(build_dir) / f'10_chapter_{ch_id}_cover.pdf'
             
-            sub_marks = extract_bookmarks(pdf_path, 1, start_pg)
+            sub_marks = extract_bookmarks(ch_key, pdf_path, 1, start_pg)
             for sm in sub_marks:
                 bookmarks.extend([f'BookmarkBegin', f"BookmarkTitle: {sm['title']}", f'BookmarkLevel: {sm["level"]}', f"BookmarkPageNumber: {sm['page']}"])
 
@@ -220,15 +414,38 @@ def create_pdf_metadata(chapters, page_map, output_file):
                 start_pg = page_map[key]
                 bookmarks.extend([f'BookmarkBegin', f"BookmarkTitle: {p['title']}", f'BookmarkLevel: 2', f"BookmarkPageNumber: {start_pg}"])
                 
-                pdf_path = BUILD_DIR / f'20_page_{ch_id}_{pg_id}.pdf'
+                pdf_path = Path(build_dir) / f'20_page_{ch_id}_{pg_id}.pdf'
                 
-                sub_marks = extract_bookmarks(pdf_path, 2, start_pg)
+                sub_marks = extract_bookmarks(key, pdf_path, 2, start_pg)
                 for sm in sub_marks:
                     bookmarks.extend([f'BookmarkBegin', f"BookmarkTitle: {sm['title']}", f'BookmarkLevel: {sm["level"]}', f"BookmarkPageNumber: {sm['page']}"])
                         
     Path(output_file).write_text('\n'.join(bookmarks))
     return bookmarks
 
+def _add_outline(writer, bookmarks_list):
+    """Add pdftk-style bookmark lines to a pypdf writer as a nested outline."""
+    parents = {0: None}
+    
+    i = 0
+    while i < len(bookmarks_list):
+        line = bookmarks_list[i]
+        if line == 'BookmarkBegin':
+            try:
+                t = bookmarks_list[i+1].split(': ', 1)[1]
+                l = int(bookmarks_list[i+2].split(': ', 1)[1])
+                pg = int(bookmarks_list[i+3].split(': ', 1)[1])
+                
+                parent = parents.get(l - 1, None)
+                
+                parents[l] = writer.add_outline_item(t, pg - 1, parent)
+                
+                i += 4
+            except:
+                i += 1
+        else:
+            i += 1
+
 def apply_metadata_pypdf(pdf, bookmarks_list, title, author):
     try:
         import pypdf
@@ -240,28 +457,7 @@ def apply_metadata_pypdf(pdf, bookmarks_list, title, author):
             '/Author': author,
             '/Creator': 'Typst Noteworthy'
         })
-        
-        parents = {0: None}
-        
-        i = 0
-        while i < len(bookmarks_list):
-            line = bookmarks_list[i]
-            if line == 'BookmarkBegin':
-                try:
-                    t = bookmarks_list[i+1].split(': ', 1)[1]
-                    l = int(bookmarks_list[i+2].split(': ', 1)[1])
-                    pg = int(bookmarks_list[i+3].split(': ', 1)[1])
-                    
-                    parent = parents.get(l - 1, None)
-                    
-                    parents[l] = writer.add_outline_item(t, pg - 1, parent)
-                    
-                    i += 4
-                except:
-                    i += 1
-            else:
-                i += 1
-                
+        _add_outline(writer, bookmarks_list)
         writer.write(pdf)
         return True
     except Exception as e:
@@ -307,4 +503,164 @@ def zip_build_directory(build_dir, output='build_pdfs.zip'):
         for root, _, files in os.walk(build_dir):
             for f in files:
                 path = Path(root) / f
-                z.write(path, path.relative_to(build_dir.parent))
\ No newline at end of file
+                z.write(path, path.relative_to(build_dir.parent))
+
+# Page attributes carried over when a page is replaced in place
+_SPLICE_KEYS = ('/Contents', '/Resources', '/MediaBox', '/CropBox', '/BleedBox', '/TrimBox', '/ArtBox',
+                '/Rotate', '/Group', '/UserUnit', '/Annots')
+
+def _has_internal_links(page):
+    for annot in page.get('/Annots') or []:
+        a = annot.get_object()
+        action = a.get('/A')
+        if '/Dest' in a or (action is not None and action.get_object().get('/S') == '/GoTo'):
+            return True
+    return False
+
+def splice_pdf(output, replacements, stamps=None):
+    """Replace pages of output through an incremental update instead of a rewrite.
+
+    replacements is a list of (page index in output, source PDF, page index
+    in source). stamps optionally maps output page indices to pages merged on
+    top (deferred page numbers). Existing page objects are reused, so the
+    outline and document info stay valid. Returns False when the pages cannot
+    be spliced (e.g. they carry internal links), leaving output untouched.
+    """
+    try:
+        import pypdf
+        from pypdf.generic import NameObject, ArrayObject
+    except ImportError:
+        return False
+    tmp = Path(output).with_name(f'.{Path(output).name}.tmp')
+    try:
+        writer = pypdf.PdfWriter(output, incremental=True)
+        readers = {}
+        for index, source, source_index in replacements:
+            if source not in readers:
+                readers[source] = pypdf.PdfReader(source)
+            new = readers[source].pages[source_index]
+            if _has_internal_links(new):
+                return False
+            page = writer.pages[index]
+            for k in _SPLICE_KEYS:
+                key = NameObject(k)
+                if k not in new:
+                    page.pop(key, None)
+                elif k == '/Annots':
+                    page[key] = ArrayObject(a.clone(writer, ignore_fields=('/P',)) for a in new.raw_get(k).get_object())
+                else:
+                    page[key] = new.raw_get(k).clone(writer)
+            if stamps and index in stamps:
+                page.merge_page(stamps[index])
+        with open(tmp, 'wb') as f:
+            writer.write(f)
+        os.replace(tmp, output)
+        return True
+    except Exception as e:
+        logging.error(f'Incremental update of {output} failed: {e}')
+        tmp.unlink(missing_ok=True)
+        return False
+
+def resubset_fonts(output):
+    """Rewrite output through ghostscript to re-subset fonts across the whole document.
+
+    The result is kept only when it is smaller and still has every page
+    and outline entry. Returns the number of bytes saved, or None if skipped.
+    """
+    if not shutil.which('gs'):
+        logging.warning('ghostscript not found, skipping font re-subsetting')
+        return None
+    output = Path(output)
+    tmp = output.with_name(f'.{output.name}.gs.tmp')
+    try:
+        subprocess.run([
+            'gs', '-dBATCH', '-dNOPAUSE', '-dSAFER', '-q', '-sDEVICE=pdfwrite',
+            '-dSubsetFonts=true', '-dCompressFonts=true', '-dDetectDuplicateImages=true',
+            '-dAutoRotatePages=/None', '-dPreserveAnnots=true',
+            f'-sOutputFile={tmp}', str(output)
+        ], check=True, capture_output=True)
+        before, after = output.stat().st_size, tmp.stat().st_size
+        if after >= before or not _same_structure(output, tmp):
+            tmp.unlink(missing_ok=True)
+            return 0
+        os.replace(tmp, output)
+        return before - after
+    except Exception as e:
+        logging.error(f'Font re-subsetting failed: {e}')
+        tmp.unlink(missing_ok=True)
+        return None
+
+def _same_structure(a, b):
+    try:
+        import pypdf
+    except ImportError:
+        return count_pages(a) == count_pages(b)
+    ra, rb = pypdf.PdfReader(a), pypdf.PdfReader(b)
+    
+    def size(items):
+        return sum(size(i) if isinstance(i, list) else 1 for i in items)
+    return len(ra.pages) == len(rb.pages) and size(ra.outline) == size(rb.outline)
+
+def finalize_pdf(pdf_files, output, bookmarks_list, title, author, bookmarks_file=None, folios=None, folio_flags=None, phase=None, dedupe=True, folio_sheet=None, build_dir=BUILD_DIR):
+    """Merge per-target PDFs and write outline, document info and page numbers in one pass.
+
+    StreamingMerge copies one input at a time into a temporary file that
+    replaces output, so peak memory is that of the largest target rather
+    than the whole book. pdfunite and gs are only used (through merge_pdfs
+    followed by apply_pdf_metadata) when pypdf is missing, since adding the
+    outline after them means rewriting the file again.
+    phase, if given, is a context manager factory used to time each step.
+    dedupe collapses the fonts, images and ICC profiles every target embeds.
+    folio_sheet, as (path, [(page index, sheet page index)]), stamps pages from
+    an already rendered sheet instead of rendering folios in build_dir.
+    Returns the method used, or None on failure.
+    """
+    phase = phase or (lambda name: contextlib.nullcontext())
+    files = [p for p in pdf_files if Path(p).exists()]
+    if not files:
+        return None
+    try:
+        import pypdf
+    except ImportError:
+        if folios or folio_sheet:
+            logging.error("pypdf is required to stamp deferred page numbers")
+        with phase('merge'):
+            method = merge_pdfs(files, output)
+        if method and bookmarks_file:
+            with phase('metadata'):
+                apply_pdf_metadata(output, bookmarks_file, title, author, bookmarks_list)
+        return method
+    from .pdf_stream import StreamingMerge
+    
+    tmp = Path(output).with_name(f'.{Path(output).name}.tmp')
+    sheet = None
+    try:
+        stamps = {}
+        if folios:
+            with phase('folios'):
+                sheet = render_folios(folios, folio_flags, build_dir)
+                if sheet:
+                    pages = pypdf.PdfReader(sheet).pages
+                    stamps = {n - 1: stamp for n, stamp in zip(folios, pages)}
+        elif folio_sheet:
+            pages = pypdf.PdfReader(folio_sheet[0]).pages
+            stamps = {index: pages[sheet_index] for index, sheet_index in folio_sheet[1]}
+        
+        with phase('merge'), open(tmp, 'wb') as out_file:
+            merge = StreamingMerge(out_file, dedupe=dedupe)
+            start = 0
+            for f in files:
+                local = {i - start: s for i, s in stamps.items() if i >= start}
+                start += merge.append(f, local)
+            merge.close(bookmarks_list, {'/Title': title, '/Author': author, '/Creator': 'Typst Noteworthy'})
+        if merge.deduped:
+            logging.info(f'Deduplicated {merge.deduped} PDF objects')
+        os.replace(tmp, output)
+        return 'stream'
+    except Exception as e:
+        logging.error(f'Single-pass merge failed: {e}')
+        tmp.unlink(missing_ok=True)
+    finally:
+        if sheet:
+            sheet.unlink(missing_ok=True)
+    return None
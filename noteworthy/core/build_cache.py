@@ -0,0 +1,168 @@
+# Build Cache - Content-addressed reuse of per-target PDFs
+
+import os
+import json
+import shutil
+import hashlib
+import threading
+from pathlib import Path
+
+from ..config import BASE_DIR, BUILD_DIR, CACHE_DIR, SYSTEM_CONFIG_DIR, METADATA_FILE, COVER_MODULE_DIR
+from .depgraph import DependencyIndex, SHARED_TREES, resolve_ref
+
+TARGETS_DIR = CACHE_DIR / 'targets'
+
+# Trees hashed as a whole for the base key
+SHARED_EXCLUDES = (BUILD_DIR, SYSTEM_CONFIG_DIR)
+
+_digest_memo = {}
+_digest_lock = threading.Lock()
+
+
+def file_digest(path):
+    """SHA-256 of a file, memoized by (path, mtime, size)."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    memo_key = (str(path), st.st_mtime_ns, st.st_size)
+    with _digest_lock:
+        cached = _digest_memo.get(memo_key)
+    if cached:
+        return cached
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    digest = h.hexdigest()
+    with _digest_lock:
+        _digest_memo[memo_key] = digest
+    return digest
+
+
+class BuildCache:
+    """Maps a hash of each target's real inputs to a previously compiled PDF."""
+
+    def __init__(self, cache_dir=TARGETS_DIR, index=None):
+        self.cache_dir = Path(cache_dir)
+        self.index = index or DependencyIndex()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.claims = {}
+
+    def base_key(self, flags):
+        """Hash of the inputs shared by every target: templates, config and typst flags."""
+        from .build import TYPST_PATH
+        h = hashlib.sha256()
+        for tree in SHARED_TREES:
+            root = BASE_DIR / tree
+            for dirpath, dirnames, filenames in os.walk(root):
+                d = Path(dirpath)
+                dirnames[:] = sorted(n for n in dirnames if d / n not in SHARED_EXCLUDES)
+                for name in sorted(filenames):
+                    p = d / name
+                    h.update(str(p.relative_to(BASE_DIR)).encode())
+                    h.update((file_digest(p) or '').encode())
+        h.update(json.dumps(list(flags)).encode())
+        typst = shutil.which(TYPST_PATH) or TYPST_PATH
+        try:
+            st = os.stat(typst)
+            h.update(f'{typst}:{st.st_size}:{st.st_mtime_ns}'.encode())
+        except OSError:
+            h.update(typst.encode())
+        return h.hexdigest()
+
+    def target_key(self, base, target, source=None, page_offset=None, extra=None):
+        """Hash of a single target's inputs layered over the shared base key."""
+        h = hashlib.sha256()
+        h.update(base.encode())
+        h.update(f'target={target}\0offset={page_offset}\0'.encode())
+        deps = self.index.closure(source) if source else []
+        if target == 'cover':
+            logo = _cover_logo()
+            if logo:
+                deps.append(logo)
+        for p in deps:
+            h.update(str(p).encode())
+            h.update((file_digest(p) or '').encode())
+        if extra is not None:
+            h.update(json.dumps(extra, sort_keys=True).encode())
+        return h.hexdigest()
+
+    def path_for(self, key):
+        return self.cache_dir / f'{key}.pdf'
+
+    def restore(self, key, output):
+        """Copy the cached PDF for key to output. Returns True on a hit."""
+        cached = self.path_for(key)
+        if not cached.exists():
+            with self.lock:
+                self.misses += 1
+            return False
+        try:
+            shutil.copyfile(cached, output)
+            os.utime(cached)
+        except OSError:
+            with self.lock:
+                self.misses += 1
+            return False
+        with self.lock:
+            self.hits += 1
+        return True
+
+    def store(self, key, output):
+        """Atomically copy a freshly compiled PDF into the cache."""
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp = self.cache_dir / f'.{key}.{os.getpid()}.{threading.get_ident()}.tmp'
+            shutil.copyfile(output, tmp)
+            os.replace(tmp, self.path_for(key))
+        except OSError:
+            pass
+
+    def claim(self, key):
+        """Claim the compile of key. Returns None to compile it, or an Event set when the holder is done."""
+        with self.lock:
+            if key in self.claims:
+                return self.claims[key]
+            self.claims[key] = threading.Event()
+            return None
+
+    def settle(self, key):
+        """Release a claim taken with claim(), waking everything waiting on it."""
+        with self.lock:
+            done = self.claims.pop(key, None)
+        if done:
+            done.set()
+
+    def prune(self, max_bytes=512 * 1024 * 1024):
+        """Drop least recently used entries until the cache fits in max_bytes."""
+        if not self.cache_dir.exists():
+            return
+        entries = []
+        for p in self.cache_dir.glob('*.pdf'):
+            try:
+                st = p.stat()
+                entries.append((st.st_mtime, st.st_size, p))
+            except OSError:
+                pass
+        total = sum(e[1] for e in entries)
+        for _, size, p in sorted(entries):
+            if total <= max_bytes:
+                break
+            try:
+                p.unlink()
+                total -= size
+            except OSError:
+                pass
+
+
+def _cover_logo():
+    try:
+        logo = json.loads(METADATA_FILE.read_text()).get('logo')
+    except Exception:
+        return None
+    if not logo:
+        return None
+    return resolve_ref(logo, COVER_MODULE_DIR / 'main-cover.typ')
@@ -1,41 +1,111 @@
 # Build Manager - Parallel build orchestration
 
 import os
+import re
 import json
+import hashlib
+import time
+import logging
 import threading
+import contextlib
 import concurrent.futures
 from pathlib import Path
 
-from ..config import PREFACE_FILE
+from ..config import BASE_DIR, PREFACE_FILE, CACHE_DIR
 from ..utils import scan_content
+from .build_cache import BuildCache
+from .build_state import BuildState
+from .journal import BuildJournal
+from .depgraph import DependencyIndex, ALL
+from .scheduler import DurationScheduler, SlotGate
+from .variants import ConfigUsage
+from .profiler import BuildProfiler
+from .governor import MemoryGovernor, parse_size, default_budget, format_size
+from .images import prepare_images, touches_images, DEFAULT_DPI
+
+# Compile granularities: one process per section, per chapter or for the whole book
+GRANULARITIES = ('section', 'chapter', 'book')
+
+# What a failed target does to the rest of the pass
+ERROR_POLICIES = ('fail-fast', 'keep-going')
+
+# The table of contents: compiled once, after pagination converges, against the final page map
+TOC_KEY = 'outline'
+
+# Bytes appended by incremental updates, as a fraction of the last full merge, before merging afresh
+SPLICE_GROWTH = 0.5
+
+# Seconds between sweeps for compiles that started while a failed pass was being stopped
+STOP_POLL_INTERVAL = 0.02
 
 
 class BuildManager:
-    """Manages parallel PDF compilation with page offset tracking."""
+    """Manages parallel PDF compilation with page offset tracking.
+    
+    A variant build (see build_matrix) keeps its own records in the build
+    state and takes the cache, dependency index, compile slots and memory
+    governor from shared, so several variants run as one scheduled build.
+    """
     
-    def __init__(self, build_dir):
+    def __init__(self, build_dir, variant=None, shared=None):
         self.build_dir = build_dir
-        self.cache_file = build_dir / 'page_cache.json'
+        self.variant = variant
+        self.shared = shared or {}
+        self.state = BuildState(namespace=variant)
+        self.index = self.shared.get('index') or DependencyIndex(self.state)
         self.page_counts = self._load_cache()
         self.page_map = {}
         self.current_offset = 1
         self.lock = threading.Lock()
+        self.cache = self.shared.get('cache') or BuildCache(index=self.index)
+        self.slots = self.shared.get('slots')
+        self.usage = self.shared.get('usage')
+        self.overrides = {}
+        self.override_flags = []
+        self.relevant = {}
+        self.estimates = {}
+        self.base_key = None
+        self.use_cache = True
+        self.journal = BuildJournal(build_dir)
+        self.resume = False
+        self.deferred = False
+        self.folios = []
+        self.stamp_flags = []
+        self.sources = {}
+        self.input_keys = {}
+        self.headings = {}
+        self.predicted_makespan = 0.0
+        self.profiler = None
+        self.iteration = 0
+        self.passes = 0
+        self.on_error = 'fail-fast'
+        self.abort = threading.Event()
+        self.failures = []
+        self.inflight = {}
+        self.max_workers = 1
+        self.granularity = 'section'
+        self.pool = None
+        self.governor = None
+        self.image_dpi = None
+        self.targets = []
+        self.dedupe = True
+        self.toc_seconds = 0.0
+        self.resubset = False
+        self.root = None
+        self.root_dpi = None
+        self.base_flags = None
+        self.built = {}
+        self.affected = ALL
+        self.restored = 0
+        self.compiled = 0
         
     def _load_cache(self):
-        """Load page count cache from previous builds."""
-        if self.cache_file.exists():
-            try:
-                return json.loads(self.cache_file.read_text())
-            except:
-                pass
-        return {}
+        """Load page counts recorded by previous builds."""
+        return self.state.page_counts()
         
     def save_cache(self):
-        """Persist page count cache for future builds."""
-        try:
-            self.cache_file.write_text(json.dumps(self.page_counts))
-        except:
-            pass
+        """Persist page counts for future builds."""
+        self.state.record_page_counts(self.page_counts)
             
     def get_predicted_count(self, key):
         """Get predicted page count for a target (from cache or default 1)."""
@@ -58,27 +128,73 @@ class BuildManager:
             
         Returns:
             List of paths to generated PDFs in order
-        """
-        max_workers = opts.get('threads', os.cpu_count() or 1)
-        flags = opts.get('typst_flags', [])
-        
-        # Use provided folders if available, otherwise scan
-        ch_folders = opts.get('ch_folders')
-        pg_folders = opts.get('pg_folders')
-        
-        if not ch_folders or not pg_folders:
-            ch_folders, pg_folders = scan_content()
         
-        # Add folder info to flags (passed to all compile calls)
-        folder_flags = flags.copy()
-        folder_flags.extend(['--input', f'chapter-folders={json.dumps(ch_folders)}'])
-        folder_flags.extend(['--input', f'page-folders={json.dumps(pg_folders)}'])
+        A manager kept alive between builds (--watch) reuses its previous
+        results: with opts['changed'] listing the paths changed since then,
+        section PDFs outside the affected set stay in place without being
+        re-keyed, and the shared key and image root are recomputed only
+        when templates, config or images changed.
+        """
+        max_workers, folder_flags, ch_folders, pg_folders = self._configure(opts, callbacks)
+        # Only a build that finishes leaves targets the next one may keep as they are
+        built, self.built = self.built, {}
+        self.restored = self.compiled = 0
+        self.profiler = BuildProfiler() if opts.get('profile') else None
         
         # Build task list
         callbacks.get('on_log', lambda m, o: None)(f"Building {len(chapters)} chapters (parallel)", True)
         tasks = self._create_task_list(chapters, config, opts, ch_folders, pg_folders)
         callbacks.get('on_log', lambda m, o: None)(f"Generated {len(tasks)} tasks", True)
         
+        # Re-parse only the sources that changed since the last build's dependency index
+        with self.phase('index'):
+            reparsed = 0 if self.shared else self.index.update()
+            self.index.set_targets(self.sources)
+            self.state.record_sources(self.sources)
+        if reparsed:
+            logging.info(f"Dependency index: re-parsed {reparsed} sources")
+        changed = opts.get('changed')
+        # A changed directory (new chapter, lost watch events) may hide files the index never saw
+        if changed is None or not built or any(Path(c).is_dir() for c in changed):
+            self.affected = ALL
+        else:
+            self.affected = self.index.affected(changed)
+        
+        # Downscaled image variants, compiled against a mirror of the project root
+        image_dpi = self.image_dpi
+        if self.affected == ALL or self.root_dpi != image_dpi or touches_images(changed):
+            self.root, self.root_dpi = None, image_dpi
+            if image_dpi:
+                with self.phase('images'):
+                    self.root = prepare_images(image_dpi, callbacks.get('on_log'))
+        
+        # Long-lived typst watch processes keep fonts and templates warm between targets
+        self.pool = None
+        if opts.get('warm_workers'):
+            from .workers import get_pool
+            self.pool = get_pool(max_workers, folder_flags, self.root)
+        
+        # Admit compiles only while their learned memory footprints fit the budget
+        self.governor = self.shared.get('governor') or self._make_governor(opts, callbacks)
+        
+        # Shared part of every target's input key (templates, config, flags)
+        base_flags = (self.key_flags, self.image_dpi, bool(opts.get('cache', True)))
+        if self.affected == ALL or self.base_flags != base_flags:
+            self.base_key = self._base_key(folder_flags, opts)
+            self.base_flags = base_flags
+        if self.affected != ALL:
+            built = {k: v for k, v in built.items() if k not in self.affected}
+        else:
+            built = {}
+        
+        # Checkpoints of finished targets; a resumed build keeps the previous run's
+        self.resume = bool(opts.get('resume'))
+        if self.resume:
+            journaled = self.journal.load()
+            callbacks.get('on_log', lambda m, o: None)(f"Resuming: {journaled} targets finished by the previous run", True)
+        elif not built:
+            self.journal.reset()
+        
         task_map = {t[0]: t for t in tasks}
         ordered_keys = [t[0] for t in tasks]
         
@@ -89,31 +205,512 @@ class BuildManager:
             projected_offsets[key] = current
             current += self.get_predicted_count(key)
             
+        # The TOC only takes part in the passes to measure its length when no build has yet
+        toc = task_map.get(TOC_KEY)
+        sized = toc is not None and self._toc_reserved()
+        
         # Iterative build with pagination correction
         iteration = 0
         while True:
             iteration += 1
+            self.iteration = iteration
             callbacks.get('on_log', lambda m, o: None)(f"Build Pass {iteration}...", True)
             
             to_run = list(ordered_keys) if iteration == 1 else self._get_dirty_tasks(ordered_keys, projected_offsets, callbacks)
+            to_run = [k for k in to_run if k != TOC_KEY or (iteration == 1 and not sized)]
             
             if not to_run and iteration > 1:
                 break
+            self.passes = iteration
                 
-            self._execute_parallel(to_run, task_map, projected_offsets, folder_flags, max_workers, callbacks)
+            with self.phase(f'pass {iteration}'):
+                self._execute_parallel(to_run, task_map, projected_offsets, folder_flags, max_workers, callbacks, built)
             
+            # Offsets are not baked into deferred targets, so a shift costs nothing
+            if self.deferred:
+                projected_offsets = self._recalc_offsets(ordered_keys)
+                break
+                
             if iteration > 3:
                 callbacks.get('on_log', lambda m, o: None)("Max retries reached. Pagination might be unstable.", False)
                 break
-                
-            # Recalculate offsets for next iteration
-            if iteration == 1:
-                projected_offsets = self._recalc_offsets(ordered_keys)
+        
+        if toc:
+            projected_offsets = self._toc_stage(toc, ordered_keys, task_map, projected_offsets, folder_flags, max_workers, callbacks)
                 
         self.save_cache()
+        if self.use_cache:
+            if self.restored:
+                callbacks.get('on_log', lambda m, o: None)(
+                    f"Reused {self.restored} cached targets, compiled {self.compiled}", True
+                )
+            if not self.shared:
+                self.cache.prune()
+        if self.pool:
+            callbacks.get('on_log', lambda m, o: None)(self.pool.summary(), True)
+        if self.governor and not self.shared:
+            self.governor.close()
+            callbacks.get('on_log', lambda m, o: None)(self.governor.summary(), True)
         self.page_map = projected_offsets
+        self.folios = []
+        if self.deferred:
+            for key in ordered_keys:
+                if task_map[key][1] == 'section':
+                    start = projected_offsets[key]
+                    self.folios.extend(range(start, start + self.get_predicted_count(key)))
+        self.targets = [(k, task_map[k][3]) for k in ordered_keys]
+        self.built = {
+            k: (self.input_keys.get(k), None if self.deferred else projected_offsets[k])
+            for k in ordered_keys if k in self.sources and self.input_keys.get(k)
+        }
         return [task_map[k][3] for k in ordered_keys]
     
+    def plan(self, chapters, config, opts, callbacks=None):
+        """Resolve the task list without compiling and predict what a build would do.
+
+        Each target is 'cached' (its PDF is in the build cache), 'stale'
+        (built before, inputs changed) or 'new'. A second pagination pass is
+        expected when a target that must compile has no recorded page count,
+        since everything after it may shift. Times come from recorded
+        durations via the scheduler. The TOC is keyed on the projected page
+        map, as the TOC stage will compile it, and its time is added after the
+        passes since it only starts once pagination converges.
+        """
+        callbacks = callbacks or {}
+        quiet = {'on_log': lambda m, o: None}
+        max_workers, folder_flags, ch_folders, pg_folders = self._configure(opts, quiet)
+        tasks = self._create_task_list(chapters, config, opts, ch_folders, pg_folders)
+        task_map = {t[0]: t for t in tasks}
+        ordered_keys = [t[0] for t in tasks]
+        self.base_key = self._base_key(folder_flags, opts)
+        records = self.state.all()
+        scheduler = DurationScheduler(records, self.sources)
+        
+        targets, misses = [], []
+        offsets = self._recalc_offsets(ordered_keys)
+        for key in ordered_keys:
+            t_data = task_map[key]
+            offset = offsets[key]
+            record = records.get(key)
+            status = 'new' if not record or not (record.get('duration') or record.get('page_count')) else 'stale'
+            if self.use_cache:
+                if key == TOC_KEY:
+                    input_key = self._toc_key(offsets)
+                else:
+                    input_key = self._target_key(key, t_data[2], None if self.deferred else offset)
+                if self.cache.path_for(input_key).exists():
+                    status = 'cached'
+            if status != 'cached':
+                misses.append(key)
+            targets.append({
+                'key': key, 'type': t_data[1], 'label': t_data[4], 'status': status,
+                'offset': offset, 'pages': self.page_counts.get(key),
+                'estimate': round(scheduler.estimate(key), 3),
+            })
+        
+        # Targets after the first compile with an unknown page count are likely to shift
+        passes, repaginated = 1, []
+        if not self.deferred:
+            unknown = [i for i, k in enumerate(ordered_keys) if k in misses and k not in self.page_counts]
+            if unknown and unknown[0] < len(ordered_keys) - 1:
+                passes = 2
+                repaginated = ordered_keys[unknown[0] + 1:]
+        
+        # Without a reserved page count the TOC is also compiled in the first pass to measure it
+        in_passes = [k for k in misses if k != TOC_KEY]
+        if TOC_KEY in task_map and not self._toc_reserved():
+            in_passes.append(TOC_KEY)
+        repaginated = [k for k in repaginated if k != TOC_KEY]
+        toc = scheduler.estimate(TOC_KEY) if TOC_KEY in misses else 0.0
+        first = scheduler.makespan(self._plan_units(in_passes, task_map, scheduler, max_workers, quiet), max_workers) + toc
+        second = scheduler.makespan(self._plan_units(repaginated, task_map, scheduler, max_workers, quiet), max_workers)
+        full = scheduler.makespan(self._plan_units(ordered_keys, task_map, scheduler, max_workers, quiet), max_workers)
+        counts = {s: sum(1 for t in targets if t['status'] == s) for s in ('cached', 'stale', 'new')}
+        callbacks.get('on_log', lambda m, o: None)(
+            f"Plan: {counts['cached']} cached, {counts['stale']} stale, {counts['new']} new; "
+            f"{passes} pass{'es' if passes > 1 else ''}, about {first + second:.1f}s on {max_workers} workers", True
+        )
+        return {
+            'threads': max_workers,
+            'granularity': self.granularity,
+            'numbering': 'deferred' if self.deferred else 'inline',
+            'cache': self.use_cache,
+            'counts': counts,
+            'passes': passes,
+            'repaginated': len(repaginated),
+            'estimated_seconds': round(first + second, 1),
+            'full_pass_seconds': round(full, 1),
+            'targets': targets,
+        }
+    
+    def _configure(self, opts, callbacks):
+        """Resolve worker count, shared typst flags and build modes from opts.
+
+        Returns (max_workers, folder_flags, ch_folders, pg_folders).
+        """
+        max_workers = opts.get('threads', os.cpu_count() or 1)
+        self.max_workers = max_workers
+        flags = opts.get('typst_flags', [])
+        
+        # Use provided folders if available, otherwise scan
+        ch_folders = opts.get('ch_folders')
+        pg_folders = opts.get('pg_folders')
+        
+        if not ch_folders or not pg_folders:
+            ch_folders, pg_folders = scan_content()
+        
+        # Add folder info to flags (passed to all compile calls)
+        folder_flags = flags.copy()
+        folder_flags.extend(['--input', f'chapter-folders={json.dumps(ch_folders)}'])
+        folder_flags.extend(['--input', f'page-folders={json.dumps(pg_folders)}'])
+        
+        # Deferred numbering: compile without absolute page numbers, stamp them at merge
+        self.deferred = opts.get('page_numbering') == 'deferred' and self._can_stamp(callbacks)
+        if self.deferred:
+            folder_flags.extend(['--input', 'page-numbering=deferred'])
+        # Draft: canvases render as sized placeholders; part of the cache key so drafts never replace real figures
+        if opts.get('draft'):
+            folder_flags.extend(['--input', 'draft=true'])
+        self.stamp_flags = list(flags)
+        self.dedupe = opts.get('dedupe', True)
+        self.resubset = opts.get('resubset_fonts', False)
+        self.image_dpi = None if opts.get('original_images') else opts.get('image_dpi') or DEFAULT_DPI
+        
+        # Config overrides of a variant reach typst as an input but only enter the cache
+        # keys of targets that can depend on them (see _target_key)
+        self.overrides = opts.get('config_overrides') or {}
+        self.override_flags = ['--input', f'config-overrides={json.dumps(self.overrides)}'] if self.overrides else []
+        self.relevant = {}
+        self.key_flags = list(folder_flags)
+        folder_flags.extend(self.override_flags)
+        
+        self.on_error = opts.get('on_error') if opts.get('on_error') in ERROR_POLICIES else 'fail-fast'
+        self.abort.clear()
+        self.failures = []
+        
+        # Bundled compiles are split with pypdf, so without it stay one process per target
+        self.granularity = opts.get('granularity', 'section')
+        if self.granularity != 'section' and not self._can_split(callbacks):
+            self.granularity = 'section'
+        return max_workers, folder_flags, ch_folders, pg_folders
+    
+    def _base_key(self, folder_flags, opts):
+        self.use_cache = bool(opts.get('cache', True))
+        return self.cache.base_key(self.key_flags + [f'image-dpi={self.image_dpi}'])
+    
+    def _relevant_overrides(self, key):
+        """The overrides a target's output can depend on: all of them for front matter and chapter covers."""
+        if not self.overrides:
+            return None
+        if key not in self.relevant:
+            source = self.sources.get(key)
+            if source is None:
+                self.relevant[key] = dict(self.overrides)
+            else:
+                self.usage = self.usage or ConfigUsage()
+                self.relevant[key] = self.usage.relevant(self.overrides, self.index.closure(source))
+        return self.relevant[key] or None
+    
+    def _target_key(self, key, target, offset):
+        if key == TOC_KEY:
+            offset = None  # TOC compiles in the passes only measure its length
+        return self.cache.target_key(self.base_key, target, self.sources.get(key), offset,
+                                     extra=self._relevant_overrides(key))
+    
+    def _make_governor(self, opts, callbacks):
+        budget = opts.get('memory_budget')
+        try:
+            budget = parse_size(budget) if budget not in (None, '') else default_budget()
+        except ValueError:
+            callbacks.get('on_log', lambda m, o: None)(f"Invalid memory budget {budget!r}, using default", False)
+            budget = default_budget()
+        if not budget:
+            return None
+        callbacks.get('on_log', lambda m, o: None)(f"Memory budget {format_size(budget)}", True)
+        footprints = {k: r.get('peak_rss') for k, r in self.state.all().items()}
+        return MemoryGovernor(budget, footprints, callbacks.get('on_log'))
+    
+    def _can_split(self, callbacks):
+        try:
+            import pypdf
+            return True
+        except ImportError:
+            callbacks.get('on_log', lambda m, o: None)("pypdf not installed, compiling one process per target", False)
+            return False
+    
+    def _can_stamp(self, callbacks):
+        try:
+            import pypdf
+            return True
+        except ImportError:
+            callbacks.get('on_log', lambda m, o: None)("pypdf not installed, using inline page numbers", False)
+            return False
+            
+    def phase(self, name):
+        """Context manager timing a build phase when profiling, a no-op otherwise."""
+        if self.profiler:
+            return self.profiler.phase(name)
+        return contextlib.nullcontext()
+    
+    def write_profile(self, output):
+        """Write the profile and trace next to output. Returns their paths, or None when not profiling."""
+        if not self.profiler:
+            return None
+        return self.profiler.write(output, workers=self.max_workers)
+            
+    def finalize(self, pdfs, output, chapters, title, author):
+        """Merge built targets into output with outline, metadata and page numbers in one pass."""
+        from .build import create_pdf_metadata, finalize_pdf, resubset_fonts
+        bm_file = self.build_dir / 'bookmarks.txt'
+        with self.phase('outline'):
+            bookmarks_list = create_pdf_metadata(chapters, self.page_map, bm_file, headings=self.headings,
+                                                 build_dir=self.build_dir)
+        folios = self.folios if self.deferred else None
+        manifest = self._merge_manifest(pdfs, title, author, bookmarks_list, folios)
+        method = self._update_in_place(output, manifest)
+        if not method:
+            method = finalize_pdf(
+                pdfs, output, bookmarks_list, title, author, bookmarks_file=bm_file,
+                folios=folios, folio_flags=self.stamp_flags, phase=self.phase, dedupe=self.dedupe,
+                build_dir=self.build_dir
+            )
+        if method and method != 'unchanged' and self.resubset:
+            with self.phase('resubset'):
+                if resubset_fonts(output):
+                    manifest.pop('base', None)  # Rewritten compactly, nothing appended any more
+        self._save_manifest(output, manifest if method else None)
+        return method
+    
+    def export_bundles(self, output_dir, chapters, title, author, by='chapter', workers=None, callbacks=None):
+        """Write a standalone PDF per chapter (cover and sections) or per section from the built targets.
+        
+        Bundles are sliced from the same artifacts and page map as the book,
+        so they keep its page numbers, and each gets its own outline and
+        document info. Nothing is recompiled; the merges run in parallel
+        worker processes. Returns the paths written.
+        """
+        from .build import create_pdf_metadata, finalize_pdf, render_folios
+        log = (callbacks or {}).get('on_log', lambda m, o: None)
+        paths = dict(self.targets)
+        bundles = []
+        for ci, ch in chapters:
+            sections = [(ai, p, f'{ci}/{ai}') for ai, p in enumerate(ch['pages'])]
+            sections = [s for s in sections if s[2] in self.page_map and Path(paths.get(s[2], '')).exists()]
+            if by == 'chapter':
+                keys = [f'chapter-{ci}'] * (f'chapter-{ci}' in self.page_map) + [k for _, _, k in sections]
+                if sections:
+                    bundles.append((f"{ci + 1:02d}-{_slug(ch['title'])}", ch['title'], (ci, ch), keys))
+            else:
+                for ai, p, key in sections:
+                    bundles.append((f"{ci + 1:02d}-{ai + 1:02d}-{_slug(p['title'])}", p['title'], (ci, ch), [key]))
+        if not bundles:
+            return []
+        
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        numbered = {}
+        sheet = None
+        if self.deferred and self.folios:
+            with self.phase('folios'):
+                sheet = render_folios(self.folios, self.stamp_flags, self.build_dir)
+            numbered = {n: i for i, n in enumerate(self.folios)}
+        
+        jobs = []
+        for name, label, chapter, keys in bundles:
+            start = self.page_map[keys[0]]
+            local = {k: self.page_map[k] - start + 1 for k in keys}
+            bookmarks = create_pdf_metadata([chapter], local, self.build_dir / f'bookmarks-{name}.txt',
+                                            headings=self.headings, build_dir=self.build_dir)
+            files = [paths[k] for k in keys]
+            pages = sum(self.get_predicted_count(k) for k in keys)
+            stamps = [(n - start, numbered[n]) for n in range(start, start + pages) if n in numbered]
+            jobs.append((name, files, output_dir / f'{name}.pdf', bookmarks, f'{title} - {label}',
+                         (str(sheet), stamps) if sheet and stamps else None))
+        
+        # pypdf merges are CPU-bound Python, so they need processes rather than threads to overlap
+        written = []
+        with self.phase('bundles'), _removing(sheet):
+            with concurrent.futures.ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+                futures = {
+                    executor.submit(finalize_pdf, files, out, bookmarks, bundle_title, author,
+                                    folio_sheet=stamps, dedupe=self.dedupe): (name, out)
+                    for name, files, out, bookmarks, bundle_title, stamps in jobs
+                }
+                for future in concurrent.futures.as_completed(futures):
+                    name, out = futures[future]
+                    try:
+                        method = future.result()
+                    except Exception as e:
+                        method = None
+                        logging.error(f"Bundle {name} failed: {e}")
+                    if method and out.exists():
+                        written.append(out)
+                    else:
+                        log(f"Could not write bundle {name}", False)
+        log(f"Wrote {len(written)} {by} PDFs to {output_dir}", True)
+        return sorted(written)
+    
+    def _manifest_path(self, output):
+        digest = hashlib.sha256(str(Path(output).resolve()).encode()).hexdigest()[:16]
+        return CACHE_DIR / 'manifests' / f'{digest}.json'
+    
+    def _merge_manifest(self, pdfs, title, author, bookmarks_list, folios):
+        """Describe the merged output: page range and input hash of every target."""
+        from .build import get_pdf_page_count
+        keys = {str(p): k for k, p in self.targets}
+        entries = []
+        start = 0
+        for p in pdfs:
+            if not Path(p).exists():
+                continue
+            key = keys.get(str(p), str(p))
+            ident = self.input_keys.get(key)
+            count = get_pdf_page_count(p)
+            entries.append({'key': key, 'path': str(p), 'start': start, 'count': count, 'input': ident})
+            start += count
+        meta = json.dumps([title, author, bookmarks_list, folios, self.stamp_flags, self.dedupe, self.resubset],
+                          sort_keys=True, default=str)
+        return {'meta': hashlib.sha256(meta.encode()).hexdigest(), 'targets': entries}
+    
+    def _save_manifest(self, output, manifest):
+        path = self._manifest_path(output)
+        try:
+            if manifest is None or not Path(output).exists():
+                path.unlink(missing_ok=True)
+                return
+            st = Path(output).stat()
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # base: size after the last full merge, which incremental updates grow from
+            base = manifest.get('base') or st.st_size
+            path.write_text(json.dumps(dict(manifest, output=[st.st_size, st.st_mtime_ns], base=base)))
+        except OSError:
+            pass
+    
+    def _update_in_place(self, output, manifest):
+        """Splice changed targets into the previous output when pagination is unchanged.
+
+        Returns 'unchanged', 'incremental', or None when a full merge is needed.
+        Every splice appends the replaced pages' new objects and leaves the
+        old ones in the file, so once the appended updates outgrow
+        SPLICE_GROWTH of the last full merge the next update is a full merge.
+        """
+        from .build import splice_pdf, render_folios
+        try:
+            old = json.loads(self._manifest_path(output).read_text())
+            st = Path(output).stat()
+        except (OSError, ValueError):
+            return None
+        if old.get('output') != [st.st_size, st.st_mtime_ns] or old.get('meta') != manifest['meta']:
+            return None
+        prev, cur = old.get('targets', []), manifest['targets']
+        layout = lambda ts: [(t['key'], t['start'], t['count']) for t in ts]
+        if layout(prev) != layout(cur):
+            return None
+        changed = [t for t, p in zip(cur, prev) if t['input'] is None or t['input'] != p['input']]
+        if not changed:
+            manifest['base'] = old.get('base')
+            return 'unchanged'
+        if not old.get('base') or st.st_size - old['base'] > SPLICE_GROWTH * old['base']:
+            return None
+        # Past half the book a clean merge is as fast and leaves a compact file
+        if 2 * sum(t['count'] for t in changed) > sum(t['count'] for t in cur):
+            return None
+        replacements = [(t['start'] + i, t['path'], i) for t in changed for i in range(t['count'])]
+        stamps = {}
+        if self.deferred:
+            numbered = set(self.folios)
+            numbers = [index + 1 for index, _, _ in replacements if index + 1 in numbered]
+            if numbers:
+                sheet = render_folios(numbers, self.stamp_flags, self.build_dir)
+                if not sheet:
+                    return None
+                import pypdf
+                with _removing(sheet):
+                    stamps = dict(zip((n - 1 for n in numbers), pypdf.PdfReader(sheet).pages))
+        with self.phase('splice'):
+            if not splice_pdf(output, replacements, stamps):
+                return None
+        manifest['base'] = old['base']
+        return 'incremental'
+    
+    def _toc_reserved(self):
+        """True when the last build measured the TOC with the current templates and hierarchy.
+
+        Its recorded page count then reserves the TOC's pages, and the TOC
+        is compiled only once, after pagination.
+        """
+        record = self.state.get(TOC_KEY)
+        return bool(record and record['page_count'] and record['input_hash'] == self._target_key(TOC_KEY, TOC_KEY, None))
+    
+    def _toc_stage(self, toc, ordered_keys, task_map, projected_offsets, folder_flags, max_workers, callbacks):
+        """Compile the TOC against the converged page map. Returns the final offsets.
+
+        Should the TOC come out longer or shorter than the pages reserved
+        for it, the targets after it are repaginated and it is compiled once more.
+        """
+        start = time.monotonic()
+        reserved = self.get_predicted_count(TOC_KEY)
+        with self.phase('toc'):
+            count = self._compile_toc(toc, projected_offsets, folder_flags, callbacks)
+        if count != reserved:
+            callbacks.get('on_log', lambda m, o: None)(
+                f"TOC has {count} pages, {reserved} were reserved. Repaginating.", True
+            )
+            if self.deferred:
+                projected_offsets = self._recalc_offsets(ordered_keys)
+            else:
+                shifted = [k for k in self._get_dirty_tasks(ordered_keys, projected_offsets, callbacks) if k != TOC_KEY]
+                if shifted:
+                    self.passes += 1
+                    self.iteration += 1
+                    with self.phase(f'pass {self.iteration}'):
+                        self._execute_parallel(shifted, task_map, projected_offsets, folder_flags, max_workers, callbacks)
+            with self.phase('toc'):
+                self._compile_toc(toc, projected_offsets, folder_flags, callbacks)
+        self.toc_seconds = time.monotonic() - start
+        return projected_offsets
+    
+    def _toc_key(self, page_map):
+        """Input key of the final TOC, which prints the page numbers in page_map."""
+        return self.cache.target_key(self.base_key, TOC_KEY, None, page_map.get(TOC_KEY), extra={
+            'page-map': page_map, 'overrides': self._relevant_overrides(TOC_KEY)
+        })
+    
+    def _compile_toc(self, toc, page_map, folder_flags, callbacks):
+        """Compile (or restore) the TOC with page_map. Returns its page count."""
+        from .build import compile_target, extract_headings, get_pdf_page_count, BuildFailed
+        output = toc[3]
+        offset = page_map.get(TOC_KEY)
+        input_key = self._toc_key(page_map)
+        self.input_keys[TOC_KEY] = input_key
+        duration = None
+        if self.use_cache and self.cache.restore(input_key, output):
+            self._tally(restored=1)
+        else:
+            callbacks.get('on_log', lambda m, o: None)("Compiling TOC with final page numbers", True)
+            start = time.monotonic()
+            try:
+                with self.slots.slot(self.estimates.get(TOC_KEY, 0.0)) if self.slots else contextlib.nullcontext():
+                    compile_target(TOC_KEY, output, page_offset=offset, page_map=page_map,
+                                   extra_flags=folder_flags, log_callback=lambda m: None, root=self.root)
+            except Exception as e:
+                callbacks.get('on_log', lambda m, o: None)(f"Task {TOC_KEY} failed: {e}", False)
+                raise BuildFailed([(TOC_KEY, e)]) from e
+            self._tally(compiled=1)
+            duration = time.monotonic() - start
+            if self.use_cache:
+                self.cache.store(input_key, output)
+        count = get_pdf_page_count(output)
+        self.update_count(TOC_KEY, count)
+        self.headings[TOC_KEY] = extract_headings(output)
+        # Recorded under its layout key so the next build can reserve its pages without measuring
+        record = dict(input_hash=self._target_key(TOC_KEY, TOC_KEY, None), page_count=count,
+                      artifact=str(output), headings=json.dumps(self.headings[TOC_KEY]))
+        if duration is not None:
+            record['duration'] = duration
+        self.state.record(TOC_KEY, **record)
+        return count
+    
     def _create_task_list(self, chapters, config, opts, ch_folders, pg_folders):
         """Create list of compilation tasks."""
         tasks = []
@@ -153,6 +750,7 @@ class BuildManager:
                 for ai, p in pages_to_build:
                     pg_file = pg_files[ai] if ai < len(pg_files) else str(ai)
                     key = f'{ci}/{ai}'
+                    self.sources[key] = BASE_DIR / 'content' / ch_folder / f'{pg_file}.typ'
                     tasks.append((key, 'section', key, 
                                  self.build_dir / f'20_page_{ci}_{ai}.pdf', f"Section {pg_file}: {p['title']}"))
                 
@@ -193,38 +791,429 @@ class BuildManager:
         )
         return to_run
     
-    def _execute_parallel(self, to_run, task_map, projected_offsets, folder_flags, max_workers, callbacks):
-        """Execute compilation tasks in parallel."""
-        from .build import compile_target, get_pdf_page_count
+    def _execute_parallel(self, to_run, task_map, projected_offsets, folder_flags, max_workers, callbacks, built=None):
+        """Execute compilation tasks in parallel.
+
+        built maps targets the previous build of this manager left in place,
+        untouched by the changes since, to (input key, offset).
+        """
+        from .build import get_pdf_page_count, extract_headings, BuildFailed
+        built = built or {}
         with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-            future_to_key = {}
+            future_to_unit = {}
+            pending = []
             for key in to_run:
                 t_data = task_map[key]
-                offset = projected_offsets[key]
+                offset = None if self.deferred else projected_offsets[key]
                 
-                f = executor.submit(
-                    compile_target, 
-                    t_data[2],
-                    t_data[3],
-                    page_offset=offset,
-                    extra_flags=folder_flags,
-                    log_callback=lambda m: None 
+                kept = built.get(key)
+                if kept and kept[1] == offset and t_data[3].exists():
+                    self.input_keys[key] = kept[0]
+                    if callbacks.get('on_progress') and callbacks['on_progress']() is False:
+                        raise KeyboardInterrupt("Build cancelled by user")
+                    continue
+                input_key = self._target_key(key, t_data[2], offset)
+                self.input_keys[key] = input_key
+                entry = self.journal.resumable(key, input_key, t_data[3]) if self.resume else None
+                if entry:
+                    self.update_count(key, entry['pages'])
+                    self.headings[key] = entry['headings']
+                    if callbacks.get('on_progress') and callbacks['on_progress']() is False:
+                        raise KeyboardInterrupt("Build cancelled by user")
+                    continue
+                if self.use_cache:
+                    restore_start = self.profiler.now() if self.profiler else 0.0
+                    if self.cache.restore(input_key, t_data[3]):
+                        self._tally(restored=1)
+                        record = self.state.get(key)
+                        if record and record['input_hash'] == input_key and record['page_count']:
+                            self.update_count(key, record['page_count'])
+                        else:
+                            self.update_count(key, get_pdf_page_count(t_data[3]))
+                        if record and record['input_hash'] == input_key and record['headings'] is not None:
+                            self.headings[key] = json.loads(record['headings'])
+                        else:
+                            # Restored from another build or variant: no record of ours to take them from
+                            self.headings[key] = extract_headings(t_data[3])
+                        if self.profiler:
+                            self.profiler.record_task(
+                                key, self.iteration, restore_start, restore_start, self.profiler.now(),
+                                0, {'cached': True}, t_data[3]
+                            )
+                        if callbacks.get('on_progress') and callbacks['on_progress']() is False:
+                            raise KeyboardInterrupt("Build cancelled by user")
+                        continue
+                pending.append((key, offset))
+            
+            # Group misses into typst processes, then dispatch longest-expected-first
+            scheduler = DurationScheduler(self.state.all(), self.sources)
+            offsets = dict(pending)
+            units = self._plan_units(list(offsets), task_map, scheduler, max_workers, callbacks)
+            ordered = scheduler.order(units)
+            self.estimates = {u[0] if len(u) == 1 else f'{u[0]}..{u[-1]}': scheduler.estimate(u) for u in ordered}
+            self.predicted_makespan = scheduler.makespan(ordered, max_workers)
+            if ordered:
+                callbacks.get('on_log', lambda m, o: None)(
+                    f"Scheduled {len(ordered)} processes for {len(offsets)} tasks longest-first, "
+                    f"predicted makespan {self.predicted_makespan:.1f}s on {max_workers} workers", True
                 )
-                future_to_key[f] = key
+            for unit in ordered:
+                offset = offsets[unit[0]]
+                submitted = self.profiler.now() if self.profiler else 0.0
+                if len(unit) == 1:
+                    f = executor.submit(self._compile_task, task_map[unit[0]], offset, folder_flags, submitted)
+                else:
+                    f = executor.submit(self._compile_bundle, [task_map[k] for k in unit], offset, folder_flags, submitted)
+                future_to_unit[f] = unit
                 
-            for future in concurrent.futures.as_completed(future_to_key):
-                key = future_to_key[future]
+            for future in concurrent.futures.as_completed(future_to_unit):
+                unit = future_to_unit[future]
+                key = unit[0]
                 try:
-                    future.result()
-                    path = task_map[key][3]
-                    count = get_pdf_page_count(path)
-                    self.update_count(key, count)
-                    
-                    if callbacks.get('on_progress'):
-                        if callbacks['on_progress']() is False:
-                            executor.shutdown(wait=False, cancel_futures=True)
-                            raise KeyboardInterrupt("Build cancelled by user")
+                    duration, headings, stats = future.result()
+                    if len(unit) == 1:
+                        headings, shares = {key: headings}, {key: duration}
+                    else:
+                        shares = self._share_duration(unit, duration, scheduler)
+                    if self.profiler:
+                        self.profiler.record_task(
+                            key if len(unit) == 1 else f'{unit[0]}..{unit[-1]}', self.iteration,
+                            stats['submitted'], stats['start'], stats['end'], None, stats,
+                            stats.get('bundle', task_map[key][3])
+                        )
+                    running = offsets[key]
+                    for key in unit:
+                        path = task_map[key][3]
+                        count = get_pdf_page_count(path)
+                        self.update_count(key, count)
+                        self.headings[key] = headings.get(key, [])
+                        # Targets after the first in a bundle are numbered by the real layout
+                        if running is not None:
+                            if projected_offsets[key] != running:
+                                projected_offsets[key] = running
+                                self.input_keys[key] = self._target_key(key, task_map[key][2], running)
+                            running += count
+                        input_key = self.input_keys.get(key)
+                        if self.use_cache and not stats.get('stored'):
+                            self.cache.store(input_key, path)
+                        self.journal.record(key, input_key, None if self.deferred else projected_offsets[key], path, count, self.headings[key])
+                        record = dict(
+                            input_hash=input_key, page_count=count, duration=shares[key],
+                            artifact=str(self.cache.path_for(input_key)) if self.use_cache else str(path),
+                            headings=json.dumps(self.headings[key]), peak_rss=stats.get('peak_rss')
+                        )
+                        if stats.get('reused'):
+                            # Compiled by another variant: its time and memory say nothing about this one
+                            del record['duration'], record['peak_rss']
+                        self.state.record(key, **record)
+                        
+                        if callbacks.get('on_progress'):
+                            if callbacks['on_progress']() is False:
+                                self._stop_inflight(executor, future_to_unit)
+                                raise KeyboardInterrupt("Build cancelled by user")
                             
                 except Exception as e:
-                    callbacks.get('on_log', lambda m, o: None)(f"Task {key} failed: {e}", False)
+                    if self.abort.is_set():
+                        continue  # Killed while stopping the pass, not a failure of its own
+                    name = key if len(unit) == 1 else f'{unit[0]}..{unit[-1]}'
+                    callbacks.get('on_log', lambda m, o: None)(f"Task {name} failed: {e}", False)
+                    self.failures.append((name, e))
+                    if self.on_error == 'keep-going':
+                        continue
+                    # Failures that finished alongside this one, before anything was killed
+                    for f, u in future_to_unit.items():
+                        if f is not future and f.done() and not f.cancelled() and f.exception():
+                            self.failures.append((u[0] if len(u) == 1 else f'{u[0]}..{u[-1]}', f.exception()))
+                    cancelled, terminated = self._stop_inflight(executor, future_to_unit)
+                    raise BuildFailed(self.failures, cancelled, terminated) from e
+            
+            if self.failures:
+                raise BuildFailed(self.failures)
+    
+    def _stop_inflight(self, executor, futures):
+        """Cancel queued compiles and kill running ones until every worker thread has returned.
+
+        Returns (cancelled, terminated). Threads admitted after the first
+        sweep see the abort flag and return without starting typst.
+        """
+        self.abort.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+        cancelled = sum(1 for f in futures if f.cancelled())
+        killed = set()
+        pending = [f for f in futures if not f.done()]
+        while pending:
+            self._kill_inflight(killed)
+            _, pending = concurrent.futures.wait(pending, timeout=STOP_POLL_INTERVAL)
+        return cancelled, len(killed)
+    
+    def _kill_inflight(self, killed):
+        """Kill this build's running compiles not in killed, adding their pids to it.
+
+        Only processes started for this build's compiles are touched; idle
+        warm workers and other builds keep running.
+        """
+        from .build import terminate_pids
+        with self.lock:
+            pids = {s['pid'] for s in self.inflight.values() if s.get('pid')} - killed
+        if pids:
+            killed.update(terminate_pids(pids))
+
+    def _plan_units(self, keys, task_map, scheduler, max_workers, callbacks):
+        """Group keys into compile units (tuples of keys sharing one typst process).
+
+        In auto mode the granularity with the smallest predicted makespan wins,
+        weighing the measured per-process overhead against lost parallelism.
+        """
+        mode = self.granularity
+        if mode == 'section' or len(keys) < 2:
+            return [(k,) for k in keys]
+        modes = GRANULARITIES if mode == 'auto' else (mode,)
+        candidates = {m: self._group_units(keys, task_map, m) for m in modes}
+        if mode == 'auto':
+            spans = {m: scheduler.makespan(u, max_workers) for m, u in candidates.items()}
+            mode = min(modes, key=lambda m: spans[m])
+            callbacks.get('on_log', lambda m, o: None)(
+                f"Granularity {mode} ({', '.join(f'{m} {t:.1f}s' for m, t in spans.items())}, "
+                f"overhead {scheduler.overhead:.2f}s per process)", True
+            )
+        return candidates[mode]
+    
+    def _group_units(self, keys, task_map, mode):
+        """Split keys into runs that may share a process under mode.
+
+        Front matter always compiles alone. Runs must be contiguous in book
+        order unless numbering is deferred, since the bundle's page numbers
+        flow from its first target's offset.
+        """
+        position = {k: i for i, k in enumerate(task_map)}
+        units, run, run_group = [], [], None
+        for key in sorted(keys, key=position.get):
+            t_type = task_map[key][1]
+            if t_type == 'front' or mode == 'section':
+                group = None
+            elif mode == 'book':
+                group = 'book'
+            else:
+                group = key.split('/')[0] if t_type == 'section' else key.split('-', 1)[1]
+            if run and group is not None and group == run_group and (
+                self.deferred or position[key] == position[run[-1]] + 1
+            ):
+                run.append(key)
+                continue
+            if run:
+                units.append(tuple(run))
+            run, run_group = [key], group
+        if run:
+            units.append(tuple(run))
+        return units
+    
+    def _share_duration(self, unit, duration, scheduler):
+        """Apportion a bundle's wall time to its targets as standalone estimates."""
+        overhead = min(scheduler.overhead, duration)
+        work = {k: scheduler.work(k) for k in unit}
+        total = sum(work.values())
+        rest = duration - overhead
+        return {k: overhead + rest * (work[k] / total if total else 1 / len(unit)) for k in unit}
+
+    def _compile_bundle(self, tasks, offset, folder_flags, submitted=0.0):
+        """Compile several targets in one typst process and split the result.
+
+        Falls back to compiling each target on its own when the bundle cannot
+        be split. Returns (wall time, headings by target, child stats).
+        """
+        from .build import split_bundle, get_pdf_page_count
+        bundle = self.build_dir / f"30_bundle_{tasks[0][0].replace('/', '_')}.pdf"
+        stats = {'submitted': submitted, 'bundle': str(bundle)}
+        if self.profiler:
+            stats['start'] = self.profiler.now()
+        start = time.monotonic()
+        self._run_compile([t[2] for t in tasks], bundle, offset, folder_flags, stats)
+        headings = split_bundle(bundle, {t[2]: t[3] for t in tasks})
+        try:
+            stats['output_size'] = bundle.stat().st_size
+            bundle.unlink()
+        except OSError:
+            pass
+        if headings is None:
+            logging.warning(f"Could not split bundle {bundle.name}, compiling its targets separately")
+            self.granularity = 'section'
+            headings = {}
+            for t in tasks:
+                _, headings[t[2]], _ = self._compile_task(t, offset, folder_flags)
+                if offset is not None:
+                    offset += get_pdf_page_count(t[3])
+        if self.profiler:
+            stats['end'] = self.profiler.now()
+        return time.monotonic() - start, {t[0]: headings.get(t[2], []) for t in tasks}, stats
+    def _run_compile(self, target, output, offset, folder_flags, stats):
+        """Compile on a warm worker when the pool is enabled, otherwise in a fresh typst process.
+
+        The memory governor, when active, admits the compile and learns its peak RSS.
+        """
+        keys = list(target) if isinstance(target, (list, tuple)) else [target]
+        name = keys[0] if len(keys) == 1 else f'{keys[0]}..{keys[-1]}'
+        with self.slots.slot(self.estimates.get(name, 0.0)) if self.slots else contextlib.nullcontext():
+            result = self._admit_compile(name, keys, target, output, offset, folder_flags, stats)
+        self._tally(compiled=len(keys))
+        return result
+
+    def _tally(self, restored=0, compiled=0):
+        """Count this build's own cache restores and compiled targets; the cache's counters are shared by variants."""
+        with self.lock:
+            self.restored += restored
+            self.compiled += compiled
+    
+    def _admit_compile(self, name, keys, target, output, offset, folder_flags, stats):
+        ticket = self.governor.admit(name, keys, stats) if self.governor else None
+        with self.lock:
+            self.inflight[id(stats)] = stats
+        try:
+            if self.abort.is_set():
+                raise KeyboardInterrupt(f"{name} not started, build stopping")
+            if self.pool:
+                stats['warm'] = True
+                return self.pool.compile(target, output, page_offset=offset, stats=stats)
+            from .build import compile_target
+            return compile_target(
+                target,
+                output,
+                page_offset=offset,
+                extra_flags=folder_flags,
+                log_callback=lambda m: None,
+                stats=stats,
+                root=self.root
+            )
+        finally:
+            with self.lock:
+                self.inflight.pop(id(stats), None)
+            if self.governor:
+                stats['peak_rss'] = self.governor.release(ticket, keys, stats.get('peak_rss'))
+
+    def _compile_task(self, t_data, offset, folder_flags, submitted=0.0):
+        """Compile one task in a worker thread.
+
+        Returns (wall time in seconds, outline headings read while the PDF is hot,
+        child stats with CPU time, peak RSS and profiler timestamps).
+        """
+        from .build import extract_headings
+        stats = {'submitted': submitted}
+        if self.profiler:
+            stats['start'] = self.profiler.now()
+        input_key = self.input_keys.get(t_data[0]) if self.shared and self.use_cache else None
+        if input_key and self._await_twin(input_key, t_data[3]):
+            self._tally(restored=1)
+            stats.update(reused=True, stored=True)
+            if self.profiler:
+                stats['end'] = self.profiler.now()
+            return 0.0, extract_headings(t_data[3]), stats
+        start = time.monotonic()
+        try:
+            self._run_compile(t_data[2], t_data[3], offset, folder_flags, stats)
+            if input_key:
+                self.cache.store(input_key, t_data[3])
+                stats['stored'] = True
+        finally:
+            if input_key:
+                self.cache.settle(input_key)
+        duration = time.monotonic() - start
+        if self.profiler:
+            stats['end'] = self.profiler.now()
+        return duration, extract_headings(t_data[3]), stats
+    
+    def _await_twin(self, input_key, output):
+        """Take the compile of input_key, or wait for the variant already compiling it and copy its result.
+
+        Returns True when output was restored; False means this build holds
+        the claim and must compile (and settle) it.
+        """
+        while True:
+            done = self.cache.claim(input_key)
+            if done is None:
+                # A twin may have stored and settled the key before this claim was taken
+                if self.cache.restore(input_key, output):
+                    self.cache.settle(input_key)
+                    return True
+                return False
+            while not done.wait(STOP_POLL_INTERVAL * 10):
+                if self.abort.is_set():
+                    raise KeyboardInterrupt(f"{input_key[:12]} not started, build stopping")
+            if self.cache.restore(input_key, output):
+                return True
+
+
+@contextlib.contextmanager
+def _removing(path):
+    """Delete path (if any) when the block exits."""
+    try:
+        yield path
+    finally:
+        if path:
+            Path(path).unlink(missing_ok=True)
+
+
+def _slug(title):
+    return re.sub(r'[^\w]+', '-', title).strip('-').lower()[:60] or 'untitled'
+
+
+def build_matrix(build_dir, chapters, config, opts, variants, callbacks):
+    """Build several config variants of the book as one scheduled build.
+    
+    variants maps a name to config overrides. Each variant builds into its
+    own directory under build_dir with its own page counts and headings,
+    while compile slots, the memory budget, the dependency index and the
+    target cache are shared: a section whose templates read none of the
+    overridden keys gets one cache key across variants and is compiled once.
+    Returns {name: (BuildManager, pdfs)}; the first failure stops every variant.
+    """
+    threads = opts.get('threads') or os.cpu_count() or 4
+    index = DependencyIndex(BuildState())
+    index.update()
+    probe = BuildManager(build_dir)
+    shared = {
+        'index': index,
+        'cache': BuildCache(index=index),
+        'slots': SlotGate(threads),
+        'usage': ConfigUsage(),
+        'governor': probe._make_governor(opts, callbacks),
+    }
+    log = callbacks.get('on_log', lambda m, o: None)
+    progress = callbacks.get('on_progress')
+    lock = threading.Lock()
+    
+    def on_progress():
+        with lock:
+            return progress() if progress else True
+    
+    managers = {name: BuildManager(Path(build_dir) / f'variant-{name}', variant=name, shared=shared) for name in variants}
+    
+    def run(name):
+        overrides = {k: v for k, v in variants[name].items() if config.get(k) != v}
+        bm = managers[name]
+        bm.build_dir.mkdir(parents=True, exist_ok=True)
+        variant_opts = dict(opts, config_overrides=overrides)
+        variant_callbacks = {'on_log': lambda m, ok=True: log(f"[{name}] {m}", ok), 'on_progress': on_progress}
+        return bm, bm.build_parallel(chapters, dict(config, **variants[name]), variant_opts, variant_callbacks)
+    
+    results = {}
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(variants) or 1) as executor:
+            futures = {executor.submit(run, name): name for name in variants}
+            for future in concurrent.futures.as_completed(futures):
+                try:
+                    results[futures[future]] = future.result()
+                except BaseException:
+                    for bm in managers.values():
+                        bm.abort.set()
+                    killed = set()
+                    while not all(f.done() for f in futures):
+                        for bm in managers.values():
+                            bm._kill_inflight(killed)
+                        concurrent.futures.wait(futures, timeout=STOP_POLL_INTERVAL)
                     raise
+    finally:
+        if shared['governor']:
+            shared['governor'].close()
+    shared['cache'].prune()
+    log(f"Built {len(variants)} variants, {sum(bm.restored for bm in managers.values())} targets reused from the cache or another variant", True)
+    return {name: results[name] for name in variants}
+
@@ -0,0 +1,175 @@
+# Build State - Durable per-target build records shared across processes
+
+import time
+import sqlite3
+import threading
+from pathlib import Path
+
+from ..config import BUILD_STATE_FILE
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS targets (
+    key TEXT PRIMARY KEY,
+    updated REAL
+);
+CREATE TABLE IF NOT EXISTS deps (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER,
+    size INTEGER,
+    refs TEXT
+)
+"""
+
+# Columns are added on open when missing, so older databases upgrade in place
+COLUMNS = {
+    'input_hash': 'TEXT',
+    'page_count': 'INTEGER',
+    'duration': 'REAL',
+    'artifact': 'TEXT',
+    'headings': 'TEXT',
+    'peak_rss': 'INTEGER',
+    'source': 'TEXT',
+}
+FIELDS = tuple(COLUMNS)
+
+# Separates a variant namespace from the target key in stored keys
+NAMESPACE_SEP = '::'
+
+
+class BuildState:
+    """SQLite store of page counts, input hashes, durations and artifacts per target.
+
+    Lives outside BUILD_DIR so it survives the scratch wipe each front-end does.
+    WAL mode plus a busy timeout lets the CLI, TUI and GUI server share it.
+    A namespace keeps the records of one build variant apart from the others.
+    """
+
+    def __init__(self, path=BUILD_STATE_FILE, namespace=None):
+        self.path = Path(path)
+        self.local = threading.local()
+        self.prefix = f'{namespace}{NAMESPACE_SEP}' if namespace else ''
+
+    def _key(self, key):
+        return self.prefix + key
+
+    def _mine(self, stored):
+        """The target key of a stored key in this namespace, or None."""
+        if self.prefix:
+            return stored[len(self.prefix):] if stored.startswith(self.prefix) else None
+        return None if NAMESPACE_SEP in stored else stored
+
+    def _conn(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA busy_timeout=30000')
+            conn.executescript(SCHEMA)
+            existing = {r['name'] for r in conn.execute('PRAGMA table_info(targets)')}
+            for col, typ in COLUMNS.items():
+                if col not in existing:
+                    try:
+                        conn.execute(f'ALTER TABLE targets ADD COLUMN {col} {typ}')
+                    except sqlite3.OperationalError:
+                        pass  # Added concurrently by another process
+            self.local.conn = conn
+        return conn
+
+    def get(self, key):
+        """Return the stored record for key as a dict, or None."""
+        try:
+            row = self._conn().execute('SELECT * FROM targets WHERE key = ?', (self._key(key),)).fetchone()
+        except sqlite3.Error:
+            return None
+        return dict(row, key=key) if row else None
+
+    def all(self):
+        """Return every record keyed by target key."""
+        try:
+            rows = self._conn().execute('SELECT * FROM targets').fetchall()
+        except sqlite3.Error:
+            return {}
+        records = {}
+        for r in rows:
+            key = self._mine(r['key'])
+            if key is not None:
+                records[key] = dict(r, key=key)
+        return records
+
+    def page_counts(self):
+        return {k: r['page_count'] for k, r in self.all().items() if r['page_count']}
+
+    def record(self, key, **fields):
+        """Insert or update the given fields for key."""
+        fields = {k: v for k, v in fields.items() if k in FIELDS}
+        cols = ['key', *fields, 'updated']
+        vals = [self._key(key), *fields.values(), time.time()]
+        updates = ', '.join(f'{c} = excluded.{c}' for c in cols[1:])
+        sql = (f"INSERT INTO targets ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))}) "
+               f"ON CONFLICT(key) DO UPDATE SET {updates}")
+        try:
+            self._conn().execute(sql, vals)
+        except sqlite3.Error:
+            pass
+
+    def record_page_counts(self, counts):
+        """Persist a batch of page counts in one transaction."""
+        try:
+            conn = self._conn()
+            with conn:
+                conn.execute('BEGIN IMMEDIATE')
+                now = time.time()
+                conn.executemany(
+                    'INSERT INTO targets (key, page_count, updated) VALUES (?, ?, ?) '
+                    'ON CONFLICT(key) DO UPDATE SET page_count = excluded.page_count, updated = excluded.updated',
+                    [(self._key(k), v, now) for k, v in counts.items()]
+                )
+        except sqlite3.Error:
+            pass
+
+    def record_sources(self, sources):
+        """Persist the content file each target compiles, in one transaction."""
+        try:
+            conn = self._conn()
+            with conn:
+                conn.execute('BEGIN IMMEDIATE')
+                now = time.time()
+                conn.executemany(
+                    'INSERT INTO targets (key, source, updated) VALUES (?, ?, ?) '
+                    'ON CONFLICT(key) DO UPDATE SET source = excluded.source, updated = excluded.updated',
+                    [(self._key(k), str(v), now) for k, v in sources.items()]
+                )
+        except sqlite3.Error:
+            pass
+
+    def file_refs(self):
+        """Return {path: (mtime_ns, size, refs json)} from the dependency index."""
+        try:
+            rows = self._conn().execute('SELECT * FROM deps').fetchall()
+        except sqlite3.Error:
+            return {}
+        return {r['path']: (r['mtime_ns'], r['size'], r['refs']) for r in rows}
+
+    def update_file_refs(self, changed, removed=()):
+        """Upsert (path, mtime_ns, size, refs json) rows and drop removed paths."""
+        try:
+            conn = self._conn()
+            with conn:
+                conn.execute('BEGIN IMMEDIATE')
+                conn.executemany(
+                    'INSERT INTO deps (path, mtime_ns, size, refs) VALUES (?, ?, ?, ?) '
+                    'ON CONFLICT(path) DO UPDATE SET mtime_ns = excluded.mtime_ns, '
+                    'size = excluded.size, refs = excluded.refs',
+                    changed
+                )
+                conn.executemany('DELETE FROM deps WHERE path = ?', [(p,) for p in removed])
+        except sqlite3.Error:
+            pass
+
+    def close(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self.local.conn = None
@@ -0,0 +1,164 @@
+# Dependency Graph - Which targets does an edited file affect?
+
+import os
+import re
+import json
+import threading
+from pathlib import Path
+
+from ..config import BASE_DIR, BUILD_DIR, SYSTEM_CONFIG_DIR
+from .build_state import BuildState
+
+INDEXED_TREES = ('content', 'templates', 'config')
+EXCLUDES = (BUILD_DIR, SYSTEM_CONFIG_DIR)
+
+# Trees every target depends on: each imports the templater and reads config
+SHARED_TREES = ('templates', 'config')
+
+# Marker returned by affected() when every target depends on the edit
+ALL = '*'
+
+_IMPORT_RE = re.compile(r'#?\b(?:import|include)\s+"([^"]+)"')
+_CALL_RE = re.compile(r'\b(?:image|json|read)\(\s*"([^"]+)"')
+
+
+def resolve_ref(ref, source):
+    """Resolve a typst path literal the way typst does (root-absolute or file-relative)."""
+    if ref.startswith('@'):
+        return None
+    if ref.startswith('/'):
+        return BASE_DIR / ref.lstrip('/')
+    return (Path(source).parent / ref).resolve()
+
+
+def scan_refs(path):
+    """Return the file paths referenced by a typst source via import/include/image/json/read."""
+    try:
+        text = Path(path).read_text(errors='ignore')
+    except OSError:
+        return []
+    refs = _IMPORT_RE.findall(text) + _CALL_RE.findall(text)
+    return [p for p in (resolve_ref(r, path) for r in refs) if p is not None]
+
+
+def is_shared(path):
+    """True for files under the trees every target depends on."""
+    try:
+        rel = Path(path).resolve().relative_to(BASE_DIR)
+    except ValueError:
+        return False
+    return bool(rel.parts) and rel.parts[0] in SHARED_TREES
+
+
+class DependencyIndex:
+    """Forward and reverse dependency graph over the project's typst sources.
+
+    Each .typ file's #import/#include/image/json/read references are parsed
+    once and stored in the build state with the file's mtime and size, so
+    update() only re-parses what changed. Files under templates/ and config/
+    are shared by every target; a section target depends on the closure of
+    its content file outside those trees.
+    """
+
+    def __init__(self, state=None):
+        self.state = state or BuildState()
+        self.refs = {}
+        self.lock = threading.Lock()
+        self.reverse = None
+        self.sources = {}
+
+    def _walk(self):
+        for tree in INDEXED_TREES:
+            for dirpath, dirnames, filenames in os.walk(BASE_DIR / tree):
+                d = Path(dirpath)
+                dirnames[:] = [n for n in dirnames if d / n not in EXCLUDES]
+                for name in filenames:
+                    if name.endswith('.typ'):
+                        yield d / name
+
+    def update(self):
+        """Re-parse .typ files whose mtime or size changed since the stored index. Returns the count."""
+        stored = self.state.file_refs()
+        changed, seen, refs = [], set(), {}
+        for p in self._walk():
+            key = str(p)
+            seen.add(key)
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            prev = stored.get(key)
+            if prev and prev[0] == st.st_mtime_ns and prev[1] == st.st_size:
+                refs[key] = json.loads(prev[2])
+                continue
+            refs[key] = [str(r) for r in scan_refs(p)]
+            changed.append((key, st.st_mtime_ns, st.st_size, json.dumps(refs[key])))
+        removed = [k for k in stored if k not in seen]
+        if changed or removed:
+            self.state.update_file_refs(changed, removed)
+        with self.lock:
+            self.refs = refs
+            self.reverse = None
+        return len(changed)
+
+    def refs_of(self, path):
+        """References of one file, parsing it on demand if it is not indexed."""
+        key = str(path)
+        with self.lock:
+            found = self.refs.get(key)
+        if found is None:
+            found = [str(r) for r in scan_refs(path)] if key.endswith('.typ') else []
+            with self.lock:
+                self.refs[key] = found
+        return found
+
+    def closure(self, source):
+        """A target's content file and everything it pulls in, excluding the shared trees."""
+        seen = set()
+        stack = [str(Path(source).resolve())]
+        while stack:
+            p = stack.pop()
+            if p in seen or is_shared(p) or not os.path.exists(p):
+                continue
+            seen.add(p)
+            stack.extend(self.refs_of(p))
+        return sorted(Path(p) for p in seen)
+
+    def set_targets(self, sources):
+        """Register target key -> content file for the reverse graph."""
+        with self.lock:
+            self.sources = {k: Path(v) for k, v in sources.items()}
+            self.reverse = None
+
+    def _reverse(self):
+        with self.lock:
+            if self.reverse is not None:
+                return self.reverse
+            sources = dict(self.sources)
+        reverse = {}
+        for key, source in sources.items():
+            for p in self.closure(source):
+                reverse.setdefault(str(p), set()).add(key)
+        with self.lock:
+            self.reverse = reverse
+        return reverse
+
+    def affected(self, paths):
+        """Target keys whose output may change when paths change, or ALL for shared files."""
+        reverse = self._reverse()
+        keys = set()
+        for p in paths:
+            p = Path(p).resolve()
+            if is_shared(p):
+                return ALL
+            keys |= reverse.get(str(p), set())
+        return keys
+
+    @classmethod
+    def load(cls, state=None):
+        """An up-to-date index with the targets recorded by the last build."""
+        index = cls(state)
+        index.update()
+        records = index.state.all()
+        index.set_targets({k: r['source'] for k, r in records.items() if r.get('source')})
+        return index
@@ -11,7 +11,8 @@ def check_dependencies():
     if not shutil.which('typst'):
         missing.append(("typst", "Install from https://typst.app"))
     
-    if not shutil.which('pdfinfo'):
+    # pdfinfo is only a fallback for page counting when pypdf is unavailable
+    if not shutil.which('pdfinfo') and not _has_pypdf():
         missing.append(("pdfinfo", "Install with: brew install poppler (macOS) or apt-get install poppler-utils (Linux)"))
     
     has_pdf_tool = shutil.which('pdfunite') or shutil.which('gs')
@@ -25,6 +26,14 @@ def check_dependencies():
         sys.exit(1)
 
 
+def _has_pypdf():
+    try:
+        import pypdf
+        return True
+    except ImportError:
+        return False
+
+
 def get_available_pdf_merger():
     """Return the name of the available PDF merger tool."""
     if shutil.which('pdfunite'):
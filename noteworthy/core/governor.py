@@ -0,0 +1,187 @@
+# Memory Governor - Admits parallel compiles only while projected RSS fits a budget
+
+import os
+import itertools
+import logging
+import statistics
+import threading
+
+DEFAULT_FOOTPRINT = 256 * 1024 * 1024
+DEFAULT_FRACTION = 0.75
+SAMPLE_INTERVAL = 0.25
+
+_UNITS = {'': 1, 'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30, 'T': 1 << 40}
+
+
+def physical_memory():
+    """Total memory available to this process in bytes, honouring a cgroup limit."""
+    total = None
+    try:
+        total = os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (ValueError, OSError, AttributeError):
+        pass
+    for limit_file in ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes'):
+        try:
+            raw = open(limit_file).read().strip()
+        except OSError:
+            continue
+        if raw.isdigit() and int(raw) < (1 << 60):
+            total = min(total, int(raw)) if total else int(raw)
+        break
+    return total
+
+
+def available_memory():
+    """MemAvailable from /proc/meminfo in bytes, or None off Linux."""
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def parse_size(value):
+    """Parse a budget like 4G, 512M, 2147483648 or 60% (of physical memory) into bytes."""
+    if value is None or isinstance(value, int):
+        return value
+    text = str(value).strip().upper().removesuffix('B').removesuffix('I')
+    if text.endswith('%'):
+        total = physical_memory()
+        return int(total * float(text[:-1]) / 100) if total else None
+    unit = text[-1] if text and text[-1] in _UNITS else ''
+    return int(float(text[:len(text) - len(unit)]) * _UNITS[unit])
+
+
+def default_budget():
+    """A share of physical memory, capped by what is actually free right now."""
+    total = physical_memory()
+    if not total:
+        return None
+    budget = int(total * DEFAULT_FRACTION)
+    free = available_memory()
+    if free:
+        budget = min(budget, int(free * 0.9))
+    return budget
+
+
+def format_size(n):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if abs(n) < 1024 or unit == 'GB':
+            return f'{n:.0f} {unit}' if unit == 'B' else f'{n:.1f} {unit}'
+        n /= 1024
+
+
+def sample_rss(pid):
+    """Current resident set size of pid in bytes, or None if unavailable."""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+class MemoryGovernor:
+    """Gate in front of each typst process keyed by the targets it compiles.
+
+    A compile reserves its expected footprint (learned peak RSS, else the
+    median of known footprints) and waits while the reservations in flight
+    would exceed the budget. One compile is always admitted so an oversized
+    target still runs, alone. A sampler thread reads live RSS of running
+    children and raises their reservation when they outgrow it.
+    """
+
+    def __init__(self, budget, footprints=None, log=None):
+        self.budget = budget
+        self.footprints = {k: v for k, v in (footprints or {}).items() if v}
+        self.log = log or (lambda m, ok: None)
+        self.cond = threading.Condition()
+        self.inflight = {}
+        self.tickets = itertools.count(1)
+        self.held = 0
+        self.peak_projected = 0
+        self.stopped = threading.Event()
+        self.sampler = None
+
+    def estimate(self, keys):
+        fallback = statistics.median(self.footprints.values()) if self.footprints else DEFAULT_FOOTPRINT
+        return max(self.footprints.get(k) or fallback for k in keys)
+
+    def projected(self):
+        return sum(e['reserved'] for e in self.inflight.values())
+
+    def _say(self, msg):
+        logging.info(msg)
+        self.log(msg, True)
+
+    def admit(self, name, keys, stats):
+        """Block until the compile fits the budget, then reserve its footprint.
+
+        Returns the reservation's ticket, to hand back to release(). Names are
+        not unique: variants compile same-named targets at the same time.
+        """
+        need = self.estimate(keys)
+        with self.cond:
+            if need > self.budget and not self.inflight:
+                self._say(f"Memory: {name} expects {format_size(need)}, over the {format_size(self.budget)} budget; running it alone")
+            waited = False
+            while self.inflight and self.projected() + need > self.budget:
+                if not waited:
+                    waited = True
+                    self.held += 1
+                    self._say(
+                        f"Memory: holding {name} (~{format_size(need)}), {format_size(self.projected())} of "
+                        f"{format_size(self.budget)} reserved by {len(self.inflight)} running"
+                    )
+                self.cond.wait(SAMPLE_INTERVAL)
+            ticket = next(self.tickets)
+            self.inflight[ticket] = {'reserved': need, 'stats': stats, 'sampled': 0}
+            self.peak_projected = max(self.peak_projected, self.projected())
+        self._ensure_sampler()
+        return ticket
+
+    def release(self, ticket, keys, peak=None):
+        """Free a reservation and learn the footprint. Returns the observed peak RSS."""
+        with self.cond:
+            entry = self.inflight.pop(ticket, None)
+            observed = max(peak or 0, entry['sampled'] if entry else 0)
+            if observed:
+                for k in keys:
+                    self.footprints[k] = observed
+            self.cond.notify_all()
+        return observed or None
+
+    def _ensure_sampler(self):
+        if self.sampler is None:
+            self.sampler = threading.Thread(target=self._sample, daemon=True)
+            self.sampler.start()
+
+    def _sample(self):
+        while not self.stopped.wait(SAMPLE_INTERVAL):
+            with self.cond:
+                entries = list(self.inflight.values())
+            grew = False
+            for e in entries:
+                pid = e['stats'].get('pid')
+                rss = sample_rss(pid) if pid else None
+                if not rss:
+                    continue
+                e['sampled'] = max(e['sampled'], rss)
+                if rss > e['reserved']:
+                    e['reserved'] = rss
+                    grew = True
+            if grew:
+                with self.cond:
+                    self.peak_projected = max(self.peak_projected, self.projected())
+
+    def summary(self):
+        return (f"Memory governor: budget {format_size(self.budget)}, peak reserved "
+                f"{format_size(self.peak_projected)}, held back {self.held} compiles")
+
+    def close(self):
+        self.stopped.set()
@@ -0,0 +1,206 @@
+# Image Assets - Downscaled, cached variants of content images for faster compiles
+
+import os
+import re
+import time
+import shutil
+import hashlib
+import logging
+import threading
+from pathlib import Path
+
+from ..config import BASE_DIR, CACHE_DIR
+from .build_cache import file_digest
+from .depgraph import resolve_ref
+
+IMAGES_DIR = CACHE_DIR / 'images'
+ROOTS_DIR = CACHE_DIR / 'roots'
+
+DEFAULT_DPI = 200
+JPEG_QUALITY = 85
+VARIANT_VERSION = 1
+
+# Text block of a section page: A4 with 1in margins (page-title.typ)
+TEXT_WIDTH_IN = 8.27 - 2
+_UNIT_IN = {'%': None, 'cm': 1 / 2.54, 'mm': 1 / 25.4, 'in': 1.0, 'pt': 1 / 72}
+RASTER_SUFFIXES = ('.png', '.jpg', '.jpeg')
+
+_IMAGE_RE = re.compile(r'\bimage\(\s*"([^"]+)"((?:[^()]|\([^()]*\))*)\)')
+_WIDTH_RE = re.compile(r'\bwidth:\s*([\d.]+)\s*(%|cm|mm|in|pt)')
+
+# Roots not used for this long are removed
+ROOT_MAX_AGE = 24 * 3600
+
+
+def find_images(content_dir=BASE_DIR / 'content'):
+    """Map every raster image referenced from content to the widest width, in inches, it is shown at.
+
+    Percentages are taken against the full text width, which bounds any
+    container they sit in; images without a width get the text width.
+    """
+    widths = {}
+    for src in sorted(Path(content_dir).rglob('*.typ')):
+        try:
+            text = src.read_text(errors='ignore')
+        except OSError:
+            continue
+        for m in _IMAGE_RE.finditer(text):
+            path = resolve_ref(m.group(1), src)
+            if path is None or path.suffix.lower() not in RASTER_SUFFIXES or not path.exists():
+                continue
+            inches = TEXT_WIDTH_IN
+            w = _WIDTH_RE.search(m.group(2))
+            if w:
+                value, unit = float(w.group(1)), w.group(2)
+                inches = TEXT_WIDTH_IN * value / 100 if unit == '%' else value * _UNIT_IN[unit]
+            widths[path] = max(widths.get(path, 0.0), min(inches, TEXT_WIDTH_IN))
+    return widths
+
+
+def touches_images(paths):
+    """True when any of paths is a raster image or a source that references one."""
+    for p in paths or ():
+        p = Path(p)
+        if p.suffix.lower() in RASTER_SUFFIXES:
+            return True
+        if p.suffix == '.typ':
+            try:
+                if _IMAGE_RE.search(p.read_text(errors='ignore')):
+                    return True
+            except OSError:
+                return True  # Removed: it may have been the only reference to an image
+    return False
+
+
+def optimize_image(path, inches, dpi):
+    """Return a cached variant of path sized for inches at dpi, or None to use the original.
+
+    The variant keeps the original's physical size by scaling its DPI
+    metadata with the pixels, so layouts without an explicit width don't move.
+    Images that would not shrink are remembered by an empty marker under the
+    same key, so later builds skip decoding them.
+    """
+    from PIL import Image
+    target_px = max(1, round(inches * dpi))
+    key = hashlib.sha256(f'{file_digest(path)}:{target_px}:{VARIANT_VERSION}'.encode()).hexdigest()
+    suffix = Path(path).suffix.lower()
+    out = IMAGES_DIR / f'{key}{suffix}'
+    if out.exists():
+        return out
+    keep = IMAGES_DIR / f'{key}.original'
+    if keep.exists():
+        return None
+    with Image.open(path) as im:
+        if im.width <= target_px:
+            _mark(keep)
+            return None
+        scale = target_px / im.width
+        src_dpi = (im.info.get('dpi') or (72, 72))[0] or 72
+        resized = im.resize((target_px, max(1, round(im.height * scale))), Image.LANCZOS)
+        IMAGES_DIR.mkdir(parents=True, exist_ok=True)
+        tmp = out.with_name(f'.{out.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+        new_dpi = (src_dpi * scale, src_dpi * scale)
+        if suffix == '.png':
+            resized.save(tmp, format='PNG', optimize=True, dpi=new_dpi)
+        else:
+            resized.convert('RGB').save(tmp, format='JPEG', quality=JPEG_QUALITY, optimize=True, dpi=new_dpi)
+    if tmp.stat().st_size >= Path(path).stat().st_size:
+        tmp.unlink()
+        _mark(keep)
+        return None
+    os.replace(tmp, out)
+    return out
+
+
+def _mark(path):
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.touch()
+    except OSError:
+        pass
+
+
+def _mirror(src, dst, replacements):
+    """Recreate src at dst as symlinks, with real directories only down to replaced files."""
+    dst.mkdir()
+    files, dirs = {}, {}
+    for rel, variant in replacements:
+        if len(rel.parts) == 1:
+            files[rel.parts[0]] = variant
+        else:
+            dirs.setdefault(rel.parts[0], []).append((Path(*rel.parts[1:]), variant))
+    for entry in os.scandir(src):
+        name = entry.name
+        if name in files:
+            os.symlink(files[name], dst / name)
+        elif name in dirs and entry.is_dir():
+            _mirror(src / name, dst / name, dirs[name])
+        else:
+            os.symlink(src / name, dst / name)
+
+
+def shadow_root(replacements):
+    """A mirror of BASE_DIR where each original image path points at its variant.
+
+    Typst resolves paths lexically under --root, so compiling against the
+    mirror picks up the variants without touching any source. Roots are
+    content-addressed and shared between builds.
+    """
+    base = BASE_DIR.resolve()
+    rels = sorted((Path(p).resolve().relative_to(base), Path(v)) for p, v in replacements.items())
+    # Listings of the directories that become real, so new or removed entries give a new root
+    mirrored = {BASE_DIR} | {BASE_DIR / a for r, _ in rels for a in r.parents if str(a) != '.'}
+    listing = [(str(d), sorted(os.listdir(d))) for d in sorted(mirrored)]
+    digest = hashlib.sha256(repr(([(str(r), str(v)) for r, v in rels], listing)).encode()).hexdigest()[:16]
+    root = ROOTS_DIR / digest
+    if not root.exists():
+        ROOTS_DIR.mkdir(parents=True, exist_ok=True)
+        tmp = ROOTS_DIR / f'.{digest}.{os.getpid()}'
+        shutil.rmtree(tmp, ignore_errors=True)
+        _mirror(BASE_DIR, tmp, rels)
+        try:
+            os.rename(tmp, root)
+        except OSError:
+            shutil.rmtree(tmp, ignore_errors=True)  # Another build created it first
+    os.utime(root)
+    _prune_roots(keep=root)
+    return root
+
+
+def _prune_roots(keep):
+    now = time.time()
+    for p in ROOTS_DIR.iterdir():
+        try:
+            if p != keep and now - p.lstat().st_mtime > ROOT_MAX_AGE:
+                shutil.rmtree(p, ignore_errors=True)
+        except OSError:
+            pass
+
+
+def prepare_images(dpi=DEFAULT_DPI, log=None):
+    """Build variants for all content images and return the root to compile against.
+
+    Returns None (compile against BASE_DIR) when Pillow is missing or no
+    image would shrink.
+    """
+    log = log or (lambda m, ok: None)
+    try:
+        import PIL
+    except ImportError:
+        log("Pillow not installed, compiling with original images", False)
+        return None
+    replacements = {}
+    saved = 0
+    for path, inches in find_images().items():
+        try:
+            variant = optimize_image(path, inches, dpi)
+        except Exception as e:
+            logging.warning(f'Could not optimize {path}: {e}')
+            continue
+        if variant and BASE_DIR.resolve() in path.resolve().parents:
+            replacements[path] = variant
+            saved += path.stat().st_size - variant.stat().st_size
+    if not replacements:
+        return None
+    log(f"Using {len(replacements)} downscaled images at {dpi} dpi ({saved / 1048576:.1f} MB smaller)", True)
+    return shadow_root(replacements)
@@ -0,0 +1,78 @@
+# Build Journal - Per-target checkpoints so an interrupted build can resume
+
+import os
+import json
+import threading
+from pathlib import Path
+
+JOURNAL_NAME = 'journal.json'
+
+
+class BuildJournal:
+    """Targets finished by the build in build_dir, with their input keys and offsets.
+
+    The file is rewritten atomically (temp file, fsync, rename) after every
+    compiled target, so a crash or kill leaves either the previous or the
+    new journal, never a torn one. A resumed build skips a target when its
+    input key is unchanged and its PDF is still the file that was recorded.
+    """
+
+    def __init__(self, build_dir):
+        self.path = Path(build_dir) / JOURNAL_NAME
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def exists(build_dir):
+        return (Path(build_dir) / JOURNAL_NAME).exists()
+
+    def load(self):
+        """Read the journal left by a previous build. Returns the number of targets in it."""
+        try:
+            data = json.loads(self.path.read_text())
+            entries = data.get('targets', {}) if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            entries = {}
+        with self.lock:
+            self.entries = entries
+        return len(entries)
+
+    def reset(self):
+        with self.lock:
+            self.entries = {}
+            self.path.unlink(missing_ok=True)
+
+    def record(self, key, input_key, offset, output, pages, headings):
+        try:
+            st = Path(output).stat()
+        except OSError:
+            return
+        with self.lock:
+            self.entries[key] = {
+                'input': input_key, 'offset': offset, 'output': str(output),
+                'file': [st.st_size, st.st_mtime_ns], 'pages': pages, 'headings': headings,
+            }
+            self._write()
+
+    def _write(self):
+        tmp = self.path.with_name(f'.{self.path.name}.{os.getpid()}.tmp')
+        try:
+            with open(tmp, 'w') as f:
+                json.dump({'targets': self.entries}, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+        except OSError:
+            tmp.unlink(missing_ok=True)
+
+    def resumable(self, key, input_key, output):
+        """The entry for key if it can be reused as is, else None."""
+        with self.lock:
+            entry = self.entries.get(key)
+        if not entry or entry['input'] != input_key or entry['output'] != str(output):
+            return None
+        try:
+            st = Path(output).stat()
+        except OSError:
+            return None
+        return entry if entry['file'] == [st.st_size, st.st_mtime_ns] else None
@@ -0,0 +1,96 @@
+# PDF Pages - In-process page counting without spawning pdfinfo
+
+import os
+import re
+import mmap
+import shutil
+import logging
+import threading
+import subprocess
+
+_OBJ_RE = re.compile(rb'(\d+)\s+(\d+)\s+obj\b')
+_PAGES_RE = re.compile(rb'/Type\s*/Pages\b')
+_COUNT_RE = re.compile(rb'/Count\s+(\d+)')
+
+_memo = {}
+_memo_lock = threading.Lock()
+MEMO_LIMIT = 4096
+
+
+def _scan_page_tree(mm):
+    """Return /Count of the root page tree node, or None if it cannot be found.
+
+    The root /Pages node is the one without a /Parent. When a file has
+    incremental updates the last definition wins, which is the one a
+    reader would resolve through the final xref section.
+    """
+    count = None
+    for m in _PAGES_RE.finditer(mm):
+        start = mm.rfind(b' obj', 0, m.start())
+        end = mm.find(b'endobj', m.end())
+        if start == -1 or end == -1:
+            continue
+        body = mm[start:end]
+        if b'/Parent' in body:
+            continue
+        c = _COUNT_RE.search(body)
+        if c:
+            count = int(c.group(1))
+    return count
+
+
+def _count_native(path):
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return None
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return _scan_page_tree(mm)
+
+
+def _count_pypdf(path):
+    try:
+        import pypdf
+    except ImportError:
+        return None
+    return len(pypdf.PdfReader(path).pages)
+
+
+def _count_pdfinfo(path):
+    if not shutil.which('pdfinfo'):
+        return None
+    result = subprocess.run(['pdfinfo', str(path)], capture_output=True, text=True, check=True)
+    for line in result.stdout.split('\n'):
+        if line.startswith('Pages:'):
+            return int(line.split(':')[1].strip())
+    return None
+
+
+def count_pages(path):
+    """Count pages of a PDF, memoized by (path, mtime, size).
+
+    Tries a memory-mapped scan of the page tree first (page trees in
+    object streams are invisible to it), then pypdf, then pdfinfo.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return 0
+    key = (str(path), st.st_mtime_ns, st.st_size)
+    with _memo_lock:
+        if key in _memo:
+            return _memo[key]
+    count = None
+    for counter in (_count_native, _count_pypdf, _count_pdfinfo):
+        try:
+            count = counter(path)
+        except Exception as e:
+            logging.debug(f'{counter.__name__} failed for {path}: {e}')
+            count = None
+        if count is not None:
+            break
+    count = count or 0
+    with _memo_lock:
+        if len(_memo) >= MEMO_LIMIT:
+            _memo.clear()
+        _memo[key] = count
+    return count
@@ -0,0 +1,327 @@
+# PDF Stream - Merge per-target PDFs into one file holding a single input at a time
+
+import io
+import hashlib
+import logging
+
+from pypdf import PdfReader
+from pypdf.generic import (
+    ArrayObject, DecodedStreamObject, DictionaryObject, IndirectObject, NameObject,
+    NumberObject, StreamObject, create_string_object,
+)
+
+# Objects whose identity matters: a page sits once in the page tree and an annotation on one page
+_UNSHARED = {'/Page', '/Annot'}
+_FOLIO = NameObject('/NwFolio')
+
+
+def _outline_tree(bookmarks_list, page_count):
+    """Nest pdftk-style bookmark lines as [title, page index, children], like _add_outline."""
+    roots, parents = [], {0: None}
+    i = 0
+    while i < len(bookmarks_list):
+        if bookmarks_list[i] != 'BookmarkBegin':
+            i += 1
+            continue
+        try:
+            title = bookmarks_list[i + 1].split(': ', 1)[1]
+            level = int(bookmarks_list[i + 2].split(': ', 1)[1])
+            page = int(bookmarks_list[i + 3].split(': ', 1)[1]) - 1
+        except (IndexError, ValueError):
+            i += 1
+            continue
+        if 0 <= page < page_count:
+            node = [title, page, []]
+            parent = parents.get(level - 1)
+            (parent[2] if parent else roots).append(node)
+            parents[level] = node
+        i += 4
+    return roots
+
+
+def _dest_names(reader):
+    """Yield (name, raw destination) from the catalog's /Names /Dests tree.
+
+    Links name these destinations by string; the older /Dests dictionary
+    (linked to by name objects) is yielded with the name object as key.
+    """
+    root = reader.trailer['/Root']
+    if '/Dests' in root:
+        yield from root['/Dests'].items()
+    tree = root['/Names'].get('/Dests') if '/Names' in root else None
+    stack = [tree] if tree is not None else []
+    while stack:
+        node = stack.pop().get_object()
+        if '/Names' in node:
+            pairs = node['/Names']
+            for k in range(0, len(pairs) - 1, 2):
+                yield str(pairs[k].get_object()), pairs[k + 1]
+        if '/Kids' in node:
+            stack.extend(node['/Kids'])
+
+
+class StreamingMerge:
+    """Write a merged PDF object by object while reading one input at a time.
+
+    Each input's pages and everything they reference are copied with fresh
+    object numbers and written out straight away; only byte offsets, page
+    numbers and (with dedupe) a digest per written object are kept, so peak
+    memory is that of the largest input rather than the whole book. Objects
+    are written after the objects they reference, which lets dedupe map a
+    copy that is byte-identical once renumbered (a font program, image or
+    ICC profile every target embeds) onto the object already written.
+    Outline, page tree, named destinations and document info are written
+    last, in the same pass.
+    """
+
+    def __init__(self, out, dedupe=True):
+        self.out = out
+        self.dedupe = dedupe
+        self.offsets = [None]
+        self.seen = {}
+        self.done = {}
+        self.visiting = set()
+        self.reserved = {}
+        self.overrides = {}
+        self.kids = []
+        self.dests = {}
+        self.push = self.pop = None
+        self.deduped = 0
+        self.out.write(b'%PDF-1.7\n%\xe2\xe3\xcf\xd3\n')
+        self.pages_root = self._allocate()
+
+    def _allocate(self):
+        self.offsets.append(None)
+        return len(self.offsets) - 1
+
+    def _write(self, num, body):
+        self.offsets[num] = self.out.tell()
+        self.out.write(b'%d 0 obj\n' % num)
+        self.out.write(body)
+        self.out.write(b'\nendobj\n')
+
+    def _place(self, obj, num=None, key=None):
+        """Write obj as a new object (or reuse an identical one). Returns its number.
+
+        key is the source object being copied; a cycle met while writing its
+        children may already have given it a number.
+        """
+        body = self._serialize(obj)
+        if key in self.reserved:
+            num = self.reserved[key]
+        digest = None
+        kind = obj.get('/Type') if isinstance(obj, DictionaryObject) else None
+        if num is None and self.dedupe and not (isinstance(kind, str) and kind in _UNSHARED):
+            digest = hashlib.sha256(body).digest()
+            if digest in self.seen:
+                self.deduped += 1
+                return self.seen[digest]
+        if num is None:
+            num = self._allocate()
+        self._write(num, body)
+        if digest:
+            self.seen[digest] = num
+        return num
+
+    def own(self, obj):
+        """Write an object of our own and return a reference to it."""
+        return IndirectObject(self._place(obj), 0, self)
+
+    def _ref(self, ref):
+        if ref.pdf is self:
+            return ref.idnum
+        key = (id(ref.pdf), ref.idnum, ref.generation)
+        if key in self.done:
+            return self.done[key]
+        if key in self.visiting:
+            # A cycle (an annotation pointing back at its page): number it now, write it when done
+            if key not in self.reserved:
+                self.reserved[key] = self._allocate()
+            return self.reserved[key]
+        self.visiting.add(key)
+        try:
+            obj = self.overrides.get(key)
+            num = self._place(obj if obj is not None else ref.get_object(), key=key)
+        finally:
+            self.visiting.discard(key)
+            self.reserved.pop(key, None)
+        self.done[key] = num
+        return num
+
+    def _serialize(self, obj):
+        buf = io.BytesIO()
+        if isinstance(obj, StreamObject):
+            self._dict(obj, buf, skip='/Length')
+            data = obj._data
+            buf.write(b'/Length %d>>\nstream\n' % len(data))
+            buf.write(data)
+            buf.write(b'\nendstream')
+        else:
+            self._emit(obj, buf)
+        return buf.getvalue()
+
+    def _dict(self, obj, buf, skip=None):
+        page = obj.get('/Type') == '/Page'
+        buf.write(b'<<')
+        for key, value in obj.items():
+            if key == skip:
+                continue
+            key.write_to_stream(buf)
+            buf.write(b' ')
+            if page and key == '/Parent':
+                buf.write(b'%d 0 R' % self.pages_root)
+            else:
+                self._emit(value, buf)
+            buf.write(b'\n')
+        if skip is None:
+            buf.write(b'>>')
+
+    def _emit(self, obj, buf):
+        if obj is None:
+            buf.write(b'null')
+        elif isinstance(obj, IndirectObject):
+            buf.write(b'%d 0 R' % self._ref(obj))
+        elif isinstance(obj, StreamObject):
+            # Streams are never direct; one built in memory becomes an object of its own
+            buf.write(b'%d 0 R' % self._place(obj))
+        elif isinstance(obj, DictionaryObject):
+            self._dict(obj, buf)
+        elif isinstance(obj, ArrayObject):
+            buf.write(b'[')
+            for n, item in enumerate(obj):
+                if n:
+                    buf.write(b' ')
+                self._emit(item, buf)
+            buf.write(b']')
+        else:
+            obj.write_to_stream(buf)
+
+    def stamp(self, page, stamp):
+        """Overlay stamp (a page of another open reader) on page as a form XObject.
+
+        The page's own content is wrapped in q/Q so its graphics state does
+        not leak into the overlay, and nothing is decoded or re-encoded.
+        """
+        form = DecodedStreamObject()
+        contents = stamp.get_contents()
+        form.set_data(contents.get_data() if contents is not None else b'')
+        form.update({
+            NameObject('/Type'): NameObject('/XObject'),
+            NameObject('/Subtype'): NameObject('/Form'),
+            NameObject('/BBox'): ArrayObject(stamp.mediabox),
+            NameObject('/Resources'): stamp.get('/Resources', DictionaryObject()),
+        })
+        if self.push is None:
+            push, pop = DecodedStreamObject(), DecodedStreamObject()
+            push.set_data(b'q\n')
+            pop.set_data(b'\nQ\nq /NwFolio Do Q\n')
+            self.push, self.pop = self.own(push), self.own(pop)
+        resources = DictionaryObject(page['/Resources'] if '/Resources' in page else {})
+        xobjects = DictionaryObject(resources['/XObject'] if '/XObject' in resources else {})
+        xobjects[_FOLIO] = self.own(form.flate_encode())
+        resources[NameObject('/XObject')] = xobjects
+        page[NameObject('/Resources')] = resources
+        contents = page['/Contents'] if '/Contents' in page else None
+        if isinstance(contents, ArrayObject):
+            parts = list(contents)
+        else:
+            parts = [page.raw_get('/Contents')] if contents is not None else []
+        page[NameObject('/Contents')] = ArrayObject([self.push, *parts, self.pop])
+
+    def append(self, path, stamps=None):
+        """Copy every page of path (overlaying stamps, {page index in path: stamp page}) and drop the input."""
+        reader = PdfReader(path)
+        pages = list(reader.pages)
+        for index, page in enumerate(pages):
+            # reader.pages carry inherited attributes; write them instead of the bare page dicts
+            self.overrides[(id(reader), page.indirect_reference.idnum, page.indirect_reference.generation)] = page
+            if stamps and index in stamps:
+                self.stamp(page, stamps[index])
+        for page in pages:
+            self.kids.append(self._ref(page.indirect_reference))
+        try:
+            for name, value in _dest_names(reader):
+                if name not in self.dests:
+                    self.dests[name] = self._serialize(value)
+        except Exception as e:
+            logging.warning(f'Skipping named destinations of {path}: {e}')
+        owner = id(reader)
+        self.done = {k: v for k, v in self.done.items() if k[0] != owner}
+        self.overrides.clear()
+        return len(pages)
+
+    def _outline(self, roots):
+        """Write outline items for [title, page, children] nodes. Returns the /Outlines number."""
+        top = self._allocate()
+        numbered = []
+
+        def number(nodes, parent):
+            for node in nodes:
+                node.append(self._allocate())
+                numbered.append((node, parent, nodes))
+                number(node[2], node[3])
+
+        def visible(nodes):
+            return sum(1 + visible(n[2]) for n in nodes)
+        number(roots, top)
+        for node, parent, siblings in numbered:
+            title, page, children, num = node
+            i = next(k for k, s in enumerate(siblings) if s is node)
+            item = DictionaryObject({
+                NameObject('/Title'): create_string_object(title),
+                NameObject('/Parent'): IndirectObject(parent, 0, self),
+                NameObject('/Dest'): ArrayObject([IndirectObject(self.kids[page], 0, self), NameObject('/Fit')]),
+            })
+            if i:
+                item[NameObject('/Prev')] = IndirectObject(siblings[i - 1][3], 0, self)
+            if i + 1 < len(siblings):
+                item[NameObject('/Next')] = IndirectObject(siblings[i + 1][3], 0, self)
+            if children:
+                item[NameObject('/First')] = IndirectObject(children[0][3], 0, self)
+                item[NameObject('/Last')] = IndirectObject(children[-1][3], 0, self)
+                item[NameObject('/Count')] = NumberObject(visible(children))
+            self._place(item, num)
+        self._place(DictionaryObject({
+            NameObject('/Type'): NameObject('/Outlines'),
+            NameObject('/First'): IndirectObject(roots[0][3], 0, self),
+            NameObject('/Last'): IndirectObject(roots[-1][3], 0, self),
+            NameObject('/Count'): NumberObject(visible(roots)),
+        }), top)
+        return top
+
+    def close(self, bookmarks_list, info):
+        """Write page tree, outline, named destinations, info and the cross-reference table."""
+        self._write(self.pages_root, b'<</Type /Pages /Count %d /Kids [%s]>>' % (
+            len(self.kids), b' '.join(b'%d 0 R' % k for k in self.kids)))
+        catalog = b'<</Type /Catalog /Pages %d 0 R' % self.pages_root
+        roots = _outline_tree(bookmarks_list or [], len(self.kids))
+        if roots:
+            catalog += b' /Outlines %d 0 R' % self._outline(roots)
+        strings = sorted(k for k in self.dests if not isinstance(k, NameObject))
+        if strings:
+            names = io.BytesIO()
+            for name in strings:
+                create_string_object(name).write_to_stream(names)
+                names.write(b' ' + self.dests[name] + b'\n')
+            tree = self._allocate()
+            self._write(tree, b'<</Names [' + names.getvalue() + b']>>')
+            catalog += b' /Names <</Dests %d 0 R>>' % tree
+        named = [k for k in self.dests if isinstance(k, NameObject)]
+        if named:
+            dests = io.BytesIO()
+            for name in named:
+                name.write_to_stream(dests)
+                dests.write(b' ' + self.dests[name] + b'\n')
+            catalog += b' /Dests <<' + dests.getvalue() + b'>>'
+        root = self._allocate()
+        self._write(root, catalog + b'>>')
+        info_num = self._place(DictionaryObject({
+            NameObject(k): create_string_object(str(v)) for k, v in info.items()
+        }))
+        xref = self.out.tell()
+        self.out.write(b'xref\n0 %d\n0000000000 65535 f \n' % len(self.offsets))
+        for offset in self.offsets[1:]:
+            self.out.write(b'%010d 00000 n \n' % offset)
+        file_id = hashlib.md5(b'%d %d' % (len(self.kids), xref)).hexdigest().encode()
+        self.out.write(b'trailer\n<</Size %d /Root %d 0 R /Info %d 0 R /ID [<%s> <%s>]>>\nstartxref\n%d\n%%%%EOF\n' % (
+            len(self.offsets), root, info_num, file_id, file_id, xref))
@@ -0,0 +1,123 @@
+# Build Profile - Per-target timings and a Chrome trace timeline
+
+import os
+import json
+import time
+import threading
+import contextlib
+from pathlib import Path
+
+
+class BuildProfiler:
+    """Collects per-task and per-phase timings for one build.
+
+    Times are monotonic seconds relative to the profiler's creation. The
+    report is written as a summary JSON plus a Chrome trace (open it in
+    chrome://tracing or ui.perfetto.dev) with one track per worker slot.
+    Slots are assigned from the recorded intervals, not thread idents, since
+    every pass runs on a fresh executor: the trace never shows more tracks
+    than tasks ever ran at once.
+    """
+
+    def __init__(self):
+        self.t0 = time.monotonic()
+        self.tasks = []
+        self.phases = []
+        self.lock = threading.Lock()
+
+    def now(self):
+        return time.monotonic() - self.t0
+
+    def _assign_lanes(self):
+        """Put each worker task (worker None) on the lowest slot free when it started. Returns the slot count."""
+        ends = []
+        for t in sorted(self.tasks, key=lambda t: t['start']):
+            if t['worker'] == 0:
+                continue
+            lane = next((i for i, end in enumerate(ends) if end <= t['start']), len(ends))
+            if lane == len(ends):
+                ends.append(0.0)
+            ends[lane] = t['end']
+            t['worker'] = lane + 1
+        return len(ends)
+
+    def record_task(self, key, pass_no, submitted, started, ended, worker=None, stats=None, output=None):
+        """Record a task; worker 0 is the main thread, None a worker slot assigned when written."""
+        stats = stats or {}
+        size = stats.get('output_size')
+        try:
+            if size is None and output:
+                size = os.path.getsize(output)
+        except OSError:
+            size = None
+        with self.lock:
+            self.tasks.append({
+                'key': key,
+                'pass': pass_no,
+                'worker': worker,
+                'submitted': submitted,
+                'start': started,
+                'end': ended,
+                'queue_wait': max(0.0, started - submitted),
+                'wall': ended - started,
+                'cpu': stats.get('cpu'),
+                'peak_rss': stats.get('peak_rss'),
+                'output_size': size,
+                'cached': bool(stats.get('cached')),
+            })
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        start = self.now()
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.phases.append({'name': name, 'start': start, 'end': self.now()})
+
+    def summary(self, workers=None):
+        wall = self.now()
+        compiled = [t for t in self.tasks if not t['cached']]
+        busy = sum(t['wall'] for t in compiled)
+        lanes = workers or max(1, self._assign_lanes())
+        return {
+            'wall': wall,
+            'workers': lanes,
+            'passes': max((t['pass'] for t in self.tasks), default=0),
+            'compiled': len(compiled),
+            'cached': len(self.tasks) - len(compiled),
+            'busy': busy,
+            'cpu': sum(t['cpu'] or 0.0 for t in compiled),
+            'peak_rss': max((t['peak_rss'] or 0 for t in compiled), default=0),
+            'utilization': busy / (wall * lanes) if wall > 0 else 0.0,
+            'phases': {p['name']: p['end'] - p['start'] for p in self.phases},
+            'slowest': [t['key'] for t in sorted(compiled, key=lambda t: t['wall'], reverse=True)[:5]],
+        }
+
+    def trace_events(self):
+        us = lambda s: int(s * 1e6)
+        events = [{'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': 0, 'args': {'name': 'main'}}]
+        for tid in sorted({t['worker'] for t in self.tasks} - {0}):
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': tid, 'args': {'name': f'worker {tid}'}})
+        for p in self.phases:
+            events.append({'name': p['name'], 'cat': 'phase', 'ph': 'X', 'pid': 1, 'tid': 0,
+                           'ts': us(p['start']), 'dur': us(p['end'] - p['start'])})
+        for t in self.tasks:
+            args = {k: t[k] for k in ('pass', 'queue_wait', 'cpu', 'peak_rss', 'output_size', 'cached')}
+            events.append({'name': t['key'], 'cat': 'cache' if t['cached'] else 'compile', 'ph': 'X',
+                           'pid': 1, 'tid': t['worker'], 'ts': us(t['start']), 'dur': us(t['wall']), 'args': args})
+        return events
+
+    def write(self, output, workers=None):
+        """Write <output>.profile.json and <output>.trace.json next to output. Returns both paths."""
+        output = Path(output)
+        profile_path = output.with_suffix('.profile.json')
+        trace_path = output.with_suffix('.trace.json')
+        with self.lock:
+            self._assign_lanes()
+            report = {'summary': self.summary(workers), 'phases': list(self.phases),
+                      'tasks': sorted(self.tasks, key=lambda t: t['start'])}
+            trace = {'traceEvents': self.trace_events(), 'displayTimeUnit': 'ms'}
+        profile_path.write_text(json.dumps(report, indent=2))
+        trace_path.write_text(json.dumps(trace))
+        return profile_path, trace_path
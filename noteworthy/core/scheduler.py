@@ -0,0 +1,104 @@
+# Scheduler - Longest-expected-first dispatch for parallel compiles
+
+import heapq
+import itertools
+import threading
+import contextlib
+import statistics
+
+
+class DurationScheduler:
+    """Orders compile tasks by expected duration, longest first.
+
+    Estimates come from durations recorded in the build state. Targets
+    with no history get a size-based estimate: a fixed per-process
+    overhead plus a per-byte rate, both fitted from the targets that do
+    have history.
+    """
+
+    DEFAULT_OVERHEAD = 1.0
+    DEFAULT_RATE = 1e-4  # seconds per source byte
+
+    def __init__(self, records, sources=None):
+        self.durations = {k: r['duration'] for k, r in records.items() if r.get('duration')}
+        self.sources = sources or {}
+        self.overhead, self.rate = self._fit()
+
+    def _size(self, key):
+        src = self.sources.get(key)
+        try:
+            return src.stat().st_size if src else 0
+        except OSError:
+            return 0
+
+    def _fit(self):
+        """Fit overhead as the fastest recorded compile and rate as the median per-byte cost above it."""
+        if not self.durations:
+            return self.DEFAULT_OVERHEAD, self.DEFAULT_RATE
+        overhead = min(self.durations.values())
+        rates = [
+            (d - overhead) / size
+            for k, d in self.durations.items()
+            if (size := self._size(k)) > 0
+        ]
+        rate = statistics.median(rates) if rates else self.DEFAULT_RATE
+        return overhead, max(rate, 0.0)
+
+    def estimate(self, key):
+        """Expected compile time of a target, or of a tuple of targets compiled in one process."""
+        if isinstance(key, tuple):
+            if len(key) == 1:
+                return self.estimate(key[0])
+            return self.overhead + sum(self.work(k) for k in key)
+        if key in self.durations:
+            return self.durations[key]
+        return self.overhead + self.rate * self._size(key)
+
+    def work(self, key):
+        """Expected compile time of a target beyond the per-process overhead."""
+        return max(0.0, self.estimate(key) - self.overhead)
+
+    def order(self, keys):
+        """Return keys sorted longest-expected-first (stable for ties)."""
+        return sorted(keys, key=self.estimate, reverse=True)
+
+    def makespan(self, keys, workers):
+        """Predicted wall time of running keys on workers with greedy LPT dispatch."""
+        workers = max(1, workers)
+        loads = [0.0] * min(workers, max(1, len(keys)))
+        heapq.heapify(loads)
+        for key in self.order(keys):
+            heapq.heappush(loads, heapq.heappop(loads) + self.estimate(key))
+        return max(loads) if keys else 0.0
+
+
+class SlotGate:
+    """Shares a fixed number of compile slots between several builds.
+
+    Waiting compiles are admitted longest-expected-first regardless of
+    which build submitted them, so concurrent variants are scheduled as one
+    queue over one set of workers.
+    """
+
+    def __init__(self, slots):
+        self.free = max(1, slots)
+        self.waiting = []
+        self.seq = itertools.count()
+        self.cond = threading.Condition()
+
+    @contextlib.contextmanager
+    def slot(self, estimate=0.0):
+        entry = (-estimate, next(self.seq))
+        with self.cond:
+            heapq.heappush(self.waiting, entry)
+            while self.waiting[0] != entry or not self.free:
+                self.cond.wait()
+            heapq.heappop(self.waiting)
+            self.free -= 1
+            self.cond.notify_all()
+        try:
+            yield
+        finally:
+            with self.cond:
+                self.free += 1
+                self.cond.notify_all()
@@ -0,0 +1,151 @@
+# Build Variants - Config overrides per output and which targets they can affect
+
+import re
+import json
+import threading
+from pathlib import Path
+
+from ..config import BASE_DIR, BUILD_DIR, SYSTEM_CONFIG_DIR, PREFACE_FILE
+
+# Top-level statements of a template file: a definition or any other hash-prefixed line at column 0
+_CHUNK_RE = re.compile(r'^#(let\s+([A-Za-z_][\w-]*)|[A-Za-z_])', re.M)
+_COMMENT_RE = re.compile(r'/\*.*?\*/|//[^\n]*', re.S)
+_ALIAS_RE = re.compile(r'([A-Za-z_][\w-]*)\s+as\s+([A-Za-z_][\w-]*)')
+# Renderer branches for one named target (cover, preface, outline) only reach front matter
+_FRONT_RE = re.compile(r'\bwanted\("[^"]*"\)')
+# The lines in setup.typ that expose a config key as a template variable, and the keys they read
+_BINDING_RE = re.compile(r'^#let\s+([\w-]+)\s*=(.*\b(?:constants|metadata)\..*)$', re.M)
+_READ_RE = re.compile(r'(?<![\w/."-])(?:constants|metadata)\.(?:at\(\s*"([\w-]+)"|([A-Za-z_][\w-]*))')
+
+
+def parse_override(text):
+    """Parse key=value, reading the value as JSON when it is valid JSON (true, 3, "x") and as a string otherwise."""
+    key, sep, raw = text.partition('=')
+    if not sep or not key.strip():
+        raise ValueError(f'Expected key=value, got {text!r}')
+    try:
+        value = json.loads(raw)
+    except ValueError:
+        value = raw
+    return key.strip(), value
+
+
+def parse_variants(specs):
+    """Turn [[name, 'key=value', ...], ...] (repeated --variant flags) into {name: overrides}."""
+    variants = {}
+    for spec in specs:
+        name, *pairs = spec
+        if not re.fullmatch(r'[\w.-]+', name):
+            raise ValueError(f'Invalid variant name {name!r}')
+        variants[name] = dict(parse_override(p) for p in pairs)
+    return variants
+
+
+def load_variants(path):
+    """Read {name: {key: value}} from a JSON matrix file."""
+    data = json.loads(Path(path).read_text())
+    if not isinstance(data, dict) or not all(isinstance(v, dict) for v in data.values()):
+        raise ValueError(f'{path}: expected an object of variant name -> config overrides')
+    return data
+
+
+def _uses(text, name):
+    return re.search(rf'(?<![\w-]){re.escape(name)}(?![\w-])', text) is not None
+
+
+class ConfigUsage:
+    """Works out which config keys a section's output can depend on.
+
+    A key read anywhere in the templates outside a named definition (a show
+    or set rule, a top-level conditional) affects every page. A key read only
+    inside definitions affects just the sections that use those definitions,
+    directly, through other definitions built on them or through import
+    aliases. Renderer branches for a single named target are skipped since
+    front matter always sees every override. The config .typ files are
+    scanned too, since setup.typ imports the snippets into every page; the
+    preface is not, as its text only renders on the preface page. A key
+    the scan cannot place, read by no template and bound by no setup.typ
+    line, is treated as affecting every page.
+    """
+
+    def __init__(self, roots=(BASE_DIR / 'templates', BASE_DIR / 'config')):
+        self.roots = [Path(r) for r in roots]
+        self.chunks = None
+        self.bindings = {}
+        self.carriers = {}
+        self.lock = threading.Lock()
+
+    def _load(self):
+        chunks = []
+        paths = sorted(p for root in self.roots for p in root.rglob('*.typ'))
+        for path in paths:
+            if BUILD_DIR in path.parents or SYSTEM_CONFIG_DIR in path.parents or path == PREFACE_FILE:
+                continue
+            try:
+                text = path.read_text(errors='ignore')
+            except OSError:
+                continue
+            text = _COMMENT_RE.sub('', text)
+            if path.name == 'setup.typ':
+                for var, expr in _BINDING_RE.findall(text):
+                    for a, b in _READ_RE.findall(expr):
+                        self.bindings.setdefault(a or b, set()).add(var)
+                text = _BINDING_RE.sub('', text)
+            starts = list(_CHUNK_RE.finditer(text))
+            for i, m in enumerate(starts):
+                end = starts[i + 1].start() if i + 1 < len(starts) else len(text)
+                body = text[m.start():end]
+                if body.startswith('#import'):
+                    chunks.extend(('alias', (a, b)) for a, b in _ALIAS_RE.findall(body.split('\n', 1)[0]))
+                elif m.group(2):
+                    chunks.append((m.group(2), body))
+                elif not _FRONT_RE.search(body.split('\n', 1)[0]):
+                    chunks.append((None, body))
+        return chunks
+
+    def carriers_of(self, key):
+        """Definitions whose output depends on key, or None when key affects every page."""
+        with self.lock:
+            if key in self.carriers:
+                return self.carriers[key]
+            if self.chunks is None:
+                self.chunks = self._load()
+            names = {key} | self.bindings.get(key, set())
+            if key not in self.bindings and not any(
+                    name != 'alias' and _uses(body, key) for name, body in self.chunks):
+                self.carriers[key] = None
+                return None
+            changed = True
+            while changed:
+                changed = False
+                for name, body in self.chunks:
+                    if name == 'alias':
+                        if body[0] in names and body[1] not in names:
+                            names.add(body[1])
+                            changed = True
+                        continue
+                    if name in names or not any(_uses(body, n) for n in names):
+                        continue
+                    if name is None:
+                        self.carriers[key] = None
+                        return None
+                    names.add(name)
+                    changed = True
+            self.carriers[key] = names
+            return names
+
+    def relevant(self, overrides, files):
+        """The subset of overrides a section compiled from files can depend on."""
+        texts = []
+        for f in files:
+            try:
+                texts.append(Path(f).read_text(errors='ignore'))
+            except (OSError, UnicodeDecodeError):
+                continue
+        text = '\n'.join(texts)
+        relevant = {}
+        for key, value in overrides.items():
+            names = self.carriers_of(key)
+            if names is None or any(_uses(text, n) for n in names):
+                relevant[key] = value
+        return relevant
@@ -0,0 +1,175 @@
+# Tree Watcher - inotify (or polling) change detection for watch-mode rebuilds
+
+import os
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+from pathlib import Path
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+_EVENT = struct.Struct('iIII')
+
+# Quiet period that ends a burst of events (editors often write several files per save)
+DEBOUNCE = 0.15
+POLL_INTERVAL = 0.5
+
+
+def _ignored(name):
+    return name.startswith('.') or name.endswith(('~', '.swp', '.swx', '.tmp')) or name == '__pycache__'
+
+
+class TreeWatcher:
+    """Reports files changed under a set of directory trees.
+
+    Uses inotify through ctypes on Linux and falls back to polling
+    modification times elsewhere or when inotify is unavailable.
+    """
+
+    def __init__(self, roots, excludes=()):
+        self.roots = [Path(r) for r in roots if Path(r).exists()]
+        self.excludes = [Path(e) for e in excludes]
+        self.fd = None
+        self.wds = {}
+        self.snapshot = {}
+        try:
+            self._init_inotify()
+        except OSError:
+            self.fd = None
+        if self.fd is None:
+            self.snapshot = self._scan()
+
+    @property
+    def backend(self):
+        return 'inotify' if self.fd is not None else 'polling'
+
+    def _excluded(self, path):
+        return any(path == e or e in path.parents for e in self.excludes)
+
+    def _walk_dirs(self, root):
+        for dirpath, dirnames, _ in os.walk(root):
+            d = Path(dirpath)
+            dirnames[:] = [n for n in dirnames if not _ignored(n) and not self._excluded(d / n)]
+            yield d
+
+    # inotify backend
+
+    def _init_inotify(self):
+        name = ctypes.util.find_library('c')
+        if not name or not hasattr(os, 'O_NONBLOCK'):
+            raise OSError('inotify unavailable')
+        libc = ctypes.CDLL(name, use_errno=True)
+        if not hasattr(libc, 'inotify_init1'):
+            raise OSError('inotify unavailable')
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self.libc, self.fd = libc, fd
+        for root in self.roots:
+            self._add_tree(root)
+
+    def _add_tree(self, root):
+        for d in self._walk_dirs(root):
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(d), WATCH_MASK)
+            if wd < 0:
+                err = ctypes.get_errno()
+                if err == errno.ENOSPC:
+                    raise OSError(err, 'inotify watch limit reached')
+                continue
+            self.wds[wd] = d
+
+    def _read_events(self):
+        changed = set()
+        try:
+            data = os.read(self.fd, 65536)
+        except BlockingIOError:
+            return changed
+        i = 0
+        while i + _EVENT.size <= len(data):
+            wd, mask, _, length = _EVENT.unpack_from(data, i)
+            raw = data[i + _EVENT.size:i + _EVENT.size + length].rstrip(b'\0')
+            i += _EVENT.size + length
+            if mask & IN_Q_OVERFLOW:
+                changed.update(self.roots)
+                continue
+            if mask & IN_IGNORED:
+                self.wds.pop(wd, None)
+                continue
+            base = self.wds.get(wd)
+            if base is None:
+                continue
+            name = os.fsdecode(raw)
+            path = base / name if name else base
+            if name and _ignored(name) or self._excluded(path):
+                continue
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                self._add_tree(path)
+            changed.add(path)
+        return changed
+
+    def _wait_inotify(self, timeout):
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        return self._read_events() if ready else set()
+
+    # polling backend
+
+    def _scan(self):
+        snap = {}
+        for root in self.roots:
+            for d in self._walk_dirs(root):
+                try:
+                    entries = list(os.scandir(d))
+                except OSError:
+                    continue
+                for e in entries:
+                    if e.is_file() and not _ignored(e.name):
+                        try:
+                            st = e.stat()
+                        except OSError:
+                            continue
+                        snap[Path(e.path)] = (st.st_mtime_ns, st.st_size)
+        return snap
+
+    def _wait_polling(self, timeout):
+        time.sleep(POLL_INTERVAL if timeout is None else min(timeout, POLL_INTERVAL))
+        snap = self._scan()
+        changed = {p for p in snap.keys() | self.snapshot.keys() if snap.get(p) != self.snapshot.get(p)}
+        self.snapshot = snap
+        return changed
+
+    def wait(self, timeout=None):
+        """Block until something changes, then return the changed paths once the burst settles.
+
+        Returns an empty set if timeout (seconds) passes without changes.
+        """
+        poll = self._wait_inotify if self.fd is not None else self._wait_polling
+        deadline = None if timeout is None else time.monotonic() + timeout
+        changed = set()
+        while not changed:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return changed
+            changed = poll(remaining if remaining is not None else POLL_INTERVAL * 4)
+        while True:
+            more = poll(DEBOUNCE)
+            if not more:
+                return changed
+            changed |= more
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
@@ -0,0 +1,236 @@
+# Warm Workers - Long-lived typst processes reused across targets and builds
+
+import os
+import re
+import json
+import queue
+import atexit
+import shutil
+import logging
+import itertools
+import threading
+import subprocess
+from pathlib import Path
+
+from ..config import BASE_DIR, CACHE_DIR, RENDERER_FILE
+from . import build
+from .build import TYPST_PATH, TypstBuildError
+
+WORKERS_DIR = CACHE_DIR / 'workers'
+
+# typst watch prints one of these after every compile
+_STATUS_RE = re.compile(r'compiled (successfully|with warnings|with errors)')
+
+# Give up on a warm worker that prints nothing for this long and compile cold instead
+STALL_TIMEOUT = 120.0
+
+_ids = itertools.count(1)
+
+
+class WarmWorker:
+    """One `typst watch` process kept alive between compiles.
+
+    The compiler keeps fonts, parsed templates and evaluated modules in
+    memory. Jobs are handed over by rewriting a small JSON file the parser
+    reads through the job-file input, which makes watch recompile.
+    """
+
+    def __init__(self, flags, root=None):
+        self.id = next(_ids)
+        self.flags = list(flags)
+        self.root = Path(root) if root else BASE_DIR
+        name = f'{os.getpid()}-{self.id}'
+        self.job_file = WORKERS_DIR / f'{name}.json'
+        self.output = WORKERS_DIR / f'{name}.pdf'
+        self.proc = None
+        self.lines = queue.Queue()
+        self.nonce = 0
+        self.jobs = 0
+        self.starts = 0
+
+    def alive(self):
+        return self.proc is not None and self.proc.poll() is None
+
+    def _start(self):
+        rel = self.job_file.relative_to(BASE_DIR)
+        renderer = self.root / RENDERER_FILE.relative_to(BASE_DIR)
+        cmd = [TYPST_PATH, 'watch', str(renderer), str(self.output), '--root', str(self.root),
+               '--input', f'job-file=/{rel}', *self.flags]
+        self.lines = queue.Queue()
+        self.proc = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                                     stderr=subprocess.PIPE, start_new_session=True)
+        # Registered with the cold compiles so a stopping build can kill it mid-compile
+        with build._running_lock:
+            build._running.add(self.proc)
+        threading.Thread(target=self._pump, args=(self.proc, self.lines), daemon=True).start()
+        self.starts += 1
+
+    @staticmethod
+    def _pump(proc, lines):
+        for raw in iter(proc.stderr.readline, b''):
+            lines.put(raw.decode('utf-8', errors='replace'))
+        lines.put(None)
+
+    def _write_job(self, job):
+        WORKERS_DIR.mkdir(parents=True, exist_ok=True)
+        tmp = self.job_file.with_suffix('.tmp')
+        tmp.write_text(json.dumps(job))
+        os.replace(tmp, self.job_file)
+
+    def _is_current(self, written):
+        """True when the output PDF was produced for the job with the current nonce.
+
+        The parser writes the nonce into the document keywords. Without pypdf,
+        an output modified after the job file was written is accepted instead.
+        """
+        try:
+            import pypdf
+        except ImportError:
+            try:
+                return self.output.stat().st_mtime_ns > written
+            except OSError:
+                return False
+        try:
+            keywords = pypdf.PdfReader(self.output).metadata.get('/Keywords') or ''
+        except Exception:
+            return False
+        return f'noteworthy-job-{self.nonce}' in str(keywords).split(', ')
+
+    def compile(self, target, output, page_offset=None, stats=None):
+        """Compile target into output on this worker. Returns the compiler output."""
+        self.nonce += 1
+        job = {'job': self.nonce, 'page-offset': page_offset}
+        if isinstance(target, (list, tuple)):
+            job['targets'] = list(target)
+        else:
+            job['target'] = target
+        while not self.lines.empty():
+            self.lines.get_nowait()
+        self._write_job(job)
+        written = self.job_file.stat().st_mtime_ns
+        if not self.alive():
+            self._start()
+        if stats is not None:
+            stats['pid'] = self.proc.pid
+        log = []
+        while True:
+            try:
+                line = self.lines.get(timeout=STALL_TIMEOUT)
+            except queue.Empty:
+                self.stop()
+                raise TimeoutError(f'warm worker {self.id} stalled')
+            if line is None:
+                raise TypstBuildError(f'Warm worker {self.id} exited while compiling {target}', ''.join(log))
+            log.append(line)
+            m = _STATUS_RE.search(line)
+            if not m:
+                continue
+            if m.group(1) == 'with errors':
+                raise TypstBuildError(f'Typst compilation failed for {target} (warm worker {self.id})', ''.join(log))
+            # watch also recompiles on its own when sources change; wait until the PDF is this job's
+            if self._is_current(written):
+                break
+        shutil.copyfile(self.output, output)
+        self.jobs += 1
+        return ''.join(log)
+
+    def stop(self):
+        if self.proc is not None:
+            build._kill_group(self.proc)
+            with build._running_lock:
+                build._running.discard(self.proc)
+            self.proc = None
+        for p in (self.job_file, self.output):
+            try:
+                p.unlink()
+            except OSError:
+                pass
+
+
+class WarmPool:
+    """Up to size warm workers sharing one set of typst flags.
+
+    The most recently used idle worker is handed out first so a small
+    build keeps hitting the same hot processes.
+    """
+
+    def __init__(self, size, flags, root=None):
+        self.size = max(1, size)
+        self.flags = list(flags)
+        self.root = root
+        self.workers = []
+        self.idle = queue.LifoQueue()
+        self.lock = threading.Lock()
+        self.cold = 0
+
+    def acquire(self):
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self.lock:
+            if len(self.workers) < self.size:
+                worker = WarmWorker(self.flags, self.root)
+                self.workers.append(worker)
+                return worker
+        return self.idle.get()
+
+    def release(self, worker):
+        self.idle.put(worker)
+
+    def compile(self, target, output, page_offset=None, stats=None):
+        """Compile on a warm worker, falling back to a cold compile if the worker breaks."""
+        worker = self.acquire()
+        try:
+            return worker.compile(target, output, page_offset, stats)
+        except (OSError, TimeoutError) as e:
+            logging.warning(f'Warm worker {worker.id} unavailable ({e}), compiling {target} cold')
+            worker.stop()
+            with self.lock:
+                self.cold += 1
+            return build.compile_target(target, output, page_offset=page_offset, extra_flags=self.flags,
+                                        log_callback=lambda m: None, stats=stats, root=self.root)
+        finally:
+            self.release(worker)
+
+    def reuse_counts(self):
+        """Jobs served per worker id."""
+        return {w.id: w.jobs for w in self.workers}
+
+    def summary(self):
+        counts = self.reuse_counts()
+        starts = sum(w.starts for w in self.workers)
+        jobs = sum(counts.values())
+        per_worker = ', '.join(f'#{wid} x{n}' for wid, n in counts.items())
+        return f"Warm workers served {jobs} jobs with {starts} process starts ({per_worker})"
+
+    def shutdown(self):
+        for w in self.workers:
+            w.stop()
+        self.workers = []
+        self.idle = queue.LifoQueue()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(size, flags, root=None):
+    """Return the process-wide pool for these flags and root, growing it to size if needed."""
+    key = json.dumps([list(flags), str(root or '')])
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = WarmPool(size, flags, root)
+        pool.size = max(pool.size, size)
+        return pool
+
+
+def shutdown_pools():
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.shutdown()
+        _pools.clear()
+
+
+atexit.register(shutdown_pools)
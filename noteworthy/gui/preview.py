@@ -42,8 +42,8 @@ class PreviewManager:
                 return p
         return "typst"
     
-    def start_watch(self, file_path: str):
-        """Start watching a file for changes."""
+    def start_watch(self, file_path: str, draft: bool = False):
+        """Start watching a file for changes. Draft draws canvas figures as placeholders."""
         # Normalize path
         file_path = str(Path(file_path))
         
@@ -116,6 +116,8 @@ class PreviewManager:
         
         if target:
             cmd.extend(["--input", f"target={target}"])
+        if draft:
+            cmd.extend(["--input", "draft=true"])
         
         print(f"[Preview] Running: {' '.join(cmd)}")
         
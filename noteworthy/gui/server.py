@@ -492,7 +492,7 @@ def run_build(data: dict = Body(...)):
     try:
         # Import core build components
         from ..core.build_manager import BuildManager
-        from ..core.build import merge_pdfs, create_pdf_metadata, apply_pdf_metadata, get_pdf_page_count
+        from ..core.build import get_pdf_page_count
         from ..utils import scan_content, load_config_safe
         
         targets = data.get("targets", [])
@@ -502,10 +502,10 @@ def run_build(data: dict = Body(...)):
         hierarchy = json.loads(HIERARCHY_FILE.read_text())
         config = load_config_safe() or {}
         
-        # Prepare build directory
-        if BUILD_DIR.exists():
+        # Prepare build directory, keeping an interrupted build's finished targets when resuming
+        if BUILD_DIR.exists() and not options.get("resume"):
             shutil.rmtree(BUILD_DIR)
-        BUILD_DIR.mkdir()
+        BUILD_DIR.mkdir(exist_ok=True)
         
         # Group targets by chapter
         # targets is list of {chapter: int, page: int} (indices)
@@ -539,7 +539,7 @@ def run_build(data: dict = Body(...)):
                 # but let's try to just pass the relevant chapters).
                 filtered_chapters.append((ci, ch))
 
-        # Scan folders (needed for flags)
+        # Scan folders (passed to typst, TOC included)
         ch_folders, pg_folders = scan_content()
         
         # Build options
@@ -548,7 +548,13 @@ def run_build(data: dict = Body(...)):
             'typst_flags': [],
             'threads': max(1, (os.cpu_count() or 1) // 2),
             'display-cover': options.get("covers", True),   # Map 'covers' to display-cover
-            'display-chap-cover': options.get("covers", True)
+            'display-chap-cover': options.get("covers", True),
+            'page_numbering': 'deferred' if options.get("deferred_numbering") else 'inline',
+            'warm_workers': options.get("warm_workers", False),
+            'resume': options.get("resume", False),
+            'draft': options.get("draft", False),
+            'ch_folders': ch_folders,
+            'pg_folders': pg_folders
         }
 
         # Initialize BuildManager
@@ -560,34 +566,12 @@ def run_build(data: dict = Body(...)):
         
         # Merge
         current_page_count = sum([get_pdf_page_count(p) for p in pdfs]) + 1
-        page_map = bm.page_map
         
-        # Outline
-        if opts['frontmatter'] and config.get('display-outline', True):
-            from ..core.build import compile_target
-            out = BUILD_DIR / '02_outline.pdf'
-            folder_flags = list(opts['typst_flags'])
-            folder_flags.extend(['--input', f'chapter-folders={json.dumps(ch_folders)}'])
-            folder_flags.extend(['--input', f'page-folders={json.dumps(pg_folders)}'])
-            
-            compile_target(
-                'outline', out, 
-                page_offset=page_map.get('outline', 0), 
-                page_map=page_map, 
-                extra_flags=folder_flags
-            )
-            
-        # Final Merge
-        if merge_pdfs(pdfs, OUTPUT_FILE):
-            # Metadata
-            bm_file = BUILD_DIR / 'bookmarks.txt'
-            # We pass filtered_chapters here so bookmarks match what was built
-            bookmarks_list = create_pdf_metadata(filtered_chapters, page_map, bm_file)
-            apply_pdf_metadata(OUTPUT_FILE, bm_file, 
-                             data.get('meta_title', 'Noteworthy'), 
-                             data.get('meta_author', ''), 
-                             bookmarks_list)
-            
+        # Final merge with metadata
+        # We pass filtered_chapters here so bookmarks match what was built
+        if bm.finalize(pdfs, OUTPUT_FILE, filtered_chapters,
+                       data.get('meta_title', 'Noteworthy'),
+                       data.get('meta_author', '')):
             return {"success": True, "output": f"Build complete! ({current_page_count-1} pages)"}
         else:
             return {"success": False, "output": "Merge failed"}
@@ -626,7 +610,7 @@ async def legacy_ws(websocket: WebSocket):
 def start_watch(data: dict = Body(...)):
     """Start watching a file for preview."""
     path = data.get("path")
-    preview_manager.start_watch(path)
+    preview_manager.start_watch(path, draft=data.get("draft", False))
     return {"success": True}
 
 # ============================================================
@@ -1518,7 +1518,11 @@ const app = {
 
         const options = {
             frontmatter: (document.getElementById('build-opt-frontmatter') || document.getElementById('opt-frontmatter'))?.checked ?? true,
-            covers: (document.getElementById('build-opt-covers') || document.getElementById('opt-covers'))?.checked ?? true
+            covers: (document.getElementById('build-opt-covers') || document.getElementById('opt-covers'))?.checked ?? true,
+            deferred_numbering: (document.getElementById('build-opt-deferred') || document.getElementById('opt-deferred'))?.checked ?? false,
+            warm_workers: (document.getElementById('build-opt-warm') || document.getElementById('opt-warm'))?.checked ?? false,
+            resume: (document.getElementById('build-opt-resume') || document.getElementById('opt-resume'))?.checked ?? false,
+            draft: (document.getElementById('build-opt-draft') || document.getElementById('opt-draft'))?.checked ?? false
         };
 
         // Show progress - try Build page IDs first, fall back to modal IDs
@@ -492,7 +492,7 @@ class BuildUI:
 
 def run_build_process(scr, hierarchy, opts):
     """Execute build process with progress UI."""
-    from ...core.build import BuildManager, get_pdf_page_count, compile_target, merge_pdfs, create_pdf_metadata, apply_pdf_metadata, zip_build_directory
+    from ...core.build import BuildManager, get_pdf_page_count, zip_build_directory
     
     if opts['debug']:
         logging.basicConfig(filename='build_debug.log', level=logging.DEBUG, format='%(asctime)s - %(message)s')
@@ -512,10 +512,10 @@ def run_build_process(scr, hierarchy, opts):
         return
     ui.log('Dependencies OK', True)
     
-    if BUILD_DIR.exists():
+    if BUILD_DIR.exists() and not opts.get('resume'):
         shutil.rmtree(BUILD_DIR)
-    BUILD_DIR.mkdir()
-    ui.log('Build directory prepared', True)
+    BUILD_DIR.mkdir(exist_ok=True)
+    ui.log('Resuming previous build' if opts.get('resume') else 'Build directory prepared', True)
     
     pages = opts.get('selected_pages', [])
     by_ch = {}
@@ -525,7 +525,7 @@ def run_build_process(scr, hierarchy, opts):
     ui.log(f'Building {len(pages)} pages from {len(chapters)} chapters', True)
     
     compile_tasks = (3 if opts['frontmatter'] else 0) + sum(1 + len(by_ch[ci]) for ci, _ in chapters)
-    total = compile_tasks + 3
+    total = compile_tasks + 2
     ui.set_phase('Compiling')
     ui.set_progress(0, total)
     
@@ -549,26 +549,9 @@ def run_build_process(scr, hierarchy, opts):
     try:
         pdfs = bm.build_parallel(chapters, config, opts, {'on_progress': on_progress, 'on_log': on_log})
         current_page_count = sum(get_pdf_page_count(p) for p in pdfs) + 1
-        page_map = bm.page_map
-        
-        if opts['frontmatter'] and config.get('display-outline', True):
-            ui.set_task('Regenerating TOC')
-            out = BUILD_DIR / '02_outline.pdf'
-            flags = opts.get('typst_flags', [])
-            ch_folders = opts.get('ch_folders', [])
-            pg_folders = opts.get('pg_folders', {})
-            folder_flags = list(flags)
-            folder_flags.extend(['--input', f'chapter-folders={json.dumps(ch_folders)}'])
-            folder_flags.extend(['--input', f'page-folders={json.dumps(pg_folders)}'])
-            compile_target('outline', out, page_offset=page_map.get('outline', 0), 
-                          page_map=page_map, extra_flags=folder_flags,
-                          callback=ui.refresh, log_callback=ui.log_typst)
-            progress_counter += 1
-            ui.set_progress(progress_counter, total, visual_percent=int(100 * progress_counter / total))
-            ui.log('TOC regenerated', True)
         
         ui.set_phase('Merging PDFs')
-        method = merge_pdfs(pdfs, OUTPUT_FILE)
+        method = bm.finalize(pdfs, OUTPUT_FILE, chapters, 'Noteworthy', 'Noteworthy')
         progress_counter += 1
         ui.set_progress(progress_counter, total, visual_percent=int(100 * progress_counter / total))
         
@@ -579,11 +562,6 @@ def run_build_process(scr, hierarchy, opts):
             return
         
         ui.log(f'Merged with {method}', True)
-        ui.set_phase('Adding Metadata')
-        
-        bm_file = BUILD_DIR / 'bookmarks.txt'
-        bookmarks_list = create_pdf_metadata(chapters, page_map, bm_file)
-        apply_pdf_metadata(OUTPUT_FILE, bm_file, 'Noteworthy', 'Noteworthy', bookmarks_list)
         progress_counter += 1
         ui.set_progress(progress_counter, total, visual_percent=100)
         ui.log('Metadata applied', True)
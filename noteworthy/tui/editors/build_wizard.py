@@ -8,7 +8,8 @@ from pathlib import Path
 from ..base import BaseEditor, TUI, LEFT_PAD, TOP_PAD
 from ...config import BUILD_DIR, OUTPUT_FILE, HIERARCHY_FILE
 from ...utils import load_settings, save_settings, load_config_safe, check_dependencies, scan_content
-from ...core.build import BuildManager, get_pdf_page_count, compile_target, merge_pdfs, create_pdf_metadata, apply_pdf_metadata, zip_build_directory
+from ...core.build import BuildManager, get_pdf_page_count, zip_build_directory
+from ...core.journal import BuildJournal
 from ..components.common import show_success_screen, copy_to_clipboard, show_error_screen, LineEditor
 from ..keybinds import NavigationBind, KeyBind
 from ...assets import LOGO, HAPPY_FACE, HMM_FACE
@@ -43,6 +44,10 @@ class BuildWizard(BaseEditor):
         default_threads = max(1, (os.cpu_count() or 1) // 2)
         self.threads = settings.get('threads', default_threads)
         self.typst_flags = settings.get('typst_flags', [])
+        self.page_numbering = settings.get('page_numbering', 'inline')
+        self.draft = settings.get('draft', False)
+        # Offer to resume when an interrupted build left its journal behind
+        self.resume = BuildJournal.exists(BUILD_DIR)
         saved_pages = set((tuple(p) for p in settings.get('selected_pages', [])))
         
         # Scan content
@@ -80,6 +85,10 @@ class BuildWizard(BaseEditor):
         self.build_scroll = 0
         self.has_warnings = False
         self.visual_percent = None
+        
+        # Plan view (dry run over the current selection)
+        self.plan = None
+        self.plan_scroll = 0
 
         # Keybinds
         register_key = lambda k, f: self.keymap.update({k: f})
@@ -105,13 +114,17 @@ class BuildWizard(BaseEditor):
                 return
 
     def nav_up(self):
-        if self.current_step_idx == 0:
+        if self.current_step_idx == 0 and self.plan:
+             self.plan_scroll = max(0, self.plan_scroll - 1)
+        elif self.current_step_idx == 0:
              self.grid_nav_up()
         elif self.current_step_idx == 1 and self.build_view_mode == 'typst':
              self.build_scroll = max(0, self.build_scroll - 1)
 
     def nav_down(self):
-        if self.current_step_idx == 0:
+        if self.current_step_idx == 0 and self.plan:
+             self.plan_scroll += 1
+        elif self.current_step_idx == 0:
              self.grid_nav_down()
         elif self.current_step_idx == 1 and self.build_view_mode == 'typst':
              self.build_scroll += 1
@@ -135,11 +148,15 @@ class BuildWizard(BaseEditor):
              self.grid_nav_right()
 
     def on_escape(self):
+         if self.plan:
+             self.plan = None
+             return
          return True, 'EXIT'
 
     def on_enter(self):
         if self.current_step_idx == 0: # Configuration
              # Start Build
+             self.plan = None
              self.start_build()
 
     def handle_input(self, k):
@@ -231,6 +248,15 @@ class BuildWizard(BaseEditor):
         elif k == ord('d'): self.debug = not self.debug; return True
         elif k == ord('f'): self.frontmatter = not self.frontmatter; return True
         elif k == ord('p'): self.leave_pdfs = not self.leave_pdfs; return True
+        elif k == ord('o'):
+            self.page_numbering = 'inline' if self.page_numbering == 'deferred' else 'deferred'
+            return True
+        elif k == ord('u'): self.resume = not self.resume; return True
+        elif k == ord('g'): self.draft = not self.draft; return True
+        elif k == ord('l'):
+            self.plan = None if self.plan else self.make_plan()
+            self.plan_scroll = 0
+            return True
         return False
     
     # ... (skipping build logic) ...
@@ -253,10 +279,19 @@ class BuildWizard(BaseEditor):
             'leave_pdfs': self.leave_pdfs,
             'typst_flags': self.typst_flags,
             'selected_pages': selected_pages,
-            'threads': self.threads
+            'threads': self.threads,
+            'page_numbering': self.page_numbering,
+            'draft': self.draft
         })
         
-        self.build_opts = {
+        self.build_opts = self.collect_opts(selected_pages)
+        
+        self.current_step_idx = 1 # Move to Building
+        self.build_started = True
+        self.run_build_process()
+
+    def collect_opts(self, selected_pages):
+        return {
             'selected_pages': selected_pages,
             'debug': self.debug,
             'frontmatter': self.frontmatter,
@@ -264,12 +299,24 @@ class BuildWizard(BaseEditor):
             'typst_flags': self.typst_flags,
             'threads': self.threads,
             'ch_folders': self.ch_folders,
-            'pg_folders': self.pg_folders
+            'pg_folders': self.pg_folders,
+            'page_numbering': self.page_numbering,
+            'resume': self.resume,
+            'draft': self.draft
         }
-        
-        self.current_step_idx = 1 # Move to Building
-        self.build_started = True
-        self.run_build_process()
+
+    def make_plan(self):
+        """Dry-run the current selection: cached/stale/new targets, passes and estimated time."""
+        selected_pages = [(ci, pi) for (ci, pi), v in self.selected.items() if v]
+        by_ch = {}
+        for ci, ai in selected_pages:
+             by_ch.setdefault(ci, []).append(ai)
+        chapters = [(i, self.hierarchy[i]) for i in sorted(by_ch.keys())]
+        try:
+             return BuildManager(BUILD_DIR).plan(chapters, load_config_safe(), self.collect_opts(selected_pages))
+        except Exception as e:
+             self.log(f"Plan failed: {e}", False)
+             return None
 
     def handle_build_input(self, k):
         if k == ord('v'):
@@ -314,9 +361,9 @@ class BuildWizard(BaseEditor):
              self.log('Missing dependencies!', False)
              return
 
-        if BUILD_DIR.exists(): shutil.rmtree(BUILD_DIR)
-        BUILD_DIR.mkdir()
-        self.log('Build directory prepared', True)
+        if BUILD_DIR.exists() and not self.build_opts.get('resume'): shutil.rmtree(BUILD_DIR)
+        BUILD_DIR.mkdir(exist_ok=True)
+        self.log('Resuming previous build' if self.build_opts.get('resume') else 'Build directory prepared', True)
         
         pages = self.build_opts.get('selected_pages', [])
         by_ch = {}
@@ -325,7 +372,7 @@ class BuildWizard(BaseEditor):
         chapters = [(i, self.hierarchy[i]) for i in sorted(by_ch.keys())]
         
         compile_tasks = (3 if self.build_opts['frontmatter'] else 0) + sum(1 + len(by_ch[ci]) for ci, _ in chapters)
-        total = compile_tasks + 3
+        total = compile_tasks + 2
         self.phase = 'Compiling'
         self.set_progress(0, total)
         
@@ -353,23 +400,9 @@ class BuildWizard(BaseEditor):
         try:
              pdfs = bm.build_parallel(chapters, config, self.build_opts, {'on_progress': on_progress, 'on_log': on_log})
              current_page_count = sum(get_pdf_page_count(p) for p in pdfs) + 1
-             page_map = bm.page_map
-             
-             if self.build_opts['frontmatter'] and config.get('display-outline', True):
-                 self.task = 'Regenerating TOC'
-                 out = BUILD_DIR / '02_outline.pdf'
-                 flags = self.build_opts.get('typst_flags', [])
-                 folder_flags = list(flags)
-                 folder_flags.extend(['--input', f'chapter-folders={json.dumps(self.build_opts["ch_folders"])}'])
-                 folder_flags.extend(['--input', f'page-folders={json.dumps(self.build_opts["pg_folders"])}'])
-                 compile_target('outline', out, page_offset=page_map.get('outline', 0),
-                               page_map=page_map, extra_flags=folder_flags,
-                               callback=self.refresh, log_callback=self.log_typst)
-                 progress_counter += 1
-                 self.set_progress(progress_counter, total, 100 * progress_counter // total)
              
              self.phase = 'Merging PDFs'
-             method = merge_pdfs(pdfs, OUTPUT_FILE)
+             method = bm.finalize(pdfs, OUTPUT_FILE, chapters, 'Noteworthy', 'Noteworthy')
              progress_counter += 1
              self.set_progress(progress_counter, total, 100 * progress_counter // total)
              
@@ -377,10 +410,6 @@ class BuildWizard(BaseEditor):
                  self.log('Merge failed!', False)
                  return
 
-             self.phase = 'Adding Metadata'
-             bm_file = BUILD_DIR / 'bookmarks.txt'
-             bookmarks_list = create_pdf_metadata(chapters, page_map, bm_file)
-             apply_pdf_metadata(OUTPUT_FILE, bm_file, 'Noteworthy', 'Noteworthy', bookmarks_list)
              progress_counter += 1
              self.set_progress(progress_counter, total, 100)
              
@@ -447,6 +476,10 @@ class BuildWizard(BaseEditor):
                 TUI.safe_addstr(self.scr, y, x, self.mismatch_error, curses.color_pair(6))
                 return
 
+            if self.plan:
+                self._draw_plan(h, w, y, x, content_w)
+                return
+
             TUI.safe_addstr(self.scr, y, x, "Run Config", curses.color_pair(1)|curses.A_BOLD)
             
             # Options with improved margin (dfpt)
@@ -456,6 +489,9 @@ class BuildWizard(BaseEditor):
                 (f"Frontmatter: {'ON' if self.frontmatter else 'OFF'}", 'f', self.frontmatter),
                 (f"Keep PDFs: {'ON' if self.leave_pdfs else 'OFF'}", 'p', self.leave_pdfs),
                 (f"Threads: {self.threads}", 't', None),
+                (f"Numbering: {self.page_numbering.title()}", 'o', self.page_numbering == 'deferred'),
+                (f"Resume: {'ON' if self.resume else 'OFF'}", 'u', self.resume),
+                (f"Figures: {'Draft' if self.draft else 'Full'}", 'g', self.draft),
             ]
             opt_x = x
             for label, key, val in opts:
@@ -552,7 +588,7 @@ class BuildWizard(BaseEditor):
                     pg_x += 4
                     
             # Footer
-            footer_text = "Space:Toggle  c:Col  r:Row  a:All  Enter:Build"
+            footer_text = "Space:Toggle  c:Col  r:Row  a:All  l:Plan  Enter:Build"
             TUI.safe_addstr(self.scr, h-2, x, footer_text, curses.color_pair(4)|curses.A_DIM)
 
         elif self.current_step_idx == 1:
@@ -616,3 +652,29 @@ class BuildWizard(BaseEditor):
                 
             TUI.safe_addstr(self.scr, h-2, x, "Press Enter to Exit", curses.color_pair(4)|curses.A_DIM)
 
+    def _draw_plan(self, h, w, y, x, content_w):
+        plan = self.plan
+        c = plan['counts']
+        TUI.safe_addstr(self.scr, y, x, "Build Plan", curses.color_pair(1)|curses.A_BOLD)
+        y += 2
+        TUI.safe_addstr(self.scr, y, x, f"{c['cached']} cached   {c['stale']} stale   {c['new']} new", curses.color_pair(4))
+        y += 1
+        passes = f"Passes: {plan['passes']}"
+        if plan['passes'] > 1:
+            passes += f" (second recompiles {plan['repaginated']})"
+        TUI.safe_addstr(self.scr, y, x, passes, curses.color_pair(4))
+        y += 1
+        TUI.safe_addstr(self.scr, y, x, f"Estimated: {plan['estimated_seconds']:.1f}s on {plan['threads']} threads "
+                        f"(one full pass {plan['full_pass_seconds']:.1f}s)", curses.color_pair(3)|curses.A_BOLD)
+        y += 2
+        
+        styles = {'cached': curses.color_pair(2), 'stale': curses.color_pair(3), 'new': curses.color_pair(8)}
+        rows = plan['targets']
+        list_h = h - y - 3
+        self.plan_scroll = max(0, min(self.plan_scroll, len(rows) - list_h))
+        for i, t in enumerate(rows[self.plan_scroll:self.plan_scroll + list_h]):
+            TUI.safe_addstr(self.scr, y + i, x, f"{t['status']:<7}", styles[t['status']])
+            line = f"{t['label']}  ~{t['estimate']:.1f}s"
+            TUI.safe_addstr(self.scr, y + i, x + 9, line[:content_w - 13], curses.color_pair(4))
+        
+        TUI.safe_addstr(self.scr, h-2, x, "Up/Down:Scroll  l/Esc:Back  Enter:Build", curses.color_pair(4)|curses.A_DIM)
@@ -11,12 +11,11 @@ from pathlib import Path
 # Fix import path to allow importing from noteworthy package
 sys.path.append(str(Path(__file__).parent))
 
-from noteworthy.config import BASE_DIR, BUILD_DIR, OUTPUT_FILE, METADATA_FILE, HIERARCHY_FILE, PREFACE_FILE
-from noteworthy.utils import load_settings, save_settings, load_config_safe, check_dependencies, scan_content
-from noteworthy.core.build import (
-    BuildManager, compile_target, merge_pdfs, create_pdf_metadata, 
-    apply_pdf_metadata, zip_build_directory, get_pdf_page_count
-)
+from noteworthy.config import BASE_DIR, BUILD_DIR, OUTPUT_FILE, HIERARCHY_FILE
+from noteworthy.utils import load_settings, load_config_safe, check_dependencies, scan_content
+from noteworthy.core.build import BuildManager, zip_build_directory, get_pdf_page_count
+from noteworthy.core.build_manager import build_matrix
+from noteworthy.core.variants import parse_variants, load_variants
 
 def setup_logging(debug=False):
     level = logging.DEBUG if debug else logging.INFO
@@ -28,7 +27,12 @@ class CliTarget:
         self.pages = pages or []        # List of (ch_idx, pg_idx) tuples
 
 
-def run_build(args):
+def run_build(args, session=None):
+    """Build the book from CLI args.
+
+    session, a dict kept by watch_build, holds the BuildManager across
+    rebuilds together with the paths changed since the last one.
+    """
     # Load settings and config
     settings = load_settings()
     config = load_config_safe()
@@ -68,20 +72,6 @@ def run_build(args):
         print("No pages selected for build.")
         return
 
-    print("Checking dependencies...")
-    try:
-        check_dependencies()
-    except SystemExit:
-        print("Missing dependencies! Please ensure typst, pdfinfo, and pdfunite/ghostscript/pdftk are installed.")
-        return
-
-    # Prepare build dir
-    if BUILD_DIR.exists():
-        shutil.rmtree(BUILD_DIR)
-    BUILD_DIR.mkdir()
-
-    print(f"Building {len(selected_pages)} pages from {len(target_chapters)} chapters...")
-    
     # Construct opts dictionary relative to TUI expectations
     opts = {
         'debug': debug,
@@ -89,22 +79,86 @@ def run_build(args):
         'leave_individual': args.leave_pdfs,
         'typst_flags': args.flags if args.flags else settings.get('typst_flags', []),
         'threads': args.threads or settings.get('threads', max(1, (os.cpu_count() or 1) // 2)),
-        'selected_pages': selected_pages
+        'selected_pages': selected_pages,
+        'cache': not args.no_cache,
+        'page_numbering': 'deferred' if args.deferred_numbering else settings.get('page_numbering', 'inline'),
+        'profile': args.profile,
+        'granularity': args.granularity or settings.get('granularity', 'auto'),
+        'warm_workers': args.warm or settings.get('warm_workers', False),
+        'memory_budget': args.memory_budget or settings.get('memory_budget'),
+        'dedupe': False if args.no_dedupe else settings.get('dedupe', True),
+        'resubset_fonts': args.resubset_fonts or settings.get('resubset_fonts', False),
+        'original_images': args.original_images or settings.get('original_images', False),
+        'image_dpi': args.image_dpi or settings.get('image_dpi'),
+        'on_error': 'keep-going' if args.keep_going else settings.get('on_error', 'fail-fast'),
+        'split': args.split,
+        'resume': args.resume,
+        'draft': args.draft or settings.get('draft', False)
     }
     
     ch_folders, pg_folders = scan_content()
     opts['ch_folders'] = ch_folders
     opts['pg_folders'] = pg_folders
 
+    by_ch = {}
+    for ci, ai in selected_pages:
+        by_ch.setdefault(ci, []).append(ai)
+    chapters = [(i, hierarchy[i]) for i in sorted(by_ch.keys())]
+    
+    try:
+        variants = load_variants(args.matrix) if args.matrix else {}
+        variants.update(parse_variants(args.variant or []))
+    except (OSError, ValueError) as e:
+        print(f"Invalid variants: {e}")
+        return False
+    
+    if args.plan:
+        if variants:
+            plan = {name: BuildManager(BUILD_DIR, variant=name).plan(
+                chapters, dict(config, **overrides), dict(opts, config_overrides=overrides)
+            ) for name, overrides in variants.items()}
+        else:
+            plan = BuildManager(BUILD_DIR).plan(chapters, config, opts)
+        if args.json:
+            print(json.dumps(plan, indent=2))
+        elif variants:
+            for name, p in plan.items():
+                print(f"Variant {name}:")
+                print_plan(p)
+                print()
+        else:
+            print_plan(plan)
+        return plan
+    
+    # A watch session checked dependencies and prepared the build dir on its first build
+    live = session is not None and 'bm' in session
+    if not live:
+        print("Checking dependencies...")
+        try:
+            check_dependencies()
+        except SystemExit:
+            print("Missing dependencies! Please ensure typst, pdfinfo, and pdfunite/ghostscript/pdftk are installed.")
+            return
+
+        # Prepare build dir, keeping the finished targets of an interrupted build when resuming
+        if BUILD_DIR.exists() and not opts['resume']:
+            shutil.rmtree(BUILD_DIR)
+    BUILD_DIR.mkdir(exist_ok=True)
+
+    print(f"Building {len(selected_pages)} pages from {len(target_chapters)} chapters...")
+    
+    if variants:
+        return run_variants(chapters, config, opts, variants, debug)
+    
     # Main Build Process
     try:
-        # Calculate tasks to enable progress tracking (simple version)
-        by_ch = {}
-        for ci, ai in selected_pages:
-            by_ch.setdefault(ci, []).append(ai)
-        chapters = [(i, hierarchy[i]) for i in sorted(by_ch.keys())]
-        
-        bm = BuildManager(BUILD_DIR)
+        if live:
+            bm = session['bm']
+            opts['changed'] = session.get('changed')
+        else:
+            bm = BuildManager(BUILD_DIR)
+            if session is not None:
+                session['bm'] = bm
         
         # We need a simple progress callback
         total_tasks = 0 # Will be updated
@@ -129,60 +183,152 @@ def run_build(args):
         
         compile_time = time.time() - start_time
         print(f"\nCompilation finished in {compile_time:.1f}s")
+        if bm.pool:
+            print(bm.pool.summary())
+        if bm.governor:
+            print(bm.governor.summary())
         
         current_page_count = sum([get_pdf_page_count(p) for p in pdfs]) + 1
-        page_map = bm.page_map
-        
-        # Outline / TOC
-        if opts['frontmatter'] and config.get('display-outline', True):
-            print("Regenerating TOC...")
-            out = BUILD_DIR / '02_outline.pdf'
-            
-            folder_flags = list(opts['typst_flags'])
-            folder_flags.extend(['--input', f'chapter-folders={json.dumps(ch_folders)}'])
-            folder_flags.extend(['--input', f'page-folders={json.dumps(pg_folders)}'])
-            
-            compile_target(
-                'outline', 
-                out, 
-                page_offset=page_map.get('outline', 0), 
-                page_map=page_map, 
-                extra_flags=folder_flags, 
-                log_callback=lambda m: None 
-            )
-        
         print(f"Total pages: {current_page_count - 1}")
-        print("Merging PDFs...")
-        
-        method = merge_pdfs(pdfs, OUTPUT_FILE)
+        method = assemble(bm, pdfs, OUTPUT_FILE, chapters, opts)
         
         if not method or not OUTPUT_FILE.exists():
             print("Merge failed!")
-            return
-            
-        print("Applying Metadata...")
-        bm_file = BUILD_DIR / 'bookmarks.txt'
-        bookmarks_list = create_pdf_metadata(chapters, page_map, bm_file)
-        apply_pdf_metadata(OUTPUT_FILE, bm_file, 'Noteworthy Framework', 'Sihoo Lee, Lee Hojun', bookmarks_list)
+            return False
+        
+        profile = bm.write_profile(OUTPUT_FILE)
+        if profile:
+            print(f"Profile: {profile[0]}")
+            print(f"Timeline: {profile[1]} (open in ui.perfetto.dev or chrome://tracing)")
         
         if opts['leave_individual']:
             zip_build_directory(BUILD_DIR)
             print(f"Individual PDFs archived in {BUILD_DIR}")
             
-        if OUTPUT_FILE.exists() and BUILD_DIR.exists() and not opts['leave_individual']:
+        # A watch session keeps the targets in place for the next rebuild
+        if OUTPUT_FILE.exists() and BUILD_DIR.exists() and not opts['leave_individual'] and session is None:
             shutil.rmtree(BUILD_DIR)
             
         print(f"\nBuild Complete! Output: {OUTPUT_FILE}")
         
     except KeyboardInterrupt:
-        print("\nBuild cancelled.")
-        if BUILD_DIR.exists():
-             shutil.rmtree(BUILD_DIR)
+        print("\nBuild cancelled. Finished targets are kept; run again with --resume to continue.")
+        return False
+    except Exception as e:
+        print(f"\nBuild failed: {e}")
+        if debug:
+            import traceback
+            traceback.print_exc()
+        return False
+
+def assemble(bm, pdfs, output, chapters, opts):
+    """Merge the built targets into output, plus per-chapter or per-section PDFs when asked."""
+    print("Merging PDFs and applying metadata...")
+    title, author = 'Noteworthy Framework', 'Sihoo Lee, Lee Hojun'
+    method = bm.finalize(pdfs, output, chapters, title, author)
+    if method and opts.get('split'):
+        by = opts['split']
+        print(f"Writing {by} PDFs...")
+        bundles = bm.export_bundles(output.with_name(f'{output.stem}-{by}s'), chapters, title, author, by, workers=opts['threads'])
+        if bundles:
+            print(f"{len(bundles)} {by} PDFs in {bundles[0].parent}")
+    return method
+
+def run_variants(chapters, config, opts, variants, debug):
+    """Build every variant in one scheduled build and write OUTPUT-<name>.pdf for each."""
+    def on_log(msg, ok=True):
+        if not ok:
+            print(msg)
+    
+    print(f"Compiling {len(variants)} variants: {', '.join(variants)}...")
+    start_time = time.time()
+    try:
+        results = build_matrix(BUILD_DIR, chapters, config, opts, variants, {'on_log': on_log, 'on_progress': lambda: True})
+        print(f"\nCompilation finished in {time.time() - start_time:.1f}s")
+        outputs = []
+        for name, (bm, pdfs) in results.items():
+            output = OUTPUT_FILE.with_name(f'{OUTPUT_FILE.stem}-{name}{OUTPUT_FILE.suffix}')
+            print(f"\n[{name}]")
+            method = assemble(bm, pdfs, output, chapters, opts)
+            if not method or not output.exists():
+                print(f"Merge failed for variant {name}!")
+                return False
+            outputs.append(output)
+    except KeyboardInterrupt:
+        print("\nBuild cancelled. Finished targets are kept; run again with --resume to continue.")
+        return False
     except Exception as e:
         print(f"\nBuild failed: {e}")
         if debug:
             import traceback
             traceback.print_exc()
+        return False
+    
+    if BUILD_DIR.exists() and not opts['leave_individual']:
+        shutil.rmtree(BUILD_DIR)
+    print("\nBuild Complete! Outputs:")
+    for output in outputs:
+        print(f"  {output}")
+    return outputs
+
+def print_plan(plan):
+    """Print a build plan as a table followed by totals."""
+    width = max((len(t['label']) for t in plan['targets']), default=10)
+    for t in plan['targets']:
+        pages = t['pages'] if t['pages'] is not None else '?'
+        print(f"  {t['status']:<7} {t['label']:<{width}}  p.{t['offset']:<5} {pages:>3} pages  ~{t['estimate']:.1f}s")
+    c = plan['counts']
+    print(f"\n{len(plan['targets'])} targets: {c['cached']} cached, {c['stale']} stale, {c['new']} new")
+    repag = f", second pass recompiles {plan['repaginated']} targets" if plan['passes'] > 1 else ""
+    print(f"Expected passes: {plan['passes']}{repag}")
+    print(f"Estimated wall time: {plan['estimated_seconds']:.1f}s on {plan['threads']} threads "
+          f"(one full pass {plan['full_pass_seconds']:.1f}s, granularity {plan['granularity']})")
+
+def watch_build(args, session):
+    """Rebuild after every change to content/, config/ or templates/ until interrupted.
+
+    The BuildManager of the first build stays alive for the session, with
+    its dependency index, warm workers and targets in BUILD_DIR. A save
+    recompiles only the targets the index reports as affected (everything
+    when a template or config file changed) before re-merging.
+    """
+    from noteworthy.config import SYSTEM_CONFIG_DIR
+    from noteworthy.core.watcher import TreeWatcher
+    from noteworthy.core.depgraph import ALL
+    
+    roots = [BASE_DIR / 'content', BASE_DIR / 'config', BASE_DIR / 'templates']
+    watcher = TreeWatcher(roots, excludes=[BUILD_DIR, SYSTEM_CONFIG_DIR])
+    print(f"\nWatching content/, config/ and templates/ ({watcher.backend}). Press Ctrl+C to stop.")
+    try:
+        while True:
+            changed = watcher.wait()
+            names = sorted(str(p.relative_to(BASE_DIR)) for p in changed)
+            more = f" (+{len(names) - 3} more)" if len(names) > 3 else ""
+            print(f"\nChanged: {', '.join(names[:3])}{more}")
+            bm = session.get('bm')
+            if bm:
+                bm.index.update()
+                affected = bm.index.affected(changed)
+            else:
+                affected = ALL  # The first build failed before it started: build from scratch
+            if affected == ALL:
+                print("Affects every target")
+            elif affected:
+                print(f"Affects {len(affected)} targets: {', '.join(sorted(affected)[:5])}")
+            elif all(p.is_file() and p.suffix not in ('.typ', '.json') for p in changed):
+                # An asset no target references: nothing to recompile or re-merge
+                print("Not referenced by any target. Watching...")
+                continue
+            session['changed'] = changed
+            start = time.time()
+            run_build(args, session)
+            print(f"Rebuilt in {time.time() - start:.1f}s. Watching...")
+    except KeyboardInterrupt:
+        print("\nStopped watching.")
+    finally:
+        watcher.close()
+        if BUILD_DIR.exists() and not args.leave_pdfs:
+            shutil.rmtree(BUILD_DIR, ignore_errors=True)
 
 def main():
     parser = argparse.ArgumentParser(description='Noteworthy CLI Builder')
@@ -192,8 +338,27 @@ def main():
     parser.add_argument('--no-frontmatter', action='store_true', help='Skip frontmatter (cover, preface, TOC)')
     parser.add_argument('--leave-pdfs', action='store_true', help='Keep individual PDFs in build folder')
     parser.add_argument('--debug', action='store_true', help='Enable debug logging')
+    parser.add_argument('--no-cache', action='store_true', help='Recompile every target instead of reusing cached PDFs')
+    parser.add_argument('--granularity', choices=['auto', 'section', 'chapter', 'book'], help='Typst processes per build: one per section, per chapter, one for the book, or auto (default)')
+    parser.add_argument('--memory-budget', metavar='SIZE', help='Cap on memory reserved by parallel compiles, e.g. 4G, 800M or 50%% (default: 75%% of RAM)')
+    parser.add_argument('-w', '--watch', action='store_true', help='Keep running and rebuild changed targets whenever content, config or templates change')
+    parser.add_argument('--no-dedupe', action='store_true', help='Keep every per-target copy of fonts, images and ICC profiles when merging')
+    parser.add_argument('--resubset-fonts', action='store_true', help='Re-subset fonts across the merged book with ghostscript (slower, smaller)')
+    parser.add_argument('--original-images', action='store_true', help='Embed full-resolution images (for print) instead of downscaled variants')
+    parser.add_argument('--image-dpi', type=int, help='Resolution of downscaled image variants (default: 200)')
+    parser.add_argument('--warm', action='store_true', help='Compile on long-lived typst watch workers instead of a fresh process per target')
+    parser.add_argument('--plan', action='store_true', help='Show which targets are cached, stale or new and the estimated build time, without building')
+    parser.add_argument('--json', action='store_true', help='With --plan, print the plan as JSON')
+    parser.add_argument('--profile', action='store_true', help='Write a per-target profile and Chrome trace timeline next to the output')
+    parser.add_argument('--deferred-numbering', action='store_true', help='Compile sections without page numbers and stamp them at merge time')
+    parser.add_argument('--draft', action='store_true', help='Draw canvas figures as placeholder boxes of the same size for faster iteration')
+    parser.add_argument('--split', choices=['chapter', 'section'], help='Also write one PDF per chapter or per section, sliced from the full build')
+    parser.add_argument('--variant', action='append', nargs='+', metavar='NAME KEY=VALUE', help='Build a variant with config overrides instead of the base book, e.g. --variant teacher show-solution=true (repeatable; a variant with no overrides builds the base edition alongside)')
+    parser.add_argument('--matrix', metavar='FILE', help='JSON file of variant name -> config overrides to build together')
     
     parser.add_argument('-t', '--threads', type=int, help='Number of threads to use')
+    parser.add_argument('--resume', action='store_true', help='Continue an interrupted build, skipping the targets it already finished')
+    parser.add_argument('-k', '--keep-going', action='store_true', help='Compile every target even after one fails and report all failures (default: stop at the first)')
     parser.add_argument('--flags', nargs='+', help='Additional Typst CLI flags')
     
     # Update flags
@@ -241,7 +406,12 @@ def main():
             print(f"Update initiation failed: {e}")
             sys.exit(1)
     
-    run_build(args)
+    session = {} if args.watch and not args.plan else None
+    result = run_build(args, session)
+    if session is not None:
+        watch_build(args, session)
+    elif result is False:
+        sys.exit(1)
 
 if __name__ == '__main__':
     main()
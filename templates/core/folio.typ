@@ -0,0 +1,24 @@
+// =====================================================
+// FOLIO SHEET - Page numbers stamped at merge time
+// =====================================================
+// Used when sections are compiled with page-numbering=deferred.
+// Renders one transparent page per entry of the "folios" input,
+// carrying only the page number in the footer position and style
+// of project pages. The merge step overlays these onto the book.
+
+#import "setup.typ": *
+
+#let folios = json(bytes(sys.inputs.at("folios", default: "[]")))
+
+#set page(
+  paper: "a4",
+  margin: (x: 1in, y: 1in),
+  numbering: "1",
+  fill: none,
+)
+#set text(font: font, size: 11pt, fill: active-theme.text-main)
+
+#for (i, n) in folios.enumerate() {
+  if i > 0 { pagebreak() }
+  counter(page).update(n)
+}
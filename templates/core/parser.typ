@@ -1,8 +1,24 @@
 #import "../templater.typ": *
 #import "scanner.typ": load-content-info
 
-#let target = sys.inputs.at("target", default: none)
-#let page-offset = sys.inputs.at("page-offset", default: none)
+// Warm workers (typst watch) take their target from a job file rewritten per compile
+#let job-file = sys.inputs.at("job-file", default: none)
+#let job = if job-file != none { json(job-file) } else { (:) }
+// Tags the output with its job number so a worker never mistakes another recompile's PDF for its job
+#set document(keywords: ("noteworthy-job-" + str(job.job),)) if "job" in job
+
+#let target = job.at("target", default: sys.inputs.at("target", default: none))
+#let page-offset = job.at("page-offset", default: sys.inputs.at("page-offset", default: none))
+// Several targets compiled in one invocation, split afterwards at their markers
+#let bundle = sys.inputs.at("targets", default: none)
+#let bundle = if "targets" in job { job.targets } else if bundle != none { json(bytes(bundle)) } else { none }
+#let whole-book = target == none and bundle == none
+#let wanted(t) = target == t or (bundle != none and t in bundle)
+
+// Invisible bookmark marking where a bundled target starts
+#let target-marker(t) = if bundle != none {
+  place(hide(heading(level: 1, numbering: none, outlined: false, bookmarked: true, "noteworthy-target:" + t)))
+}
 #set heading(numbering: heading-numbering)
 
 // Set page counter based on page offset
@@ -11,8 +27,8 @@
   counter(page).update(offset-value)
 }
 
-#if target == none or target == "cover" {
-  if display-cover or target == "cover" {
+#if whole-book or wanted("cover") {
+  if display-cover or not whole-book {
     cover(
       title: title,
       subtitle: subtitle,
@@ -22,12 +38,12 @@
   }
 }
 
-#if target == none or target == "preface" {
+#if whole-book or wanted("preface") {
   preface()
 }
 
-#if target == none or target == "outline" {
-  if display-outline or target == "outline" {
+#if whole-book or wanted("outline") {
+  if display-outline or not whole-book {
     outline()
   }
 }
@@ -48,12 +64,13 @@
   // Get page files for this chapter
   let pg-files = page-folders.at(str(i), default: range(total-pages).map(j => str(j)))
 
-  if target == none or target == "chapter-" + str(i) {
-    if display-chap-cover or target != none {
+  if whole-book or wanted("chapter-" + str(i)) {
+    if display-chap-cover or not whole-book {
       chapter-cover(
         number: chapter-name + " " + chapter-display-id,
         title: chapter.title,
         summary: chapter.summary,
+        marker: target-marker("chapter-" + str(i)),
       )
     }
   }
@@ -64,15 +81,16 @@
     let page-target = str(i) + "/" + str(j)
     let page-display-id = format-page-id(ch-folder + "." + pg-file, total-pages, total-chapters)
 
-    if target == none or target == page-target {
-      // Inject chapter metadata if missing (for single page compilation)
-      if target != none and target != "chapter-" + str(i) {
+    if whole-book or wanted(page-target) {
+      // Inject chapter metadata if missing (for single page or bundle compilation)
+      if not whole-book and not wanted("chapter-" + str(i)) {
         [#std.metadata((chapter-name + " " + chapter-display-id, chapter.title)) #label("chapter-" + str(i + 1))]
       }
       show: project.with(
         number: chapter-name + " " + page-display-id,
         title: page.title,
       )
+      target-marker(page-target)
       include "../../content/" + ch-folder + "/" + pg-file + ".typ"
     }
   }
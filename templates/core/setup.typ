@@ -3,8 +3,10 @@
 // =====================
 
 // Load configuration from split JSON files
-#let metadata = json("../../config/metadata.json")
-#let constants = json("../../config/constants.json")
+// Per-variant config values passed by the build (key: value), taking precedence over the files
+#let config-overrides = json(bytes(sys.inputs.at("config-overrides", default: "{}")))
+#let metadata = json("../../config/metadata.json") + config-overrides
+#let constants = json("../../config/constants.json") + config-overrides
 
 // Export metadata variables
 #let title = metadata.title
@@ -33,6 +35,12 @@
 #let block-design = constants.at("block-design", default: "simple")
 #let hierarchy = json("../../config/hierarchy.json")
 
+// Page numbers stamped by the Python merge step instead of typst
+#let deferred-numbering = sys.inputs.at("page-numbering", default: none) == "deferred"
+
+// Canvas figures drawn as placeholder boxes of the same size, for quick drafts
+#let draft-mode = sys.inputs.at("draft", default: none) == "true"
+
 // Load schemes
 #import "./scheme.typ": *
 
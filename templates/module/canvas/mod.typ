@@ -3,7 +3,7 @@
 // =====================================================
 // Re-exports all canvas types with theme binding.
 
-#import "../../core/setup.typ": active-theme
+#import "../../core/setup.typ": active-theme, draft-mode
 
 // Drawing utilities (no theme binding needed)
 #import "draw.typ": draw-geo
@@ -29,26 +29,137 @@
 // THEMED CANVAS WRAPPERS
 // =====================================================
 
-// Canvas types (theme-bound and centered)
+// Size in cm a canvas is drawn at, mirroring how the implementations read size/width/height
+#let canvas-size(args, size: (10, 10), x-domain: (-5, 5), y-domain: (-5, 5), square: false) = {
+  let named = args.named()
+  let to-cm(val) = if type(val) == length { val / 1cm } else { val }
+  let (x0, x1) = named.at("x-domain", default: x-domain)
+  let (y0, y1) = named.at("y-domain", default: y-domain)
+  let aspect = if square { 1 } else { (y1 - y0) / (x1 - x0) }
+  let width = named.at("width", default: none)
+  let height = named.at("height", default: none)
+  if width != none and height != none {
+    (to-cm(width), to-cm(height))
+  } else if width != none {
+    (to-cm(width), to-cm(width) * aspect)
+  } else if height != none {
+    (to-cm(height) / aspect, to-cm(height))
+  } else {
+    named.at("size", default: size).map(to-cm)
+  }
+}
+
+// Size in cm of a space canvas: its grid and axes rotated by the view and projected the way
+// cetz draws 3D points (z sheared by half a unit into x and y)
+#let space-size(args) = {
+  let named = args.named()
+  let (x0, x1) = named.at("x-domain", default: (0, 5))
+  let (y0, y1) = named.at("y-domain", default: (0, 5))
+  let (z0, z1) = named.at("z-domain", default: (0, 4))
+  let view = named.at("view", default: (x: -90deg, y: -120deg, z: 0deg))
+  let (a, b, c) = ("x", "y", "z").map(k => view.at(k, default: 0deg))
+  let points = ((x0, y0, 0), (x1, y0, 0), (x0, y1, 0), (x1, y1, 0))
+  if named.at("show-axes", default: true) {
+    points += ((0, 0, 0), (x1 + 1.2, 0, 0), (0, y1 + 1.2, 0), (0, 0, z1 + 1.2))
+  }
+  let project(point) = {
+    let (x, y, z) = point
+    let (sa, ca, sb, cb, sc, cc) = (calc.sin(a), calc.cos(a), calc.sin(b), calc.cos(b), calc.sin(c), calc.cos(c))
+    let px = cb * cc * x + (sa * sb * cc - ca * sc) * y + (ca * sb * cc + sa * sc) * z
+    let py = cb * sc * x + (sa * sb * sc + ca * cc) * y + (ca * sb * sc - sa * cc) * z
+    let pz = -sb * x + sa * cb * y + ca * cb * z
+    (px + pz / 2, py - pz / 2)
+  }
+  let projected = points.map(project)
+  let xs = projected.map(p => p.at(0))
+  let ys = projected.map(p => p.at(1))
+  (calc.max(..xs) - calc.min(..xs), calc.max(..ys) - calc.min(..ys))
+}
+
+// Size in cm of a blank canvas, which fits what it draws: the box around its shapes' points (circles
+// by their radius, vectors from origin to tip) plus a margin for labels. Combi, tree and dsa objects
+// and raw cetz bodies carry no coordinates, so `fallback` stands in for them; draft-size overrides both.
+#let blank-size(args, draft-size: none, fallback: (8, 5)) = {
+  if draft-size != none { return draft-size.map(v => if type(v) == length { v / 1cm } else { v }) }
+  let number(v) = type(v) == int or type(v) == float
+  let extent(obj) = {
+    if type(obj) == array { return obj.map(extent).fold((), (a, b) => a + b) }
+    if type(obj) != dictionary { return () }
+    let kind = obj.at("type", default: none)
+    if kind == "point" and number(obj.x) and number(obj.y) { return ((obj.x, obj.y),) }
+    if kind == "circle" and number(obj.radius) {
+      return extent(obj.center).map(((x, y)) => ((x - obj.radius, y - obj.radius), (x + obj.radius, y + obj.radius))).fold((), (a, b) => a + b)
+    }
+    if kind == "vector" and number(obj.x) and number(obj.y) {
+      let origin = obj.at("origin", default: (0, 0))
+      let (sx, sy) = if type(origin) == dictionary { (origin.x, origin.y) } else { origin }
+      return ((sx, sy), (sx + obj.x, sy + obj.y))
+    }
+    obj.values().map(extent).fold((), (a, b) => a + b)
+  }
+  let points = extent(args.pos())
+  if points == () { return fallback }
+  let xs = points.map(p => p.at(0))
+  let ys = points.map(p => p.at(1))
+  (calc.max(..xs) - calc.min(..xs) + 1, calc.max(..ys) - calc.min(..ys) + 1)
+}
+
+// Draft builds: a dashed box of the canvas size instead of the figure, so cetz never runs
+#let draft-figure(name, size, render) = {
+  if draft-mode {
+    let (w, h) = size
+    let muted = active-theme.at("text-muted", default: gray)
+    box(
+      width: w * 1cm,
+      height: h * 1cm,
+      stroke: (paint: muted, thickness: 0.5pt, dash: "dashed"),
+      radius: 2pt,
+      align(center + horizon, text(size: 9pt, fill: muted, name)),
+    )
+  } else {
+    render()
+  }
+}
+
+// Canvas types (theme-bound and centered). Blank and simple canvases size themselves to what they
+// draw; their draft boxes are estimated (see blank-size) and take an explicit draft-size: (w, h).
 #let cartesian-canvas(..args) = {
-  align(center)[#cartesian-canvas-impl(..args, theme: active-theme)]
+  align(center)[#draft-figure("cartesian-canvas", canvas-size(args), () => cartesian-canvas-impl(
+      ..args,
+      theme: active-theme,
+    ))]
 }
 #let graph-canvas(..args) = {
-  align(center)[#graph-canvas-impl(..args, theme: active-theme)]
+  align(center)[#draft-figure("graph-canvas", canvas-size(args, size: (10, 8)), () => graph-canvas-impl(
+      ..args,
+      theme: active-theme,
+    ))]
 }
 #let trig-canvas(..args) = {
-  align(center)[#trig-canvas-impl(..args, theme: active-theme)]
+  let size = canvas-size(args, size: (10, 8), x-domain: (-2 * calc.pi, 2 * calc.pi), y-domain: (-2, 2))
+  align(center)[#draft-figure("trig-canvas", size, () => trig-canvas-impl(..args, theme: active-theme))]
 }
 #let polar-canvas(..args) = {
-  align(center)[#polar-canvas-impl(..args, theme: active-theme)]
+  align(center)[#draft-figure("polar-canvas", canvas-size(args, square: true), () => polar-canvas-impl(
+      ..args,
+      theme: active-theme,
+    ))]
 }
 #let space-canvas(..args) = {
-  align(center)[#space-canvas-impl(..args, theme: active-theme)]
+  align(center)[#draft-figure("space-canvas", space-size(args), () => space-canvas-impl(..args, theme: active-theme))]
+}
+#let blank-canvas(draft-size: none, ..args) = {
+  align(center)[#draft-figure("blank-canvas", blank-size(args, draft-size: draft-size), () => blank-canvas-impl(
+      ..args,
+      theme: active-theme,
+    ))]
 }
-#let blank-canvas(..args) = {
-  align(center)[#blank-canvas-impl(..args, theme: active-theme)]
+#let simple-canvas(draft-size: none, ..args) = {
+  draft-figure("simple-canvas", blank-size(arguments(), draft-size: draft-size), () => simple-canvas-impl(
+    theme: active-theme,
+    ..args,
+  ))
 }
-#let simple-canvas(..args) = simple-canvas-impl(theme: active-theme, ..args)
 
 // Vector drawing helpers
 #let draw-vector(..args) = draw-vector-impl(..args, theme: active-theme)
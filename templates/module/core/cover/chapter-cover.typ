@@ -5,6 +5,7 @@
   number: "",
   title: "",
   summary: none,
+  marker: none,
 ) = {
   // Extract chapter ID from number (e.g., "Chapter 01" -> "01")
   let chapter-id = if number != "" and number.starts-with("Chapter ") {
@@ -21,6 +22,7 @@
     footer: none,
   )[
     #std.metadata((number, title, chapter-id)) <chapter-cover>
+    #marker
     #line(length: 100%, stroke: 1pt + theme.text-muted)
 
     #v(2cm)
@@ -14,7 +14,7 @@
   set page(
     paper: "a4",
     margin: (x: 1in, y: 1in),
-    numbering: "1",
+    numbering: if deferred-numbering { none } else { "1" },
     fill: theme.page-fill, // Dynamic
   )
 
@@ -0,0 +1,66 @@
+import threading
+
+from noteworthy.core.build_cache import BuildCache
+
+
+class StubIndex:
+    def __init__(self, closure):
+        self.files = closure
+
+    def closure(self, source):
+        return list(self.files)
+
+
+def make_cache(tmp_path, *deps):
+    return BuildCache(tmp_path / 'cache', index=StubIndex(deps))
+
+
+def test_target_key_is_stable_for_unchanged_inputs(tmp_path):
+    dep = tmp_path / 'section.typ'
+    dep.write_text('= Section')
+    cache = make_cache(tmp_path, dep)
+    assert cache.target_key('base', '0/0', dep, 3) == cache.target_key('base', '0/0', dep, 3)
+
+
+def test_target_key_follows_every_input(tmp_path):
+    dep = tmp_path / 'section.typ'
+    dep.write_text('= Section')
+    cache = make_cache(tmp_path, dep)
+    key = cache.target_key('base', '0/0', dep, 3, extra={'show-solution': True})
+    assert key != cache.target_key('other-base', '0/0', dep, 3, extra={'show-solution': True})
+    assert key != cache.target_key('base', '0/1', dep, 3, extra={'show-solution': True})
+    assert key != cache.target_key('base', '0/0', dep, 4, extra={'show-solution': True})
+    assert key != cache.target_key('base', '0/0', dep, 3, extra={'show-solution': False})
+    dep.write_text('= Section, edited')
+    assert key != cache.target_key('base', '0/0', dep, 3, extra={'show-solution': True})
+
+
+def test_target_key_ignores_extra_ordering(tmp_path):
+    cache = make_cache(tmp_path)
+    assert cache.target_key('b', 't', extra={'a': 1, 'b': 2}) == cache.target_key('b', 't', extra={'b': 2, 'a': 1})
+
+
+def test_base_key_depends_on_flags(tmp_path):
+    cache = make_cache(tmp_path)
+    assert cache.base_key(['--input', 'draft=true']) != cache.base_key([])
+
+
+def test_store_then_restore(tmp_path):
+    cache = make_cache(tmp_path)
+    built = tmp_path / 'built.pdf'
+    built.write_bytes(b'%PDF-1.7 target')
+    restored = tmp_path / 'restored.pdf'
+    assert not cache.restore('k', restored)
+    cache.store('k', built)
+    assert cache.restore('k', restored)
+    assert restored.read_bytes() == b'%PDF-1.7 target'
+
+
+def test_claim_hands_waiters_the_holders_event(tmp_path):
+    cache = make_cache(tmp_path)
+    assert cache.claim('k') is None
+    done = cache.claim('k')
+    assert isinstance(done, threading.Event) and not done.is_set()
+    cache.settle('k')
+    assert done.is_set()
+    assert cache.claim('k') is None
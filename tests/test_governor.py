@@ -0,0 +1,54 @@
+import threading
+
+from noteworthy.core.governor import MemoryGovernor, parse_size
+
+MB = 1 << 20
+
+
+def test_same_named_compiles_hold_separate_reservations():
+    governor = MemoryGovernor(1000 * MB, footprints={'cover': 100 * MB})
+    first = governor.admit('cover', ['cover'], {})
+    second = governor.admit('cover', ['cover'], {})
+    assert len(governor.inflight) == 2
+    governor.release(first, ['cover'])
+    assert governor.projected() == 100 * MB
+    governor.release(second, ['cover'])
+    assert governor.projected() == 0
+    governor.close()
+
+
+def test_admit_waits_for_room_in_the_budget():
+    governor = MemoryGovernor(150 * MB, footprints={'a': 100 * MB, 'b': 100 * MB})
+    ticket = governor.admit('a', ['a'], {})
+    admitted = threading.Event()
+    worker = threading.Thread(target=lambda: (governor.admit('b', ['b'], {}), admitted.set()))
+    worker.start()
+    assert not admitted.wait(0.5)
+    assert governor.held == 1
+    governor.release(ticket, ['a'])
+    assert admitted.wait(5)
+    worker.join()
+    governor.close()
+
+
+def test_oversized_compile_still_runs_alone():
+    governor = MemoryGovernor(50 * MB, footprints={'big': 100 * MB})
+    ticket = governor.admit('big', ['big'], {})
+    assert governor.projected() == 100 * MB
+    governor.release(ticket, ['big'])
+    governor.close()
+
+
+def test_release_learns_the_observed_peak():
+    governor = MemoryGovernor(1000 * MB)
+    ticket = governor.admit('0/0', ['0/0'], {})
+    assert governor.release(ticket, ['0/0'], peak=300 * MB) == 300 * MB
+    assert governor.estimate(['0/0']) == 300 * MB
+    governor.close()
+
+
+def test_parse_size():
+    assert parse_size('512M') == 512 * MB
+    assert parse_size('2GiB') == 2048 * MB
+    assert parse_size('1024') == 1024
+    assert parse_size(None) is None
@@ -0,0 +1,50 @@
+import os
+
+from noteworthy.core.journal import BuildJournal
+
+
+def record(tmp_path, key='0/0', input_key='abc'):
+    output = tmp_path / f'{key.replace("/", "-")}.pdf'
+    output.write_bytes(b'%PDF-1.7 one')
+    journal = BuildJournal(tmp_path)
+    journal.record(key, input_key, 5, output, 2, [])
+    return journal, output
+
+
+def test_resumable_after_reload(tmp_path):
+    _, output = record(tmp_path)
+    journal = BuildJournal(tmp_path)
+    assert journal.load() == 1
+    entry = journal.resumable('0/0', 'abc', output)
+    assert entry['offset'] == 5 and entry['pages'] == 2
+
+
+def test_not_resumable_when_input_key_changed(tmp_path):
+    journal, output = record(tmp_path)
+    assert journal.resumable('0/0', 'def', output) is None
+    assert journal.resumable('0/1', 'abc', output) is None
+
+
+def test_not_resumable_when_pdf_changed_or_missing(tmp_path):
+    journal, output = record(tmp_path)
+    output.write_bytes(b'%PDF-1.7 rewritten')
+    assert journal.resumable('0/0', 'abc', output) is None
+    output.unlink()
+    assert journal.resumable('0/0', 'abc', output) is None
+
+
+def test_not_resumable_for_another_output(tmp_path):
+    journal, output = record(tmp_path)
+    assert journal.resumable('0/0', 'abc', tmp_path / 'elsewhere.pdf') is None
+
+
+def test_torn_journal_loads_empty(tmp_path):
+    (tmp_path / 'journal.json').write_text('{"targets": {"0/0"')
+    assert BuildJournal(tmp_path).load() == 0
+
+
+def test_reset_removes_file(tmp_path):
+    journal, _ = record(tmp_path)
+    journal.reset()
+    assert not BuildJournal.exists(tmp_path)
+    assert not [n for n in os.listdir(tmp_path) if n.endswith('.tmp')]
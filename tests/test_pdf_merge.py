@@ -0,0 +1,95 @@
+import pytest
+
+pypdf = pytest.importorskip('pypdf')
+from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject  # noqa: E402
+
+from noteworthy.core.build import finalize_pdf, splice_pdf  # noqa: E402
+
+BOOKMARKS = [
+    'BookmarkBegin', 'BookmarkTitle: Chapter', 'BookmarkLevel: 1', 'BookmarkPageNumber: 1',
+    'BookmarkBegin', 'BookmarkTitle: Section', 'BookmarkLevel: 2', 'BookmarkPageNumber: 3',
+]
+
+
+def make_pdf(path, labels, link=False):
+    """One page per label, drawing the label in Helvetica (one font object shared by the pages)."""
+    writer = pypdf.PdfWriter()
+    font = writer._add_object(DictionaryObject({
+        NameObject('/Type'): NameObject('/Font'),
+        NameObject('/Subtype'): NameObject('/Type1'),
+        NameObject('/BaseFont'): NameObject('/Helvetica'),
+    }))
+    for label in labels:
+        page = writer.add_blank_page(200, 200)
+        content = DecodedStreamObject()
+        content.set_data(f'BT /F1 12 Tf 20 100 Td ({label}) Tj ET'.encode())
+        page[NameObject('/Contents')] = writer._add_object(content)
+        page[NameObject('/Resources')] = DictionaryObject({
+            NameObject('/Font'): DictionaryObject({NameObject('/F1'): font})})
+    if link:
+        from pypdf.annotations import Link
+        writer.add_annotation(0, Link(rect=(0, 0, 50, 50), target_page_index=len(labels) - 1))
+    writer.write(path)
+    return path
+
+
+def texts(path):
+    return [p.extract_text().split() for p in pypdf.PdfReader(path, strict=True).pages]
+
+
+@pytest.fixture
+def book(tmp_path):
+    parts = [make_pdf(tmp_path / 'a.pdf', ['A1', 'A2'], link=True), make_pdf(tmp_path / 'b.pdf', ['B1', 'B2'])]
+    output = tmp_path / 'book.pdf'
+    assert finalize_pdf(parts, output, BOOKMARKS, 'Title', 'Author', build_dir=tmp_path) == 'stream'
+    return output
+
+
+def test_merge_writes_pages_outline_and_info(book):
+    assert texts(book) == [['A1'], ['A2'], ['B1'], ['B2']]
+    reader = pypdf.PdfReader(book, strict=True)
+    assert reader.metadata.title == 'Title' and reader.metadata.author == 'Author'
+    assert [reader.outline[0].title, reader.outline[1][0].title] == ['Chapter', 'Section']
+    assert reader.get_destination_page_number(reader.outline[1][0]) == 2
+
+
+def test_merge_keeps_links_between_pages_of_a_target(book):
+    reader = pypdf.PdfReader(book, strict=True)
+    link = reader.pages[0]['/Annots'][0].get_object()
+    assert link['/Dest'][0] == reader.pages[1].indirect_reference
+
+
+def test_merge_dedupes_identical_objects(tmp_path):
+    parts = [make_pdf(tmp_path / f'{n}.pdf', [n]) for n in ('a', 'b', 'c')]
+    fonts = set()
+    for dedupe in (True, False):
+        output = tmp_path / f'book-{dedupe}.pdf'
+        finalize_pdf(parts, output, [], 'T', 'A', dedupe=dedupe, build_dir=tmp_path)
+        reader = pypdf.PdfReader(output)
+        fonts.add(len({p['/Resources']['/Font'].raw_get('/F1').idnum for p in reader.pages}))
+    assert fonts == {1, 3}
+
+
+def test_merge_stamps_from_a_folio_sheet(tmp_path, book):
+    sheet = make_pdf(tmp_path / 'sheet.pdf', ['n2', 'n4'])
+    parts = [tmp_path / 'a.pdf', tmp_path / 'b.pdf']
+    output = tmp_path / 'stamped.pdf'
+    finalize_pdf(parts, output, BOOKMARKS, 'T', 'A', folio_sheet=(sheet, [(1, 0), (3, 1)]), build_dir=tmp_path)
+    assert texts(output) == [['A1'], ['A2', 'n2'], ['B1'], ['B2', 'n4']]
+
+
+def test_splice_replaces_pages_in_place(tmp_path, book):
+    before = book.read_bytes()
+    new = make_pdf(tmp_path / 'new.pdf', ['B1x'])
+    assert splice_pdf(book, [(2, new, 0)])
+    after = book.read_bytes()
+    assert after.startswith(before) and after.count(b'startxref') == 2
+    assert texts(book) == [['A1'], ['A2'], ['B1x'], ['B2']]
+    assert len(pypdf.PdfReader(book).outline) == 2
+
+
+def test_splice_refuses_pages_with_internal_links(tmp_path, book):
+    before = book.read_bytes()
+    linked = make_pdf(tmp_path / 'linked.pdf', ['L1', 'L2'], link=True)
+    assert not splice_pdf(book, [(0, linked, 0)])
+    assert book.read_bytes() == before
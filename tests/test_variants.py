@@ -0,0 +1,78 @@
+import pytest
+
+from noteworthy.core.variants import ConfigUsage, parse_override, parse_variants
+
+SETUP = '''#let constants = json("../../config/constants.json") + config-overrides
+#let show-solution = constants.show-solution
+#let accent = constants.at("accent-color", default: "blue")
+#let font = constants.font
+#import "../../config/snippets.typ": *
+#set text(font: font)
+'''
+
+BLOCKS = '''#let solution(body) = if show-solution [#body]
+#let note(body) = block(stroke: accent, body)
+'''
+
+SNIPPETS = '''#let answer(x) = if show-solution [#x]
+'''
+
+
+@pytest.fixture
+def project(tmp_path):
+    (tmp_path / 'templates/core').mkdir(parents=True)
+    (tmp_path / 'config').mkdir()
+    (tmp_path / 'templates/core/setup.typ').write_text(SETUP)
+    (tmp_path / 'templates/core/blocks.typ').write_text(BLOCKS)
+    (tmp_path / 'config/snippets.typ').write_text(SNIPPETS)
+
+    def section(name, text):
+        path = tmp_path / f'{name}.typ'
+        path.write_text(text)
+        return [path]
+    usage = ConfigUsage((tmp_path / 'templates', tmp_path / 'config'))
+    return usage, section
+
+
+def test_key_read_only_in_definitions_affects_their_users(project):
+    usage, section = project
+    overrides = {'show-solution': False}
+    assert usage.relevant(overrides, section('a', '#solution[42]')) == overrides
+    assert usage.relevant(overrides, section('b', 'Plain text')) == {}
+
+
+def test_snippets_in_config_carry_keys(project):
+    usage, section = project
+    assert usage.relevant({'show-solution': False}, section('a', '#answer[42]')) == {'show-solution': False}
+
+
+def test_binding_under_another_name_is_followed(project):
+    usage, section = project
+    overrides = {'accent-color': 'red'}
+    assert usage.relevant(overrides, section('a', '#note[x]')) == overrides
+    assert usage.relevant(overrides, section('b', 'Plain text')) == {}
+
+
+def test_key_read_by_a_top_level_rule_affects_every_section(project):
+    usage, section = project
+    assert usage.carriers_of('font') is None
+    assert usage.relevant({'font': 'Inter'}, section('a', 'Plain text')) == {'font': 'Inter'}
+
+
+def test_unplaced_key_affects_every_section(project):
+    usage, section = project
+    assert usage.relevant({'mystery': 1}, section('a', 'Plain text')) == {'mystery': 1}
+
+
+def test_parse_override_reads_json_values():
+    assert parse_override('show-solution=false') == ('show-solution', False)
+    assert parse_override('chapter-name=Part') == ('chapter-name', 'Part')
+    with pytest.raises(ValueError):
+        parse_override('no-value')
+
+
+def test_parse_variants():
+    assert parse_variants([['teacher', 'show-solution=true'], ['base']]) == {
+        'teacher': {'show-solution': True}, 'base': {}}
+    with pytest.raises(ValueError):
+        parse_variants([['bad name']])